@@ -0,0 +1,108 @@
+"""
+Content-hash cache for photo analysis results.
+
+Farmers on flaky networks often resubmit the same photo. Results are keyed by a
+hash of the image bytes plus the field geometry, GPS and analysis parameters, so
+an identical resubmission skips the image pipeline and the Earth Engine query.
+Lookups go to an in-memory LRU first, then a persistent SQLite tier with TTL.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+class AnalysisCache:
+    """In-memory LRU in front of a SQLite table, both with TTL expiry"""
+
+    def __init__(self, db_path: str = "analysis_cache.db", max_memory_entries: int = 256,
+                 max_db_entries: int = 10000, ttl_seconds: float = 3600):
+        self.db_path = db_path
+        self.max_memory_entries = max_memory_entries
+        self.max_db_entries = max_db_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+        self._writes_since_eviction = 0
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_analysis_cache_stored_at ON analysis_cache (stored_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def hash_content(image_data: bytes) -> str:
+        return hashlib.sha256(image_data).hexdigest()
+
+    @staticmethod
+    def make_key(content_hash: str, **context: Any) -> str:
+        """Combine the image hash with everything else that affects the result"""
+        encoded = json.dumps(context, sort_keys=True, default=str)
+        return hashlib.sha256(f"{content_hash}:{encoded}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    return json.loads(value)
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, stored_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, stored_at = row
+            if now - stored_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+
+            self._remember(key, stored_at, value)
+            return json.loads(value)
+
+    def set(self, key: str, result: Dict):
+        # Stored serialized so callers can never mutate a cached result
+        value = json.dumps(result, default=float)
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, value)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, stored_at) VALUES (?, ?, ?)",
+                (key, value, stored_at)
+            )
+            self._writes_since_eviction += 1
+            if self._writes_since_eviction >= 100:
+                self._evict()
+            self._conn.commit()
+
+    def _remember(self, key: str, stored_at: float, value: str):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop expired rows, then the oldest rows above max_db_entries"""
+        self._writes_since_eviction = 0
+        self._conn.execute("DELETE FROM analysis_cache WHERE stored_at < ?", (time.time() - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM analysis_cache WHERE key IN ("
+            "SELECT key FROM analysis_cache ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_db_entries,)
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,265 @@
+"""
+Dedicated process pool for CPU-heavy photo analysis.
+
+Keeps cv2/NumPy work off the Starlette threadpool so a burst of photo uploads
+cannot starve /login, /fields and the other endpoints. Workers are spawned once
+and keep a warm ImageAnalysisService instance for their whole lifetime.
+
+The per-job timeout counts from the moment a worker starts the job, not from
+submission, so time spent queued behind other uploads does not count. A job
+that overruns is stopped by killing the worker running it. ProcessPoolExecutor
+then fails every job of that pool with BrokenProcessPool; those other jobs are
+resubmitted once to a fresh pool, so their callers only see the extra latency.
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from itertools import count
+from typing import Any, Dict, List, Optional, Tuple
+
+# A job is run again at most this many times after its pool broke under it
+MAX_RESUBMITS = 1
+
+# How often a caller checks whether its queued job has started
+START_POLL_SECONDS = 0.05
+
+# Per-process state, set by the pool initializer
+_worker_service = None
+_started_queue = None
+
+def _init_worker(service_class: Optional[type], service_kwargs: Dict[str, Any], started_queue):
+    """Import cv2/NumPy and build the analysis service once per worker process"""
+    global _worker_service, _started_queue
+    if service_class is None:
+        from image_analysis_service import ImageAnalysisService
+        service_class = ImageAnalysisService
+    _worker_service = service_class(**service_kwargs)
+    _started_queue = started_queue
+
+def _run_service_method(job_key: Tuple[int, int], method_name: str, kwargs: Dict[str, Any]) -> Any:
+    # Tell the parent which process runs the job and since when, for the timeout
+    _started_queue.put((job_key, os.getpid(), time.time()))
+    return getattr(_worker_service, method_name)(**kwargs)
+
+def _ping() -> bool:
+    return _worker_service is not None
+
+class AnalysisQueueFull(Exception):
+    """Raised when every worker is busy and the wait queue is full"""
+
+    def __init__(self, retry_after_seconds: int):
+        super().__init__("Photo analysis queue is full")
+        self.retry_after_seconds = retry_after_seconds
+
+class AnalysisTimeout(Exception):
+    """Raised when a job does not finish within the per-job timeout"""
+
+class _Job:
+    """One submitted call; future is what callers wait on, across resubmits"""
+
+    def __init__(self, job_id: int, method_name: str, kwargs: Dict[str, Any]):
+        self.job_id = job_id
+        self.method_name = method_name
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+        self.timed_out = False
+        self.executor_future = None
+
+class AnalysisPool:
+    """Sized process pool with a bounded queue and per-job timeouts"""
+
+    def __init__(self, max_workers: int = 2, max_queue_size: int = 8, job_timeout_seconds: float = 30,
+                 retry_after_seconds: int = 5, service_kwargs: Optional[Dict[str, Any]] = None,
+                 service_class: Optional[type] = None):
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.job_timeout_seconds = job_timeout_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.service_kwargs = service_kwargs or {}
+        # Defaults to ImageAnalysisService, imported in the workers only
+        self.service_class = service_class
+
+        # One slot per running or queued job; released when the job really finishes
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_size)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._context = multiprocessing.get_context("spawn")
+        self._started_queue = self._context.SimpleQueue()
+        self._job_ids = count()
+        self._jobs: Dict[Future, _Job] = {}
+        self._started: Dict[Tuple[int, int], Tuple[int, float]] = {}  # (job id, attempt) -> (worker pid, start time)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned workers start clean: no inherited DB connections or Earth Engine state
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=self._context,
+                    initializer=_init_worker,
+                    initargs=(self.service_class, self.service_kwargs, self._started_queue)
+                )
+            return self._executor
+
+    def _reset_executor(self, broken: ProcessPoolExecutor):
+        """Replace a pool whose worker died (out of memory on a huge image, or killed for a timeout)"""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def warm_up(self):
+        """Start every worker now so import cost is not paid by the first upload"""
+        executor = self._get_executor()
+        futures = [executor.submit(_ping) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def submit(self, method_name: str, **kwargs) -> Future:
+        """Queue an ImageAnalysisService method call, or raise AnalysisQueueFull"""
+        if not self._slots.acquire(blocking=False):
+            raise AnalysisQueueFull(self.retry_after_seconds)
+        return self._submit_reserved(method_name, kwargs)
+
+    def submit_many(self, calls: List[Tuple[str, Dict[str, Any]]]) -> List[Future]:
+        """Queue several method calls at once; either all of them fit in the queue or none is queued"""
+        reserved = 0
+        with self._lock:
+            while reserved < len(calls) and self._slots.acquire(blocking=False):
+                reserved += 1
+        if reserved < len(calls):
+            for _ in range(reserved):
+                self._slots.release()
+            raise AnalysisQueueFull(self.retry_after_seconds)
+
+        futures = []
+        for index, (method_name, kwargs) in enumerate(calls):
+            try:
+                futures.append(self._submit_reserved(method_name, kwargs))
+            except Exception:
+                # Give back the slots reserved for calls that were never submitted
+                for _ in range(len(calls) - index - 1):
+                    self._slots.release()
+                for future in futures:
+                    future.cancel()
+                raise
+        return futures
+
+    def _submit_reserved(self, method_name: str, kwargs: Dict[str, Any]) -> Future:
+        job = _Job(next(self._job_ids), method_name, kwargs)
+        with self._lock:
+            self._jobs[job.future] = job
+        try:
+            self._dispatch(job)
+        except Exception:
+            with self._lock:
+                del self._jobs[job.future]
+            self._slots.release()
+            raise
+        job.future.add_done_callback(self._cancel_if_abandoned)
+        return job.future
+
+    def _dispatch(self, job: _Job):
+        job.attempts += 1
+        job_key = (job.job_id, job.attempts)
+        executor = self._get_executor()
+        try:
+            executor_future = executor.submit(_run_service_method, job_key, job.method_name, job.kwargs)
+        except BrokenProcessPool:
+            self._reset_executor(executor)
+            executor = self._get_executor()
+            executor_future = executor.submit(_run_service_method, job_key, job.method_name, job.kwargs)
+        job.executor_future = executor_future
+        executor_future.add_done_callback(lambda done: self._executor_job_done(job, executor, done))
+
+    def _executor_job_done(self, job: _Job, executor: ProcessPoolExecutor, done: Future):
+        """Runs when the pool finished, failed or cancelled one attempt of a job"""
+        if not done.cancelled() and isinstance(done.exception(), BrokenProcessPool):
+            self._reset_executor(executor)
+            if not job.timed_out and not job.future.done() and job.attempts <= MAX_RESUBMITS:
+                # Another job's worker died and took this pool down; this job did nothing wrong
+                with self._lock:
+                    self._started.pop((job.job_id, job.attempts), None)
+                try:
+                    self._dispatch(job)
+                    return
+                except Exception as e:
+                    done = Future()
+                    done.set_exception(e)
+
+        if not job.future.done():
+            if done.cancelled():
+                job.future.cancel()
+            elif done.exception() is not None:
+                job.future.set_exception(done.exception())
+            else:
+                job.future.set_result(done.result())
+        with self._lock:
+            self._jobs.pop(job.future, None)
+            self._started.pop((job.job_id, job.attempts), None)
+        self._slots.release()
+
+    def _cancel_if_abandoned(self, future: Future):
+        if future.cancelled():
+            with self._lock:
+                job = self._jobs.get(future)
+            if job is not None and job.executor_future is not None:
+                # Drops the job if it is still queued; otherwise it finishes and frees its slot then
+                job.executor_future.cancel()
+
+    def _job_start(self, job: _Job) -> Optional[Tuple[int, float]]:
+        """(worker pid, start time) of the job's current attempt, or None while it is queued"""
+        with self._lock:
+            running = {(other.job_id, other.attempts) for other in self._jobs.values()}
+            while not self._started_queue.empty():
+                job_key, pid, started_at = self._started_queue.get()
+                # Attempts that already finished or were resubmitted are not waited on anymore
+                if job_key in running:
+                    self._started[job_key] = (pid, started_at)
+            return self._started.get((job.job_id, job.attempts))
+
+    def result(self, future: Future) -> Any:
+        """Wait for a submitted job, raising AnalysisTimeout once it has run for job_timeout_seconds"""
+        with self._lock:
+            job = self._jobs.get(future)
+        while job is not None and not future.done():
+            started = self._job_start(job)
+            if started is None:
+                wait_seconds = START_POLL_SECONDS
+            else:
+                wait_seconds = started[1] + self.job_timeout_seconds - time.time()
+                if wait_seconds <= 0:
+                    self._stop(job, started[0])
+                    break
+            try:
+                return future.result(timeout=wait_seconds)
+            except FutureTimeoutError:
+                continue
+        return future.result()
+
+    def _stop(self, job: _Job, pid: int):
+        """Fail an overrunning job and kill the worker process running it"""
+        job.timed_out = True
+        if not job.future.done():
+            job.future.set_exception(
+                AnalysisTimeout(f"Photo analysis did not finish within {self.job_timeout_seconds} s")
+            )
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def run(self, method_name: str, **kwargs) -> Any:
+        """Submit a job and wait for its result"""
+        return self.result(self.submit(method_name, **kwargs))
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,55 @@
+"""
+Accuracy and latency report for resolution-bounded photo analysis.
+
+Runs ImageAnalysisService.resolution_accuracy_report over a set of field
+photos and summarizes how far the bounded metrics drift from full resolution.
+
+Usage:
+    python benchmark_analysis_resolution.py photos/*.jpg [--sizes 512 1024 2048]
+"""
+import argparse
+import json
+from image_analysis_service import ImageAnalysisService
+
+METRICS = ["green_percentage", "vegetation_density", "vegetation_health_score", "biomass_estimate_kg_per_hectare"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare bounded-resolution analysis with full resolution")
+    parser.add_argument("photos", nargs="+", help="Photo files to analyze")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[512, 1024, 2048],
+                        help="Analysis resolutions (longest side in pixels)")
+    parser.add_argument("--json", action="store_true", help="Print the full per-photo reports as JSON")
+    args = parser.parse_args()
+
+    service = ImageAnalysisService()
+    reports = []
+
+    for path in args.photos:
+        with open(path, "rb") as f:
+            report = service.resolution_accuracy_report(f.read(), tuple(args.sizes))
+        report["photo"] = path
+        reports.append(report)
+
+        full = report["full_resolution"]
+        width, height = full["vegetation_analysis"]["analysis_resolution"]
+        print(f"📷 {path} ({width}x{height}, {full['elapsed_ms']} ms, {full['array_memory_mb']} MB)")
+        for bounded in report["bounded"]:
+            errors = ", ".join(f"{m}: {bounded['absolute_error'][m]}" for m in METRICS)
+            print(f"  {bounded['max_dimension']:>5}px  {bounded['elapsed_ms']:>7} ms  "
+                  f"{bounded['array_memory_mb']:>6} MB  x{bounded['speedup']:<5} | {errors}")
+
+    print("\n📊 Summary over {} photo(s)".format(len(reports)))
+    print("-" * 50)
+    for index, size in enumerate(args.sizes):
+        rows = [report["bounded"][index] for report in reports]
+        mean_speedup = sum(row["speedup"] for row in rows) / len(rows)
+        print(f"{size}px: mean speedup x{mean_speedup:.1f}")
+        for metric in METRICS:
+            errors = [row["absolute_error"][metric] for row in rows]
+            print(f"  {metric}: mean abs error {sum(errors) / len(errors):.2f}, max {max(errors):.2f}")
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+
+if __name__ == "__main__":
+    main()
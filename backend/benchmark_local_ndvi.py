@@ -0,0 +1,113 @@
+"""
+Benchmark for the local raster NDVI backend.
+
+Writes synthetic Sentinel-2 B04/B08 scenes (UTM zone 26N, around Santiago,
+Cape Verde) to a temporary directory, then times LocalRasterNDVIService's
+windowed batch reduction against reading every scene in full and masking each
+field there, and checks that both give the same means.
+
+Usage:
+    python benchmark_local_ndvi.py [--fields 200] [--scenes 12] [--size 4096] [--cog]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+import numpy as np
+import rasterio
+from rasterio.features import geometry_mask
+from rasterio.transform import from_origin
+from rasterio.warp import transform as transform_coordinates
+from local_raster_service import LocalRasterNDVIService
+
+SCENE_ORIGIN = (300000.0, 1700000.0)  # UTM 26N, upper left
+PIXEL_SIZE = 10.0
+
+def write_scenes(directory: str, count: int, size: int, cog: bool):
+    rng = np.random.default_rng(0)
+    profile = {
+        "driver": "GTiff", "width": size, "height": size, "count": 1, "dtype": "uint16",
+        "crs": "EPSG:32626", "transform": from_origin(*SCENE_ORIGIN, PIXEL_SIZE, PIXEL_SIZE), "nodata": 0
+    }
+    if cog:
+        profile.update(tiled=True, blockxsize=512, blockysize=512, compress="deflate")
+    first = date(2024, 1, 5)
+    for index in range(count):
+        stamp = (first + timedelta(days=5 * index)).strftime("%Y%m%d")
+        scene_dir = os.path.join(directory, f"S2A_MSIL2A_{stamp}T113321")
+        os.makedirs(scene_dir)
+        red = rng.integers(300, 1500, (size, size), dtype=np.uint16)
+        nir = rng.integers(1500, 5000, (size, size), dtype=np.uint16)
+        red[:64, :64] = 0  # A nodata corner
+        for band, values in (("B04", red), ("B08", nir)):
+            with rasterio.open(os.path.join(scene_dir, f"T26PQC_{stamp}T113321_{band}_10m.tif"), "w", **profile) as dataset:
+                dataset.write(values, 1)
+
+def random_fields(count: int, size: int):
+    """Small quadrilateral fields inside the scene, as [[lat, lon], ...]"""
+    rng = np.random.default_rng(1)
+    extent = size * PIXEL_SIZE
+    fields = {}
+    for field_id in range(count):
+        x = SCENE_ORIGIN[0] + rng.uniform(0, extent - 300)
+        y = SCENE_ORIGIN[1] - rng.uniform(300, extent)
+        width, height = rng.uniform(50, 250, 2)
+        corners_x = [x, x + width, x + width * 0.9, x + width * 0.1]
+        corners_y = [y, y + height * 0.1, y + height, y + height * 0.9]
+        lons, lats = transform_coordinates("EPSG:32626", "EPSG:4326", corners_x, corners_y)
+        fields[field_id] = [[lat, lon] for lat, lon in zip(lats, lons)]
+    return fields
+
+def full_read_means(service: LocalRasterNDVIService, fields):
+    """Reference: read whole scenes and mask every field on the full grid"""
+    results = {key: [] for key in fields}
+    for scene in service._scenes:
+        with rasterio.open(scene["red_path"]) as red, rasterio.open(scene["nir_path"]) as nir:
+            red_values = red.read(1).astype(np.float32)
+            nir_values = nir.read(1).astype(np.float32)
+            for key, coordinates in fields.items():
+                lats, lons = zip(*coordinates)
+                xs, ys = transform_coordinates("EPSG:4326", red.crs, list(lons), list(lats))
+                inside = geometry_mask(
+                    [{"type": "Polygon", "coordinates": [list(zip(xs, ys))]}],
+                    out_shape=red_values.shape, transform=red.transform, invert=True
+                )
+                valid = inside & (red_values != 0) & (nir_values != 0)
+                if valid.any():
+                    ndvi = (nir_values[valid] - red_values[valid]) / (nir_values[valid] + red_values[valid])
+                    results[key].append({"date": scene["date"], "ndvi_value": round(float(ndvi.mean()), 3)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Windowed local NDVI vs full scene reads")
+    parser.add_argument("--fields", type=int, default=200)
+    parser.add_argument("--scenes", type=int, default=12)
+    parser.add_argument("--size", type=int, default=4096, help="scene width/height in pixels")
+    parser.add_argument("--cog", action="store_true", help="write tiled, compressed scenes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        write_scenes(directory, args.scenes, args.size, args.cog)
+        print(f"wrote {args.scenes} scenes of {args.size}x{args.size} in {time.perf_counter() - started:.2f}s")
+
+        service = LocalRasterNDVIService(directory)
+        fields = random_fields(args.fields, args.size)
+        start_date, end_date = "2024-01-01", "2025-01-01"
+
+        started = time.perf_counter()
+        windowed = service.calculate_ndvi_for_fields(fields, start_date, end_date)
+        windowed_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        reference = full_read_means(service, fields)
+        full_seconds = time.perf_counter() - started
+
+        observations = sum(len(series) for series in windowed.values())
+        print(f"windowed reads: {windowed_seconds:.2f}s for {observations} field observations")
+        print(f"full reads:     {full_seconds:.2f}s")
+        print("results match" if windowed == reference else "RESULTS DIFFER")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark for the packed NDVI series store.
+
+Writes a long daily history for a set of fields through upsert_ndvi_rows
+(which keeps ndvi_data and ndvi_series in step), then times loading one
+field's whole history as NDVIData ORM objects against load_ndvi_series, and
+checks that both give the same values.
+
+Usage:
+    python benchmark_ndvi_series.py [--fields 20] [--years 10]
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy.orm import sessionmaker
+import models
+from database import Base, create_database_engine
+from ndvi_store import load_ndvi_series, upsert_ndvi_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM rows vs packed arrays for whole NDVI histories")
+    parser.add_argument("--fields", type=int, default=20)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--loads", type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_database_engine(f"sqlite:///{os.path.join(directory, 'series.db')}")
+        Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(bind=engine)
+        rng = np.random.default_rng(0)
+        days = args.years * 365
+
+        db = session_factory()
+        started = time.perf_counter()
+        for field_id in range(1, args.fields + 1):
+            # Yearly chunks, like scheduler refreshes appending to the history
+            for year in range(args.years):
+                upsert_ndvi_rows(db, [
+                    {
+                        "field_id": field_id,
+                        "date": datetime(2015, 1, 1) + timedelta(days=day),
+                        "ndvi_value": round(float(rng.uniform(0.1, 0.8)), 3),
+                        "biomass_estimate": round(float(rng.uniform(1, 12)), 2),
+                        "data_source": "sentinel-2"
+                    }
+                    for day in range(year * 365, (year + 1) * 365)
+                ])
+            db.commit()
+        print(f"wrote {args.fields} fields x {days} days in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        for load in range(args.loads):
+            db.expunge_all()
+            rows = db.query(models.NDVIData).filter(
+                models.NDVIData.field_id == load % args.fields + 1
+            ).order_by(models.NDVIData.date).all()
+            orm_values = np.array([row.ndvi_value for row in rows], dtype=np.float32)
+        orm_seconds = (time.perf_counter() - started) / args.loads
+
+        started = time.perf_counter()
+        for load in range(args.loads):
+            db.expunge_all()
+            arrays = load_ndvi_series(db, load % args.fields + 1)["sentinel-2"]
+        packed_seconds = (time.perf_counter() - started) / args.loads
+
+        print(f"ORM rows:      {orm_seconds * 1000:.1f} ms per {days}-day history")
+        print(f"packed arrays: {packed_seconds * 1000:.2f} ms per {days}-day history")
+        print("values match" if np.array_equal(orm_values, arrays.ndvi) else "VALUES DIFFER")
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmark for the near-duplicate photo index.
+
+Fills PerceptualHashIndex with random 64-bit hashes, then times lookups of
+slightly perturbed copies against a linear scan over every stored hash and
+checks that both find the same matches.
+
+Usage:
+    python benchmark_photo_hash_index.py [--photos 200000] [--queries 1000]
+"""
+import argparse
+import random
+import time
+from photo_hash_index import PerceptualHashIndex, hamming_distance
+
+def flip_bits(photo_hash: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), count):
+        photo_hash ^= 1 << bit
+    return photo_hash
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-index vs linear scan duplicate lookup")
+    parser.add_argument("--photos", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--max-distance", type=int, default=6)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    hashes = [rng.getrandbits(64) for _ in range(args.photos)]
+
+    index = PerceptualHashIndex(max_distance=args.max_distance)
+    started = time.perf_counter()
+    for photo_id, photo_hash in enumerate(hashes):
+        index.add(photo_id, photo_hash)
+    print(f"indexed {len(index)} hashes in {time.perf_counter() - started:.2f}s")
+
+    queries = [
+        flip_bits(hashes[rng.randrange(len(hashes))], rng.randint(0, args.max_distance), rng)
+        for _ in range(args.queries)
+    ]
+
+    started = time.perf_counter()
+    indexed = [sorted(photo_id for photo_id, _, _ in index.query(query)) for query in queries]
+    index_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    scan_queries = queries[:max(1, len(queries) // 20)]
+    started = time.perf_counter()
+    scanned = [
+        sorted(photo_id for photo_id, stored in enumerate(hashes) if hamming_distance(query, stored) <= args.max_distance)
+        for query in scan_queries
+    ]
+    scan_ms = (time.perf_counter() - started) / len(scan_queries) * 1000
+
+    print(f"index lookup: {index_ms:.3f} ms/query")
+    print(f"linear scan:  {scan_ms:.3f} ms/query ({scan_ms / index_ms:.0f}x slower)")
+    print(f"identical matches: {indexed[:len(scanned)] == scanned}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark for the fused vegetation metrics kernel.
+
+Compares ImageAnalysisService._vegetation_metrics against the original
+three-pass implementation (kept below as the reference), checks that both give
+identical results and prints the speedup.
+
+Usage:
+    python benchmark_vegetation_metrics.py [photo.jpg ...] [--repeat 20]
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from PIL import Image
+from image_analysis_service import ImageAnalysisService
+
+def reference_metrics(img_array: np.ndarray):
+    """Original implementation: separate density and health passes, fancy-index copy of green pixels"""
+    img_hsv = cv2.cvtColor(img_array, cv2.COLOR_RGB2HSV)
+    green_mask = cv2.inRange(img_hsv, np.array([35, 40, 40]), np.array([85, 255, 255]))
+    green_pixels = np.sum(green_mask > 0)
+
+    kernel = np.ones((5, 5), np.uint8)
+    closing = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, kernel)
+    density_ratio = np.sum(closing > 0) / max(np.sum(green_mask > 0), 1)
+    density = min(density_ratio * 100, 100)
+
+    if np.sum(green_mask) == 0:
+        return green_pixels, density, 0
+    green_areas = img_hsv[green_mask > 0]
+    avg_hue = np.mean(green_areas[:, 0])
+    avg_saturation = np.mean(green_areas[:, 1])
+    avg_value = np.mean(green_areas[:, 2])
+    hue_score = max(0, 100 - abs(avg_hue - 60) * 2)
+    saturation_score = (avg_saturation / 255) * 100
+    brightness_score = (avg_value / 255) * 100
+    health = (hue_score * 0.4 + saturation_score * 0.4 + brightness_score * 0.2)
+    return green_pixels, density, min(health, 100)
+
+def synthetic_field_photo(width: int, height: int, seed: int) -> np.ndarray:
+    """Patchy green/soil image with noise, roughly like a field photo"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width]
+    plants = (np.sin(xx / rng.uniform(20, 80)) + np.cos(yy / rng.uniform(20, 80))) > rng.uniform(-0.5, 0.5)
+    image = np.empty((height, width, 3), np.int16)
+    image[..., 0] = np.where(plants, 50, 140)
+    image[..., 1] = np.where(plants, 140, 110)
+    image[..., 2] = np.where(plants, 45, 80)
+    image += rng.integers(-40, 40, image.shape, dtype=np.int16)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+def time_call(func, img_array: np.ndarray, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(img_array)
+    return (time.perf_counter() - started) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Fused vs reference vegetation metrics")
+    parser.add_argument("photos", nargs="*", help="Optional photos (analyzed at the service's bounded resolution)")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    service = ImageAnalysisService()
+    images = []
+    for path in args.photos:
+        image = service._load_analysis_image(Image.open(path), service.analysis_max_dimension)
+        images.append((path, np.array(image)))
+    for index, (width, height) in enumerate([(1024, 768), (2048, 1536), (4000, 3000)]):
+        images.append((f"synthetic {width}x{height}", synthetic_field_photo(width, height, index)))
+
+    print(f"{'image':<28} {'reference ms':>12} {'fused ms':>9} {'speedup':>8}  identical")
+    for name, img_array in images:
+        expected = reference_metrics(img_array)
+        actual = service._vegetation_metrics(img_array)
+        identical = all(
+            type(a) == type(e) and a == e
+            for a, e in zip(
+                (actual[0], round(actual[1], 2), round(actual[2], 2)),
+                (expected[0], round(expected[1], 2), round(expected[2], 2))
+            )
+        )
+
+        reference_ms = time_call(reference_metrics, img_array, args.repeat)
+        fused_ms = time_call(service._vegetation_metrics, img_array, args.repeat)
+        print(f"{name:<28} {reference_ms:>12.2f} {fused_ms:>9.2f} {reference_ms / fused_ms:>7.1f}x  {identical}")
+        if not identical:
+            print(f"  reference: {expected}\n  fused:     {actual}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Crop-aware biomass estimation from NDVI.
+
+Works on whole series at once: NDVI values and per-observation crop types go
+in as arrays, biomass comes out as an array. The crop of each observation is
+taken from the field's planting reports, so a multi-year series spanning
+several plantings (and fallow periods between them) is estimated in one call.
+"""
+import numpy as np
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+# Biomass (tons/hectare) per unit of NDVI
+BIOMASS_COEFFICIENTS = {
+    "general": 15.0,
+    "maize": 18.0,
+    "sorghum": 12.0,
+    "millet": 10.0,
+    "beans": 8.0
+}
+DEFAULT_CROP = "general"
+
+# Days from planting to harvest, when the field's carbon credits are assessed and paid out
+CROP_CYCLE_DAYS = {
+    "maize": 120,
+    "sorghum": 110,
+    "millet": 90,
+    "beans": 75
+}
+DEFAULT_CROP_CYCLE_DAYS = 100
+
+# (planting_date, crop_type) as stored in PlantingReport
+PlantingReportRow = Tuple[datetime, Optional[str]]
+
+def crop_cycle_days(crop_type: Optional[str]) -> int:
+    return CROP_CYCLE_DAYS.get((crop_type or "").lower(), DEFAULT_CROP_CYCLE_DAYS)
+
+def estimate_biomass_series(ndvi_values: Sequence[float], crop_types: Optional[Sequence[str]] = None) -> np.ndarray:
+    """
+    Biomass (tons/hectare) for every NDVI value
+
+    Args:
+        ndvi_values: NDVI series
+        crop_types: crop of each observation (same length), or None for the general coefficient;
+            unknown crops use the general coefficient
+
+    Returns:
+        float array rounded to 2 decimals; negative NDVI (water, bare soil) gives 0
+    """
+    ndvi = np.asarray(ndvi_values, dtype=float)
+    if crop_types is None:
+        coefficients = BIOMASS_COEFFICIENTS[DEFAULT_CROP]
+    else:
+        names, inverse = np.unique(np.char.lower(np.asarray(crop_types, dtype=str)), return_inverse=True)
+        coefficients = np.array([
+            BIOMASS_COEFFICIENTS.get(name, BIOMASS_COEFFICIENTS[DEFAULT_CROP]) for name in names
+        ])[inverse.reshape(ndvi.shape)]
+    return np.round(np.where(ndvi < 0, 0.0, ndvi * coefficients), 2)
+
+def crop_types_for_dates(dates: Sequence[datetime], planting_reports: Sequence[PlantingReportRow]) -> np.ndarray:
+    """
+    The active crop on each date: the latest planting on or before the date, until its
+    crop cycle ends; DEFAULT_CROP before the first planting and between cycles
+    """
+    observed = np.asarray(dates, dtype="datetime64[D]")
+    # Planting dates are calendar days; drop any timezone the app sent
+    reports = sorted(
+        (planting_date.replace(tzinfo=None), crop_type or DEFAULT_CROP)
+        for planting_date, crop_type in planting_reports if planting_date is not None
+    )
+    if not reports:
+        return np.full(observed.shape, DEFAULT_CROP, dtype=object)
+
+    planted = np.array([planting_date for planting_date, _ in reports], dtype="datetime64[D]")
+    crops = np.array([crop_type for _, crop_type in reports], dtype=object)
+    harvested = planted + np.array([crop_cycle_days(crop_type) for crop_type in crops], dtype="timedelta64[D]")
+
+    latest = np.searchsorted(planted, observed, side="right") - 1
+    clipped = np.clip(latest, 0, None)
+    active = (latest >= 0) & (observed < harvested[clipped])
+    return np.where(active, crops[clipped], DEFAULT_CROP)
+
+def estimate_field_biomass(dates: Sequence[datetime], ndvi_values: Sequence[float],
+                           planting_reports: Sequence[PlantingReportRow]) -> np.ndarray:
+    """estimate_biomass_series with each date's crop taken from the field's planting reports"""
+    return estimate_biomass_series(ndvi_values, crop_types_for_dates(dates, planting_reports))
@@ -0,0 +1,26 @@
+"""
+Shared pytest fixtures for the backend.
+
+Run from backend/ with python -m pytest. test_api.py is a manual script that
+talks to a running server, so it is not collected.
+"""
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from database import Base
+
+collect_ignore = ["test_api.py"]
+
+@pytest.fixture
+def engine():
+    """Fresh in-memory SQLite database with every table created"""
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
@@ -6,6 +6,8 @@ import requests
 import json
 from datetime import datetime, timedelta
 import random
+import numpy as np
+from synthetic_ndvi import PHENOLOGY_PATTERNS, field_seed, season_curve
 
 BASE_URL = "http://localhost:8000"
 
@@ -59,22 +61,14 @@ def generate_mock_ndvi_data(field_id, planting_date, crop_type, token):
     """Generate realistic NDVI progression for a Kap Verde field"""
     headers = {"Authorization": f"Bearer {token}"}
     
-    # Define NDVI progression for different crop types
-    ndvi_patterns = {
-        "maize": [0.15, 0.25, 0.45, 0.65, 0.75, 0.70, 0.50, 0.25],
-        "beans": [0.10, 0.20, 0.40, 0.60, 0.55, 0.45, 0.30, 0.15],
-        "sorghum": [0.12, 0.22, 0.42, 0.62, 0.72, 0.68, 0.45, 0.20],
-        "millet": [0.10, 0.18, 0.35, 0.55, 0.65, 0.60, 0.40, 0.18]
-    }
-    
-    pattern = ndvi_patterns.get(crop_type, ndvi_patterns["maize"])
+    # NDVI progression of the crop every 10 days, with the same per-field noise on every run
+    pattern = PHENOLOGY_PATTERNS.get(crop_type, PHENOLOGY_PATTERNS["maize"])
+    days_since_planting = np.arange(len(pattern)) * 10
+    rng = np.random.default_rng(field_seed(field_id))
+    ndvi_values = np.clip(season_curve(crop_type, days_since_planting) + rng.uniform(-0.05, 0.05, len(pattern)), 0, 1)
     
-    # Simulate NDVI measurements every 10 days
     current_date = planting_date
-    for i, base_ndvi in enumerate(pattern):
-        # Add some random variation (±0.05)
-        ndvi_value = max(0, min(1, base_ndvi + random.uniform(-0.05, 0.05)))
-        
+    for ndvi_value in ndvi_values.tolist():
         # Create NDVI data point directly in database
         # (In real app, this would come from Earth Engine)
         ndvi_data = {
@@ -0,0 +1,311 @@
+"""
+Bounded-latency access to Earth Engine.
+
+EarthEngineService makes blocking getInfo() calls. EarthEngineClient runs
+them on a small dedicated thread pool, which caps how many Earth Engine calls
+are in flight across the whole backend. Each attempt gets a timeout, and
+transient failures are retried with jittered exponential backoff. Callers get
+a result or an EarthEngineError, never silent demo data, so a slow Earth
+Engine costs at most max_attempts * timeout_seconds per call instead of
+stalling request threads. Sync and async (asyncio) callers share the same
+limits.
+
+Background batch work (the NDVI scheduler) goes through call_batch: a longer
+timeout of its own, and its failures do not count toward the circuit breaker,
+so a slow bulk fetch cannot make interactive calls fail fast.
+
+A circuit breaker fails calls fast after repeated failures, and a background
+health probe (which also does the lazy Earth Engine initialization) re-checks
+Earth Engine and closes the breaker again once it answers.
+"""
+import asyncio
+import random
+import re
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+from typing import Any, Dict, Optional
+import ee
+from earth_engine_service import is_payload_error
+
+# Substrings of Earth Engine errors worth retrying (rate limits, overload, transient server errors)
+TRANSIENT_ERROR_MARKERS = (
+    "too many concurrent",
+    "rate limit",
+    "quota",
+    "backend error",
+    "internal error",
+    "deadline",
+    "timed out",
+    "temporarily unavailable"
+)
+# HTTP status codes as whole numbers, so "5000 elements" is not a 500
+TRANSIENT_STATUS_PATTERN = re.compile(r"\b(429|50[0-4])\b")
+
+class EarthEngineError(Exception):
+    """Earth Engine could not answer; the message says why"""
+
+class EarthEngineUnavailable(EarthEngineError):
+    """Earth Engine is not initialized (no credentials) or failed after all retries"""
+
+class EarthEngineTimeout(EarthEngineError):
+    """An Earth Engine call did not finish within the per-call timeout"""
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures; after reset_seconds lets one trial call through"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_seconds: float = 60):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.time() - self.opened_at >= self.reset_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                print("🛰️  Earth Engine circuit closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"⚠️  Earth Engine circuit open after {self.consecutive_failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.time()
+
+    def release_trial(self):
+        """Let another trial call through after one that ended without a verdict on Earth Engine"""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def retry_in_seconds(self) -> Optional[float]:
+        if self.state != self.OPEN:
+            return None
+        return round(max(0.0, self.opened_at + self.reset_seconds - time.time()), 1)
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, (EarthEngineTimeout, socket.timeout, TimeoutError, ConnectionError)):
+        return True
+    if not isinstance(error, ee.EEException) or is_payload_error(error):
+        # Asking for too much at once fails again on retry; the caller has to split the request
+        return False
+    message = str(error).lower()
+    return any(marker in message for marker in TRANSIENT_ERROR_MARKERS) or bool(TRANSIENT_STATUS_PATTERN.search(message))
+
+class EarthEngineClient:
+    """Runs EarthEngineService methods with a concurrency limit, timeouts and retries"""
+
+    def __init__(self, ee_service, max_concurrent: int = 4, timeout_seconds: float = 20,
+                 batch_timeout_seconds: float = 120, max_attempts: int = 3, retry_base_seconds: float = 0.5, retry_max_seconds: float = 5,
+                 failure_threshold: int = 5, breaker_reset_seconds: float = 60,
+                 probe_seconds: float = 60, init_retry_seconds: float = 1800):
+        self.ee_service = ee_service
+        self.max_concurrent = max_concurrent
+        self.timeout_seconds = timeout_seconds
+        self.batch_timeout_seconds = batch_timeout_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.breaker = CircuitBreaker(failure_threshold, breaker_reset_seconds)
+        self.probe_seconds = probe_seconds
+        # How often the probe retries a failed Earth Engine authentication
+        self.init_retry_seconds = init_retry_seconds
+
+        self.last_success_at = None
+        self.last_failure_at = None
+        self.last_error = None
+        self.last_probe_at = None
+        self._probe_thread = None
+        self._probe_stop = threading.Event()
+
+        # The pool size is the global limit on concurrent Earth Engine calls
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="earth-engine")
+        # Abort the HTTP request itself too, so a timed-out call does not hold a pool thread forever.
+        # The deadline is process-wide, so it has to fit batch calls; interactive callers stop waiting sooner
+        ee_service.set_request_deadline(int(max(timeout_seconds, batch_timeout_seconds) * 1000))
+
+    def call(self, method_name: str, *args, **kwargs) -> Any:
+        """
+        Call an EarthEngineService method, retrying transient failures
+
+        Raises:
+            EarthEngineUnavailable: Earth Engine is not initialized or kept failing
+            EarthEngineTimeout: the last attempt timed out
+            EarthEngineError: Earth Engine rejected the request (e.g. an invalid geometry)
+        """
+        return self._call(method_name, args, kwargs, self.timeout_seconds, background=False)
+
+    def call_batch(self, method_name: str, *args, **kwargs) -> Any:
+        """call() for background bulk work: batch_timeout_seconds per attempt, failures kept out of the breaker"""
+        return self._call(method_name, args, kwargs, self.batch_timeout_seconds, background=True)
+
+    def _call(self, method_name: str, args: tuple, kwargs: Dict[str, Any], timeout_seconds: float,
+              background: bool) -> Any:
+        self._check_available()
+        method = getattr(self.ee_service, method_name)
+        for attempt in range(1, self.max_attempts + 1):
+            future = self._executor.submit(method, *args, **kwargs)
+            try:
+                result = future.result(timeout=timeout_seconds)
+                self._record_success()
+                return result
+            except FutureTimeoutError:
+                future.cancel()
+                error = EarthEngineTimeout(f"Earth Engine did not answer within {timeout_seconds} s")
+            except Exception as e:
+                error = e
+            if attempt == self.max_attempts or not is_transient_error(error):
+                raise self._finish_with_error(error, attempt, background)
+            time.sleep(self._retry_delay(attempt))
+
+    async def call_async(self, method_name: str, *args, **kwargs) -> Any:
+        """call() for asyncio code: waits without blocking the event loop"""
+        self._check_available()
+        method = getattr(self.ee_service, method_name)
+        loop = asyncio.get_running_loop()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self._executor, lambda: method(*args, **kwargs)),
+                    timeout=self.timeout_seconds
+                )
+                self._record_success()
+                return result
+            except asyncio.TimeoutError:
+                error = EarthEngineTimeout(f"Earth Engine did not answer within {self.timeout_seconds} s")
+            except Exception as e:
+                error = e
+            if attempt == self.max_attempts or not is_transient_error(error):
+                raise self._finish_with_error(error, attempt)
+            await asyncio.sleep(self._retry_delay(attempt))
+
+    def _check_available(self):
+        if not self.ee_service.ee_available:
+            raise EarthEngineUnavailable("Earth Engine not available")
+        if not self.breaker.allow():
+            raise EarthEngineUnavailable(
+                f"Earth Engine circuit open, retrying in {self.breaker.retry_in_seconds() or 0:.0f} s"
+            )
+
+    def _record_success(self):
+        self.last_success_at = datetime.utcnow()
+        self.breaker.record_success()
+
+    def _finish_with_error(self, error: Exception, attempts: int, background: bool = False) -> Exception:
+        final_error = self._final_error(error, attempts)
+        if isinstance(final_error, EarthEngineUnavailable) or isinstance(final_error, EarthEngineTimeout):
+            self.last_failure_at = datetime.utcnow()
+            self.last_error = str(final_error)
+            if background:
+                # Bulk requests are slower and fail differently; the health probe still opens the breaker
+                self.breaker.release_trial()
+            else:
+                self.breaker.record_failure()
+        elif isinstance(error, ee.EEException):
+            # Earth Engine answered (e.g. rejected a geometry), so it is reachable
+            self.breaker.record_success()
+        else:
+            # A bug or bad input on our side says nothing about Earth Engine
+            self.breaker.release_trial()
+        return final_error
+
+    def _retry_delay(self, attempt: int) -> float:
+        # Full jitter, so callers that failed together do not retry together
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempt - 1)))
+
+    def _final_error(self, error: Exception, attempts: int) -> Exception:
+        if isinstance(error, EarthEngineTimeout):
+            return error
+        if is_transient_error(error):
+            return EarthEngineUnavailable(f"Earth Engine failed after {attempts} attempts: {error}")
+        if isinstance(error, ee.EEException):
+            return EarthEngineError(f"Earth Engine error: {error}")
+        return error
+
+    def start_health_probe(self):
+        """Initialize Earth Engine in the background and re-check it every probe_seconds"""
+        if self._probe_thread is not None and self._probe_thread.is_alive():
+            return
+        self._probe_stop.clear()
+        self._probe_thread = threading.Thread(target=self._probe_loop, name="earth-engine-probe", daemon=True)
+        self._probe_thread.start()
+
+    def _probe_loop(self):
+        while True:
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"⚠️ Earth Engine health probe failed: {e}")
+            if self._probe_stop.wait(self.probe_seconds):
+                return
+
+    def probe(self) -> bool:
+        """One health check; closes the breaker when Earth Engine answers, bypassing it"""
+        self.last_probe_at = datetime.utcnow()
+        if not self.ee_service.initialize(retry_after_seconds=self.init_retry_seconds):
+            return False
+        # A recent real call already proved Earth Engine works; save the quota
+        if self.breaker.state == CircuitBreaker.CLOSED and self.last_success_at is not None and (
+            (self.last_probe_at - self.last_success_at).total_seconds() < self.probe_seconds
+        ):
+            return True
+        future = self._executor.submit(self.ee_service.ping)
+        try:
+            future.result(timeout=self.timeout_seconds)
+        except Exception as e:
+            future.cancel()
+            self.last_failure_at = datetime.utcnow()
+            self.last_error = f"Health probe: {e or type(e).__name__}"
+            self.breaker.record_failure()
+            return False
+        self._record_success()
+        return True
+
+    def status(self) -> Dict[str, Any]:
+        """Initialization, breaker and call health, for the status endpoint"""
+        service = self.ee_service
+        return {
+            "initialized": service._ee_available,  # None until the first attempt
+            "initialized_at": service.initialized_at,
+            "init_error": service.last_init_error,
+            "circuit": {
+                "state": self.breaker.state,
+                "consecutive_failures": self.breaker.consecutive_failures,
+                "retry_in_seconds": self.breaker.retry_in_seconds()
+            },
+            "last_success_at": self.last_success_at,
+            "last_failure_at": self.last_failure_at,
+            "last_error": self.last_error,
+            "last_probe_at": self.last_probe_at
+        }
+
+    def shutdown(self):
+        self._probe_stop.set()
+        self._executor.shutdown(wait=False)
@@ -1,11 +1,131 @@
 import ee
-from typing import List, Dict, Any
-from datetime import datetime, timedelta
+from typing import List, Dict, Any, Hashable, Iterator, Optional, Tuple
+from datetime import date, datetime, timedelta
 import json
+import math
+import threading
+import time
+from statistics import median
+from biomass import estimate_biomass_series
+from synthetic_ndvi import field_seed, generate_series
+
+# getInfo() refuses collections larger than 5000 elements; keep a margin
+MAX_FEATURES_PER_REQUEST = 4000
+
+# Earth Engine errors that mean "ask for less at once" rather than a real failure
+PAYLOAD_ERROR_MARKERS = (
+    "payload size",
+    "5000 elements",
+    "memory limit",
+    "too many pixels",
+    "computation timed out"
+)
+
+# Sentinel-2 scene classification (SCL) kept when compositing: vegetation, bare soil, water, unclassified.
+# Cloud shadows, clouds, cirrus, snow, saturated and no-data pixels are masked.
+SCL_CLEAR_CLASSES = [4, 5, 6, 7]
+
+# Fixed calendar windows for median composites: ISO weeks, dekads (1-10, 11-20, 21-end) and months
+COMPOSITE_PERIODS = ("weekly", "10day", "monthly")
+
+def is_payload_error(error: Exception) -> bool:
+    """Earth Engine refused the request for its size; a smaller one may succeed"""
+    message = str(error).lower()
+    return any(marker in message for marker in PAYLOAD_ERROR_MARKERS)
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+def composite_window_start(day: date, period: str) -> date:
+    """Start of the composite window containing day"""
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "10day":
+        return day.replace(day=min(21, (day.day - 1) // 10 * 10 + 1))
+    if period == "monthly":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown composite period: {period}")
+
+def composite_window_end(window_start: date, period: str) -> date:
+    """Exclusive end of the composite window starting at window_start"""
+    if period == "weekly":
+        return window_start + timedelta(days=7)
+    if period == "10day" and window_start.day < 21:
+        return window_start + timedelta(days=10)
+    return _next_month(window_start)
+
+def composite_windows(start: date, end: date, period: str) -> List[Tuple[date, date]]:
+    """The windows overlapping [start, end), each as a half-open (start, end)"""
+    windows = []
+    cursor = composite_window_start(start, period)
+    while cursor < end:
+        window_end = composite_window_end(cursor, period)
+        windows.append((cursor, window_end))
+        cursor = window_end
+    return windows
 
 class EarthEngineService:
-    def __init__(self):
-        self.ee_available = False
+    # Everything that changes the NDVI values returned for a geometry and date range
+    NDVI_COLLECTION = 'COPERNICUS/S2_SR'
+    # Cloud-masked median composites (composite=...) need the SCL band
+    SUPPORTS_COMPOSITES = True
+    MAX_CLOUDY_PIXEL_PERCENTAGE = 20
+    NDVI_SCALE = 10
+
+    def __init__(self, lazy: bool = True):
+        """
+        Args:
+            lazy: authenticate on first use (or from the client's health probe) instead of here,
+                so importing the backend never waits for Google's auth endpoints
+        """
+        self._ee_available = None  # None until the first initialization attempt
+        self._init_lock = threading.Lock()
+        self._request_deadline_ms = None
+        self.initialized_at = None
+        self.last_init_attempt_at = None
+        self.last_init_error = None
+        if not lazy:
+            self.initialize()
+
+    @property
+    def ee_available(self) -> bool:
+        if self._ee_available is None:
+            self.initialize()
+        return bool(self._ee_available)
+
+    @ee_available.setter
+    def ee_available(self, value: bool):
+        self._ee_available = value
+
+    def initialize(self, retry_after_seconds: Optional[float] = None) -> bool:
+        """
+        Authenticate with Earth Engine once
+
+        Args:
+            retry_after_seconds: try again after a failed attempt at least this old; by default a
+                failed attempt is final (no credentials in development)
+
+        Returns:
+            whether Earth Engine is available
+        """
+        with self._init_lock:
+            if self._ee_available:
+                return True
+            if self._ee_available is not None and (
+                retry_after_seconds is None
+                or time.time() - self.last_init_attempt_at < retry_after_seconds
+            ):
+                return False
+            self.last_init_attempt_at = time.time()
+            self._ee_available = self._authenticate()
+            if self._ee_available:
+                self.initialized_at = datetime.utcnow()
+                self.last_init_error = None
+                if self._request_deadline_ms is not None:
+                    ee.data.setDeadline(self._request_deadline_ms)
+            return self._ee_available
+
+    def _authenticate(self) -> bool:
         try:
             # Try service account authentication first
             service_account_path = 'service-account-key.json'
@@ -15,119 +135,328 @@ class EarthEngineService:
             )
             ee.Initialize(credentials, project='ee-ilkkaukkola')
             print("🛰️  Earth Engine authenticated with service account!")
-            self.ee_available = True
+            return True
         except Exception as e:
             print(f"⚠️  Service account authentication failed: {e}")
             try:
                 # Fallback to default authentication
                 ee.Initialize(project='ee-ilkkaukkola')
                 print("✅ Earth Engine authenticated with default credentials!")
-                self.ee_available = True
+                return True
             except Exception as e2:
                 print(f"⚠️  Earth Engine ei käytettävissä: {e2}")
                 print("📊 Käytetään demo-dataa NDVI-laskentaan")
-                self.ee_available = False
+                self.last_init_error = str(e2)
+                return False
+
+    def ping(self):
+        """Smallest possible Earth Engine round trip, for health checks; raises on failure"""
+        ee.Number(1).getInfo()
+
+    def ndvi_query_params(self, composite: Optional[str] = None) -> Dict[str, Any]:
+        params = {
+            'collection': self.NDVI_COLLECTION,
+            'max_cloudy_pixel_percentage': self.MAX_CLOUDY_PIXEL_PERCENTAGE,
+            'scale': self.NDVI_SCALE
+        }
+        if composite:
+            params.update(composite=composite, clear_scl_classes=SCL_CLEAR_CLASSES)
+        return params
+
+    def set_request_deadline(self, milliseconds: int):
+        """Abort Earth Engine HTTP requests that take longer; applied once the session is initialized"""
+        with self._init_lock:
+            self._request_deadline_ms = milliseconds
+            if self._ee_available:
+                ee.data.setDeadline(milliseconds)
 
     def calculate_ndvi_for_field(self, coordinates: List[List[float]], 
-                                start_date: str, end_date: str) -> List[Dict[str, Any]]:
+                                start_date: str, end_date: str,
+                                composite: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Mean NDVI of the field per Sentinel-2 scene, or per composite window
+
+        Args:
+            composite: None for one value per scene, or one of COMPOSITE_PERIODS for cloud-masked
+                median composites; those points also have 'end_date', 'pixel_count' and 'scene_count'
+
+        Earth Engine errors are raised. Only when Earth Engine is not configured at all is
+        demo data returned, with every point marked 'data_source': 'demo'.
+        """
+        if not self.ee_available:
+            return self._labelled_demo_ndvi_data(start_date, end_date, field_seed(coordinates), composite)
+        
+        if composite:
+            return self._calculate_ndvi_live_batch({None: coordinates}, start_date, end_date, composite)[None]
+        return self._calculate_ndvi_live(coordinates, start_date, end_date)
+
+    def _calculate_ndvi_live(self, coordinates: List[List[float]],
+                             start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        """Mean NDVI per Sentinel-2 scene over [start_date, end_date); raises instead of falling back to demo data"""
+        geometry = self._field_geometry(coordinates)
+        collection = self._sentinel2_collection(geometry, start_date, end_date)
+        
+        def calculate_ndvi(image):
+            # NDVI: (NIR - Red) / (NIR + Red)
+            ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+            return image.addBands(ndvi)
+        
+        ndvi_collection = collection.map(calculate_ndvi)
         
-        # If Earth Engine is not available, return demo data
+        def get_ndvi_stats(image):
+            stats = image.select('NDVI').reduceRegion(
+                reducer=ee.Reducer.mean(),
+                geometry=geometry,
+                scale=self.NDVI_SCALE,
+                maxPixels=1e9
+            )
+            return ee.Feature(None, {
+                'date': image.date().format('YYYY-MM-dd'),
+                'ndvi': stats.get('NDVI')
+            })
+        
+        ndvi_stats = ndvi_collection.map(get_ndvi_stats)
+        ndvi_list = ndvi_stats.getInfo()
+        
+        results = []
+        for feature in ndvi_list['features']:
+            props = feature['properties']
+            if props['ndvi'] is not None:
+                results.append({
+                    'date': props['date'],
+                    'ndvi_value': round(props['ndvi'], 3)
+                })
+        
+        results.sort(key=lambda x: x['date'])
+        return results
+    
+    def calculate_ndvi_for_fields(self, fields: Dict[Hashable, List[List[float]]],
+                                  start_date: str, end_date: str,
+                                  max_fields_per_request: int = 200,
+                                  composite: Optional[str] = None) -> Dict[Hashable, List[Dict[str, Any]]]:
+        """
+        NDVI series for many fields with one Earth Engine request per chunk of fields
+
+        Args:
+            fields: {field key: [[lat, lon], ...]}
+            max_fields_per_request: upper bound for a chunk; chunks are also sized so the
+                result (fields x scenes) stays under the getInfo element limit
+            composite: as in calculate_ndvi_for_field
+
+        Returns:
+            {field key: [{'date', 'ndvi_value'}, ...]}, like calculate_ndvi_for_field per field
+
+        The first chunk Earth Engine fails is raised; callers that want to keep the chunks
+        that succeeded call this once per field_chunks() chunk. Demo data (marked
+        'data_source': 'demo') only when Earth Engine is not configured.
+        """
         if not self.ee_available:
-            return self._generate_demo_ndvi_data(start_date, end_date)
+            return {
+                key: self._labelled_demo_ndvi_data(start_date, end_date, field_seed(coordinates), composite)
+                for key, coordinates in fields.items()
+            }
         
+        results = {}
+        for chunk in self.field_chunks(fields, start_date, end_date, max_fields_per_request, composite):
+            results.update(self._calculate_ndvi_live_batch(chunk, start_date, end_date, composite))
+        return results
+
+    def _calculate_ndvi_live_batch(self, fields: Dict[Hashable, List[List[float]]],
+                                   start_date: str, end_date: str,
+                                   composite: Optional[str] = None) -> Dict[Hashable, List[Dict[str, Any]]]:
+        """
+        Batched _calculate_ndvi_live: one reduceRegions per scene over a FeatureCollection of
+        all the fields, one getInfo() for the whole chunk
+
+        A chunk that Earth Engine rejects as too large is split in half and retried. Other
+        errors are raised.
+        """
+        keys = list(fields)
         try:
-            # Convert coordinates to Earth Engine geometry [lon, lat]
-            ee_coords = [[coord[1], coord[0]] for coord in coordinates]
-            geometry = ee.Geometry.Polygon([ee_coords])
-            
-            # Get Sentinel-2 Surface Reflectance collection
-            collection = (ee.ImageCollection('COPERNICUS/S2_SR')
-                         .filterDate(start_date, end_date)
-                         .filterBounds(geometry)
-                         .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20)))
-            
-            def calculate_ndvi(image):
-                # NDVI: (NIR - Red) / (NIR + Red)
-                ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-                return image.addBands(ndvi)
-            
-            ndvi_collection = collection.map(calculate_ndvi)
-            
-            def get_ndvi_stats(image):
-                stats = image.select('NDVI').reduceRegion(
-                    reducer=ee.Reducer.mean(),
-                    geometry=geometry,
-                    scale=10,
-                    maxPixels=1e9
-                )
-                return ee.Feature(None, {
-                    'date': image.date().format('YYYY-MM-dd'),
-                    'ndvi': stats.get('NDVI')
-                })
-            
-            ndvi_stats = ndvi_collection.map(get_ndvi_stats)
-            ndvi_list = ndvi_stats.getInfo()
-            
-            results = []
-            for feature in ndvi_list['features']:
-                props = feature['properties']
-                if props['ndvi'] is not None:
-                    results.append({
-                        'date': props['date'],
-                        'ndvi_value': round(props['ndvi'], 3)
-                    })
-            
-            results.sort(key=lambda x: x['date'])
+            return self._reduce_fields(keys, fields, start_date, end_date, composite)
+        except ee.EEException as e:
+            if len(keys) == 1 or not is_payload_error(e):
+                raise
+            print(f"🛰️  Earth Engine request too large for {len(keys)} fields, splitting: {e}")
+            middle = len(keys) // 2
+            results = self._calculate_ndvi_live_batch(
+                {key: fields[key] for key in keys[:middle]}, start_date, end_date, composite
+            )
+            results.update(self._calculate_ndvi_live_batch(
+                {key: fields[key] for key in keys[middle:]}, start_date, end_date, composite
+            ))
             return results
-            
-        except Exception as e:
-            print(f"Error calculating NDVI: {e}")
-            return self._generate_demo_ndvi_data(start_date, end_date)
-    
-    def _generate_demo_ndvi_data(self, start_date: str, end_date: str) -> List[Dict[str, Any]]:
-        """Generate realistic demo NDVI data when Earth Engine is not available"""
-        import random
-        from datetime import datetime, timedelta
+
+    def _reduce_fields(self, keys: List[Hashable], fields: Dict[Hashable, List[List[float]]],
+                       start_date: str, end_date: str,
+                       composite: Optional[str] = None) -> Dict[Hashable, List[Dict[str, Any]]]:
+        field_collection = self._field_collection(keys, fields)
+        if composite:
+            return self._reduce_field_composites(keys, field_collection, start_date, end_date, composite)
+        collection = self._sentinel2_collection(field_collection.geometry(), start_date, end_date)
         
-        start = datetime.strptime(start_date, '%Y-%m-%d')
-        end = datetime.strptime(end_date, '%Y-%m-%d')
+        def reduce_scene(image):
+            ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+            date = image.date().format('YYYY-MM-dd')
+            stats = ndvi.reduceRegions(
+                collection=field_collection,
+                reducer=ee.Reducer.mean(),
+                scale=self.NDVI_SCALE
+            )
+            # Fields outside this scene's footprint get no mean
+            return stats.filter(ee.Filter.notNull(['mean'])).map(
+                lambda feature: ee.Feature(None, {
+                    'field_index': feature.get('field_index'),
+                    'date': date,
+                    'ndvi': feature.get('mean')
+                })
+            )
         
-        results = []
-        current_date = start
-        base_ndvi = 0.6  # Base NDVI value
-        
-        while current_date <= end:
-            # Add some seasonal variation and noise
-            day_of_year = current_date.timetuple().tm_yday
-            seasonal_factor = 0.2 * (1 + 0.3 * (day_of_year / 365))
-            noise = random.uniform(-0.1, 0.1)
-            
-            ndvi_value = min(0.9, max(0.1, base_ndvi + seasonal_factor + noise))
-            
-            results.append({
-                'date': current_date.strftime('%Y-%m-%d'),
-                'ndvi_value': round(ndvi_value, 3)
-            })
-            
-            # Move to next week (roughly)
-            current_date += timedelta(days=7)
+        ndvi_list = collection.map(reduce_scene).flatten().getInfo()
         
+        results = {key: [] for key in keys}
+        for feature in ndvi_list['features']:
+            props = feature['properties']
+            if props.get('ndvi') is not None:
+                results[keys[props['field_index']]].append({
+                    'date': props['date'],
+                    'ndvi_value': round(props['ndvi'], 3)
+                })
+        for series in results.values():
+            series.sort(key=lambda x: x['date'])
         return results
 
-    def estimate_biomass_from_ndvi(self, ndvi_value: float, crop_type: str = "general") -> float:
-        if ndvi_value < 0:
-            return 0.0
-        
-        # Simplified biomass estimation (tons/hectare)
-        biomass_coefficients = {
-            "general": 15.0,
-            "maize": 18.0,
-            "sorghum": 12.0,
-            "millet": 10.0,
-            "beans": 8.0
-        }
+    def _reduce_field_composites(self, keys: List[Hashable], field_collection, start_date: str, end_date: str,
+                                 period: str) -> Dict[Hashable, List[Dict[str, Any]]]:
+        """
+        Cloud-masked median NDVI composite per window, averaged over each field, in one getInfo()
+
+        Only one value per field and window comes back, whatever the number of scenes and tile overlaps.
+        """
+        windows = composite_windows(
+            datetime.strptime(start_date, '%Y-%m-%d').date(), datetime.strptime(end_date, '%Y-%m-%d').date(), period
+        )
+        window_ends = {window_start.strftime('%Y-%m-%d'): window_end for window_start, window_end in windows}
+        # Windows are clipped to the requested range so no scene outside it is used
+        bounds = [
+            [max(window_start.strftime('%Y-%m-%d'), start_date), min(window_end.strftime('%Y-%m-%d'), end_date),
+             window_start.strftime('%Y-%m-%d')]
+            for window_start, window_end in windows
+        ]
+        scenes = self._sentinel2_collection(field_collection.geometry(), start_date, end_date).map(self._masked_ndvi)
+        reducer = ee.Reducer.mean().combine(ee.Reducer.count(), sharedInputs=True)
+        
+        def reduce_window(window):
+            window = ee.List(window)
+            window_scenes = scenes.filterDate(window.get(0), window.get(1))
+            scene_count = window_scenes.size()
+            stats = window_scenes.median().reduceRegions(
+                collection=field_collection,
+                reducer=reducer,
+                scale=self.NDVI_SCALE
+            ).filter(ee.Filter.notNull(['mean'])).map(
+                lambda feature: ee.Feature(None, {
+                    'field_index': feature.get('field_index'),
+                    'date': window.get(2),
+                    'ndvi': feature.get('mean'),
+                    'pixel_count': feature.get('count'),
+                    'scene_count': scene_count
+                })
+            )
+            # A window without scenes has an empty median image
+            return ee.Algorithms.If(scene_count.gt(0), stats, ee.FeatureCollection([]))
+        
+        ndvi_list = ee.FeatureCollection(ee.List(bounds).map(reduce_window)).flatten().getInfo()
+        
+        results = {key: [] for key in keys}
+        for feature in ndvi_list['features']:
+            props = feature['properties']
+            if props.get('ndvi') is not None:
+                results[keys[props['field_index']]].append({
+                    'date': props['date'],
+                    'end_date': window_ends[props['date']].strftime('%Y-%m-%d'),
+                    'ndvi_value': round(props['ndvi'], 3),
+                    'pixel_count': int(props['pixel_count']),
+                    'scene_count': int(props['scene_count'])
+                })
+        for series in results.values():
+            series.sort(key=lambda x: x['date'])
+        return results
+
+    def field_chunks(self, fields: Dict[Hashable, List[List[float]]], start_date: str, end_date: str,
+                     max_fields_per_request: int = 200,
+                     composite: Optional[str] = None) -> Iterator[Dict[Hashable, List[List[float]]]]:
+        """Split fields so one request's result (fields x scenes) stays under the getInfo element limit"""
+        start = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end = datetime.strptime(end_date, '%Y-%m-%d').date()
+        if composite:
+            expected_scenes = max(1, len(composite_windows(start, end, composite)))
+        else:
+            # Sentinel-2A/B revisit every 5 days; a field on a tile overlap can see two scenes per pass
+            expected_scenes = max(1, math.ceil((end - start).days / 5) * 2)
+        chunk_size = max(1, min(max_fields_per_request, MAX_FEATURES_PER_REQUEST // expected_scenes))
         
-        coefficient = biomass_coefficients.get(crop_type.lower(), 15.0)
-        biomass = ndvi_value * coefficient
+        keys = list(fields)
+        for offset in range(0, len(keys), chunk_size):
+            yield {key: fields[key] for key in keys[offset:offset + chunk_size]}
+
+    def _field_collection(self, keys: List[Hashable], fields: Dict[Hashable, List[List[float]]]):
+        # Field keys travel as list indices so any hashable key works
+        return ee.FeatureCollection([
+            ee.Feature(self._field_geometry(fields[key]), {'field_index': index})
+            for index, key in enumerate(keys)
+        ])
+
+    def _masked_ndvi(self, image):
+        """NDVI band with cloud, shadow and cirrus pixels masked out by the scene classification"""
+        clear = image.select('SCL').remap(SCL_CLEAR_CLASSES, [1] * len(SCL_CLEAR_CLASSES), 0)
+        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI').updateMask(clear)
+        # addBands keeps the scene's properties, so filterDate still works on the result
+        return image.addBands(ndvi).select('NDVI')
+
+    def _field_geometry(self, coordinates: List[List[float]]):
+        # Convert coordinates to Earth Engine geometry [lon, lat]
+        ee_coords = [[coord[1], coord[0]] for coord in coordinates]
+        return ee.Geometry.Polygon([ee_coords])
+
+    def _sentinel2_collection(self, geometry, start_date: str, end_date: str):
+        # Get Sentinel-2 Surface Reflectance collection
+        return (ee.ImageCollection(self.NDVI_COLLECTION)
+                .filterDate(start_date, end_date)
+                .filterBounds(geometry)
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', self.MAX_CLOUDY_PIXEL_PERCENTAGE)))
+    
+    def _generate_demo_ndvi_data(self, start_date: str, end_date: str, seed: int = 0,
+                                 composite: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Realistic demo NDVI when Earth Engine is not available; the same seed always gives the same series"""
+        series = generate_series(seed, start_date, end_date)
+        if not composite:
+            return series
         
-        return round(biomass, 2)
\ No newline at end of file
+        # Median of the demo observations in each window (no pixels behind them)
+        windows = {}
+        for point in series:
+            window_start = composite_window_start(datetime.strptime(point['date'], '%Y-%m-%d').date(), composite)
+            windows.setdefault(window_start, []).append(point['ndvi_value'])
+        return [
+            {
+                'date': window_start.strftime('%Y-%m-%d'),
+                'end_date': composite_window_end(window_start, composite).strftime('%Y-%m-%d'),
+                'ndvi_value': round(float(median(values)), 3),
+                'pixel_count': None,
+                'scene_count': len(values)
+            }
+            for window_start, values in sorted(windows.items())
+        ]
+
+    def _labelled_demo_ndvi_data(self, start_date: str, end_date: str, seed: int = 0,
+                                 composite: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Demo series with every point marked as demo, for callers that get no other source label"""
+        return [
+            dict(point, data_source='demo')
+            for point in self._generate_demo_ndvi_data(start_date, end_date, seed, composite)
+        ]
+
+    def estimate_biomass_from_ndvi(self, ndvi_value: float, crop_type: str = "general") -> float:
+        """Single-value biomass (tons/hectare); use biomass.estimate_biomass_series for whole series"""
+        return float(estimate_biomass_series([ndvi_value], [crop_type])[0])
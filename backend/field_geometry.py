@@ -0,0 +1,107 @@
+"""
+Vectorized field geometry for GPS validation.
+
+Field polygons are small (hectares, not countries), so coordinates are
+projected onto a local equirectangular plane around the polygon and all tests
+run there in meters. Every function takes a batch of points against one
+polygon, so validating many photos or a whole GPS track is a few NumPy calls.
+
+Coordinates follow the rest of the backend: [latitude, longitude].
+"""
+import numpy as np
+from typing import Sequence, Tuple
+
+EARTH_RADIUS_METERS = 6371000
+
+# Caps the (points x edges) temporaries at a few MB for long GPS tracks
+_MAX_PAIRS_PER_CHUNK = 1 << 20
+
+def project_to_local_plane(coords: np.ndarray, origin: Tuple[float, float]) -> np.ndarray:
+    """Project [lat, lon] pairs to (x, y) meters east/north of origin"""
+    lat0, lon0 = np.radians(origin[0]), np.radians(origin[1])
+    lat = np.radians(coords[:, 0])
+    lon = np.radians(coords[:, 1])
+    x = (lon - lon0) * np.cos(lat0) * EARTH_RADIUS_METERS
+    y = (lat - lat0) * EARTH_RADIUS_METERS
+    return np.column_stack((x, y))
+
+def _polygon_ring(polygon: Sequence[Sequence[float]]) -> np.ndarray:
+    """Polygon vertices as an (M, 2) array without the repeated closing vertex"""
+    ring = np.asarray(polygon, dtype=float).reshape(-1, 2)
+    if len(ring) > 1 and np.array_equal(ring[0], ring[-1]):
+        ring = ring[:-1]
+    return ring
+
+def _points_in_ring(points: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """Even-odd ray casting for (N, 2) points against an (M, 2) ring in the same plane"""
+    if len(ring) < 3:
+        return np.zeros(len(points), dtype=bool)
+    ax, ay = ring[:, 0], ring[:, 1]
+    bx, by = np.roll(ax, -1), np.roll(ay, -1)
+    px, py = points[:, 0:1], points[:, 1:2]
+
+    crosses = (ay > py) != (by > py)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_at_py = ax + (py - ay) * (bx - ax) / (by - ay)
+    return np.count_nonzero(crosses & (px < x_at_py), axis=1) % 2 == 1
+
+def _distance_to_ring_edges(points: np.ndarray, ring: np.ndarray) -> np.ndarray:
+    """Shortest distance from each point to any edge (or the single vertex) of the ring"""
+    a = ring
+    b = np.roll(ring, -1, axis=0) if len(ring) > 1 else ring
+    ab = b - a
+    ab_len2 = np.einsum("ij,ij->i", ab, ab)
+
+    ap = points[:, None, :] - a[None, :, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.einsum("nmk,mk->nm", ap, ab) / ab_len2
+    # Zero-length edges (duplicate vertices) collapse to their start point
+    t = np.clip(np.where(ab_len2 > 0, t, 0.0), 0.0, 1.0)
+    closest = a[None, :, :] + t[:, :, None] * ab[None, :, :]
+    return np.sqrt(((points[:, None, :] - closest) ** 2).sum(axis=2)).min(axis=1)
+
+def distance_to_field(points: Sequence[Sequence[float]], polygon: Sequence[Sequence[float]]) -> np.ndarray:
+    """
+    Distance in meters from each GPS point to a field polygon
+
+    Args:
+        points: [[lat, lon], ...] GPS positions
+        polygon: [[lat, lon], ...] field boundary (closed or open ring)
+
+    Returns:
+        Array of distances; 0.0 for points inside the field
+    """
+    ring_latlon = _polygon_ring(polygon)
+    latlon = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(ring_latlon) == 0 or len(latlon) == 0:
+        return np.full(len(latlon), np.inf)
+
+    origin = tuple(ring_latlon.mean(axis=0))
+    ring = project_to_local_plane(ring_latlon, origin)
+    projected = project_to_local_plane(latlon, origin)
+
+    distances = np.empty(len(projected))
+    chunk = max(1, _MAX_PAIRS_PER_CHUNK // len(ring))
+    for start in range(0, len(projected), chunk):
+        block = projected[start:start + chunk]
+        block_distances = _distance_to_ring_edges(block, ring)
+        block_distances[_points_in_ring(block, ring)] = 0.0
+        distances[start:start + chunk] = block_distances
+    return distances
+
+def points_in_field(points: Sequence[Sequence[float]], polygon: Sequence[Sequence[float]]) -> np.ndarray:
+    """Boolean mask of the GPS points that fall inside the field polygon"""
+    ring_latlon = _polygon_ring(polygon)
+    latlon = np.asarray(points, dtype=float).reshape(-1, 2)
+    if len(ring_latlon) < 3 or len(latlon) == 0:
+        return np.zeros(len(latlon), dtype=bool)
+
+    origin = tuple(ring_latlon.mean(axis=0))
+    ring = project_to_local_plane(ring_latlon, origin)
+    projected = project_to_local_plane(latlon, origin)
+
+    chunk = max(1, _MAX_PAIRS_PER_CHUNK // len(ring))
+    return np.concatenate([
+        _points_in_ring(projected[start:start + chunk], ring)
+        for start in range(0, len(projected), chunk)
+    ])
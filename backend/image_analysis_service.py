@@ -4,24 +4,39 @@ from PIL import Image, ExifTags
 import io
 import base64
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple, Optional
+from typing import BinaryIO, Dict, List, Tuple, Optional, Union
 import math
 import json
+import threading
+import time
+from field_geometry import distance_to_field
+
+# Green color range (vegetation) in OpenCV HSV
+GREEN_HSV_LOWER = np.array([35, 40, 40], dtype=np.uint8)
+GREEN_HSV_UPPER = np.array([85, 255, 255], dtype=np.uint8)
+DENSITY_KERNEL = np.ones((5, 5), np.uint8)
+
+# Start-of-frame markers (SOF0-SOF15 minus DHT, JPG and DAC) carry the image size
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
 
 class ImageAnalysisService:
     """Service for analyzing field photos and extracting biomass indicators"""
     
-    def __init__(self):
+    def __init__(self, analysis_max_dimension: Optional[int] = None):
         self.min_green_threshold = 0.15  # Minimum percentage of green to be considered valid
         self.max_photo_age_hours = 24    # Photos must be less than 24h old
         self.gps_tolerance_meters = 100   # GPS must be within 100m of field boundary
+        self.min_validation_score = 70    # Overall score needed for a photo to count as validated
+        # Longest side (pixels) used for vegetation metrics; None or 0 analyzes full resolution
+        self.analysis_max_dimension = analysis_max_dimension
+        self._buffers = threading.local()
     
-    def analyze_field_photo_with_gps(self, image_data: bytes, expected_coords: List[List[float]], photo_gps_coords: List[float]) -> Dict:
+    def analyze_field_photo_with_gps(self, image_data: Union[bytes, str, BinaryIO], expected_coords: List[List[float]], photo_gps_coords: List[float]) -> Dict:
         """
         Analyze a field photo with provided GPS coordinates
         
         Args:
-            image_data: Raw image bytes
+            image_data: Raw image bytes, or a path / file object of the photo
             expected_coords: Expected field boundary coordinates
             photo_gps_coords: GPS coordinates from the app [latitude, longitude]
             
@@ -30,7 +45,7 @@ class ImageAnalysisService:
         """
         try:
             # Load and analyze image
-            image = Image.open(io.BytesIO(image_data))
+            image = self._open_image(image_data)
             
             # Create metadata with provided GPS coordinates
             metadata = {
@@ -45,7 +60,7 @@ class ImageAnalysisService:
             gps_valid, gps_distance = self._validate_gps_location_direct(photo_gps_coords, expected_coords)
             
             # Analyze vegetation content
-            vegetation_analysis = self._analyze_vegetation(image)
+            vegetation_analysis, perceptual_hash = self._analyze_pixels(image)
             
             # Calculate biomass estimate from visual data
             biomass_estimate = self._estimate_biomass_from_image(vegetation_analysis)
@@ -67,6 +82,7 @@ class ImageAnalysisService:
                     "photo_gps": photo_gps_coords
                 },
                 "metadata": metadata,
+                "perceptual_hash": perceptual_hash,
                 "analysis_timestamp": datetime.now().isoformat()
             }
             
@@ -77,22 +93,23 @@ class ImageAnalysisService:
                 "validation": {"overall_score": 0.0, "error": True}
             }
 
-    def analyze_field_photo(self, image_data: bytes, expected_coords: List[List[float]], 
-                           photo_metadata: Dict = None) -> Dict:
+    def analyze_field_photo(self, image_data: Union[bytes, str, BinaryIO], expected_coords: List[List[float]], 
+                           photo_metadata: Dict = None, early_reject: bool = False) -> Dict:
         """
         Analyze a field photo for biomass indicators and validation
         
         Args:
-            image_data: Raw image bytes
+            image_data: Raw image bytes, or a path / file object of the photo
             expected_coords: Field boundary coordinates [[lat, lon], ...]
             photo_metadata: Optional metadata from photo
+            early_reject: Skip pixel analysis when the metadata alone rules out a passing score
             
         Returns:
             Analysis results with biomass estimate and validation status
         """
         try:
-            # Load and analyze image
-            image = Image.open(io.BytesIO(image_data))
+            # Open lazily; pixels are not decoded until the vegetation analysis
+            image = self._open_image(image_data)
             
             # Extract metadata
             metadata = self._extract_photo_metadata(image)
@@ -103,8 +120,29 @@ class ImageAnalysisService:
             # Validate GPS location
             gps_valid, gps_distance = self._validate_gps_location(metadata, expected_coords)
             
+            if early_reject:
+                max_score = self._max_validation_score(freshness_valid, gps_valid, gps_distance, image.size)
+                if max_score < self.min_validation_score:
+                    return {
+                        "biomass_estimate_kg_per_hectare": 0.0,
+                        "early_rejected": True,
+                        "validation": {
+                            "overall_score": float(self._metadata_validation_score(
+                                freshness_valid, gps_valid, gps_distance
+                            )),
+                            "max_achievable_score": float(max_score),
+                            "freshness_valid": bool(freshness_valid),
+                            "gps_valid": bool(gps_valid),
+                            "gps_distance_meters": float(gps_distance),
+                            "photo_timestamp": metadata.get("datetime"),
+                            "photo_gps": metadata.get("gps_coords")
+                        },
+                        "metadata": metadata,
+                        "analysis_timestamp": datetime.now().isoformat()
+                    }
+            
             # Analyze vegetation content
-            vegetation_analysis = self._analyze_vegetation(image)
+            vegetation_analysis, perceptual_hash = self._analyze_pixels(image)
             
             # Calculate biomass estimate from visual data
             biomass_estimate = self._estimate_biomass_from_image(vegetation_analysis)
@@ -126,6 +164,7 @@ class ImageAnalysisService:
                     "photo_gps": metadata.get("gps_coords")
                 },
                 "metadata": metadata,
+                "perceptual_hash": perceptual_hash,
                 "analysis_timestamp": datetime.now().isoformat()
             }
             
@@ -136,41 +175,140 @@ class ImageAnalysisService:
                 "validation": {"overall_score": 0.0, "error": True}
             }
     
+    def _open_image(self, image_data: Union[bytes, str, BinaryIO]) -> Image.Image:
+        """Open a photo lazily; pixels are decoded only when the image is used"""
+        if isinstance(image_data, (bytes, bytearray)):
+            return Image.open(io.BytesIO(image_data))
+        return Image.open(image_data)
+    
     def _extract_photo_metadata(self, image: Image.Image) -> Dict:
-        """Extract metadata from photo including GPS and timestamp"""
+        """Extract metadata from photo including GPS and timestamp (reads the header, not the pixels)"""
+        try:
+            return self._metadata_from_exif(image.getexif())
+        except Exception as e:
+            print(f"Metadata extraction error: {e}")
+            return {}
+    
+    def _metadata_from_exif(self, exif: Image.Exif) -> Dict:
+        """Pick DateTime and GPS position (decimal degrees) out of an EXIF block"""
         metadata = {}
         
+        # Extract datetime
+        if ExifTags.Base.DateTime in exif:
+            metadata["datetime"] = exif[ExifTags.Base.DateTime]
+        
+        # Extract GPS data
+        gps_data = {}
+        for gps_tag_id, gps_value in exif.get_ifd(ExifTags.IFD.GPSInfo).items():
+            gps_tag = ExifTags.GPSTAGS.get(gps_tag_id, gps_tag_id)
+            gps_data[gps_tag] = gps_value
+        
+        # Convert GPS to decimal degrees
+        if "GPSLatitude" in gps_data and "GPSLongitude" in gps_data:
+            lat = self._convert_gps_to_decimal(
+                gps_data["GPSLatitude"], gps_data.get("GPSLatitudeRef", "N")
+            )
+            lon = self._convert_gps_to_decimal(
+                gps_data["GPSLongitude"], gps_data.get("GPSLongitudeRef", "E")
+            )
+            metadata["gps_coords"] = [lat, lon]
+        
+        return metadata
+    
+    def read_photo_metadata(self, image_data: Union[bytes, str, BinaryIO],
+                            max_header_bytes: int = 256 * 1024) -> Dict:
+        """
+        Read DateTime and GPS from the start of a photo without decoding any pixels
+        
+        Works on a truncated upload as long as it contains the EXIF block, which lets the
+        app check a photo before sending the whole file.
+        
+        Args:
+            image_data: Raw (possibly truncated) image bytes, or a path / file object of the photo
+            max_header_bytes: How much of the file to read at most
+            
+        Returns:
+            Metadata dict and the image size [width, height] when the header contains it
+        """
+        if isinstance(image_data, (bytes, bytearray)):
+            header = bytes(image_data[:max_header_bytes])
+        elif isinstance(image_data, str):
+            with open(image_data, "rb") as f:
+                header = f.read(max_header_bytes)
+        else:
+            header = image_data.read(max_header_bytes)
+        
+        metadata, image_size = {}, None
         try:
-            exif = image._getexif()
-            if exif:
-                for tag_id, value in exif.items():
-                    tag = ExifTags.TAGS.get(tag_id, tag_id)
-                    
-                    # Extract datetime
-                    if tag == "DateTime":
-                        metadata["datetime"] = value
-                    
-                    # Extract GPS data
-                    elif tag == "GPSInfo":
-                        gps_data = {}
-                        for gps_tag_id, gps_value in value.items():
-                            gps_tag = ExifTags.GPSTAGS.get(gps_tag_id, gps_tag_id)
-                            gps_data[gps_tag] = gps_value
-                        
-                        # Convert GPS to decimal degrees
-                        if "GPSLatitude" in gps_data and "GPSLongitude" in gps_data:
-                            lat = self._convert_gps_to_decimal(
-                                gps_data["GPSLatitude"], gps_data.get("GPSLatitudeRef", "N")
-                            )
-                            lon = self._convert_gps_to_decimal(
-                                gps_data["GPSLongitude"], gps_data.get("GPSLongitudeRef", "E")
-                            )
-                            metadata["gps_coords"] = [lat, lon]
-                            
+            if header[:2] == b"\xff\xd8":
+                exif, image_size = self._read_jpeg_header(header)
+                if exif is not None:
+                    metadata = self._metadata_from_exif(exif)
+            else:
+                # Other formats: PIL only parses the header on open
+                image = Image.open(io.BytesIO(header))
+                image_size = image.size
+                metadata = self._extract_photo_metadata(image)
         except Exception as e:
             print(f"Metadata extraction error: {e}")
+        
+        return {
+            "metadata": metadata,
+            "image_size": list(image_size) if image_size else None
+        }
+    
+    def _read_jpeg_header(self, header: bytes) -> Tuple[Optional[Image.Exif], Optional[Tuple[int, int]]]:
+        """Walk the JPEG markers up to the first scan, returning the EXIF block and the frame size"""
+        exif, size = None, None
+        pos = 2
+        while pos + 4 <= len(header) and header[pos] == 0xFF:
+            marker = header[pos + 1]
+            if marker == 0xFF:  # Fill byte
+                pos += 1
+                continue
+            if marker in (0xDA, 0xD9):  # Start of scan / end of image
+                break
             
-        return metadata
+            length = int.from_bytes(header[pos + 2:pos + 4], "big")
+            segment = header[pos + 4:pos + 2 + length]
+            if marker == 0xE1 and exif is None and segment.startswith(b"Exif\x00\x00"):
+                exif = Image.Exif()
+                exif.load(segment[6:])
+            elif marker in JPEG_SOF_MARKERS and len(segment) >= 5:
+                size = (int.from_bytes(segment[3:5], "big"), int.from_bytes(segment[1:3], "big"))
+                break
+            pos += 2 + length
+        
+        return exif, size
+    
+    def assess_photo_metadata(self, metadata: Dict, expected_coords: List[List[float]],
+                              image_size: Optional[List[int]] = None) -> Dict:
+        """Validation that can be decided from metadata alone, and the best score the photo can still reach"""
+        freshness_valid = self._validate_photo_freshness(metadata)
+        gps_valid, gps_distance = self._validate_gps_location(metadata, expected_coords)
+        max_score = self._max_validation_score(freshness_valid, gps_valid, gps_distance, image_size)
+        
+        return {
+            "freshness_valid": bool(freshness_valid),
+            "gps_valid": bool(gps_valid),
+            "gps_distance_meters": float(gps_distance),
+            "photo_timestamp": metadata.get("datetime"),
+            "photo_gps": metadata.get("gps_coords"),
+            "max_achievable_score": float(max_score),
+            "can_pass": bool(max_score >= self.min_validation_score)
+        }
+    
+    def _max_validation_score(self, freshness_valid: bool, gps_valid: bool, gps_distance: float,
+                              image_size: Optional[Tuple[int, int]] = None) -> float:
+        """Upper bound of the validation score, assuming the best case for the pixel-based parts"""
+        total_pixels = image_size[0] * image_size[1] if image_size else float("inf")
+        best_case = {"green_percentage": 50, "total_pixels": total_pixels}
+        return self._calculate_validation_score(freshness_valid, gps_valid, best_case, gps_distance)
+    
+    def _metadata_validation_score(self, freshness_valid: bool, gps_valid: bool, gps_distance: float) -> float:
+        """Validation points earned from freshness and GPS alone"""
+        no_pixels = {"green_percentage": 0, "total_pixels": 0}
+        return self._calculate_validation_score(freshness_valid, gps_valid, no_pixels, gps_distance)
     
     def _convert_gps_to_decimal(self, gps_coord, ref) -> float:
         """Convert GPS coordinates from EXIF format to decimal degrees"""
@@ -202,102 +340,147 @@ class ImageAnalysisService:
         if not photo_coords or not expected_coords:
             return False, -1.0
         
-        # Calculate minimum distance to field boundary
-        min_distance = 999999.0
-        for field_coord in expected_coords:
-            distance = self._calculate_distance(photo_coords, field_coord)
-            min_distance = min(min_distance, distance)
+        # Distance to the field polygon (0 inside the field)
+        distance = float(distance_to_field([photo_coords], expected_coords)[0])
         
-        is_valid = bool(min_distance <= self.gps_tolerance_meters)
-        return is_valid, float(min_distance)
+        is_valid = bool(distance <= self.gps_tolerance_meters)
+        return is_valid, distance
 
     def _validate_gps_location(self, metadata: Dict, expected_coords: List[List[float]]) -> Tuple[bool, float]:
         """Validate that photo was taken near the field"""
         if "gps_coords" not in metadata or not expected_coords:
             return False, -1.0  # Use -1 instead of inf to indicate no GPS data
         
-        photo_coords = metadata["gps_coords"]
-        
-        # Calculate minimum distance to field boundary
-        min_distance = 999999.0  # Large number instead of inf
-        for field_coord in expected_coords:
-            distance = self._calculate_distance(photo_coords, field_coord)
-            min_distance = min(min_distance, distance)
-        
-        is_valid = bool(min_distance <= self.gps_tolerance_meters)
-        return is_valid, float(min_distance)
+        return self._validate_gps_location_direct(metadata["gps_coords"], expected_coords)
     
-    def _calculate_distance(self, coord1: List[float], coord2: List[float]) -> float:
-        """Calculate distance between two GPS coordinates in meters"""
-        lat1, lon1 = math.radians(coord1[0]), math.radians(coord1[1])
-        lat2, lon2 = math.radians(coord2[0]), math.radians(coord2[1])
-        
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
+    def validate_gps_points(self, points: List[List[float]], expected_coords: List[List[float]]) -> Dict:
+        """
+        Validate a batch of GPS positions (several photos or a GPS track) against one field
         
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.asin(math.sqrt(a))
-        r = 6371000  # Earth radius in meters
+        Args:
+            points: [[lat, lon], ...] GPS positions
+            expected_coords: Field boundary coordinates [[lat, lon], ...]
+            
+        Returns:
+            Per-point distances and validity plus summary counts
+        """
+        if not points or not expected_coords:
+            return {"distances_meters": [], "inside_field": [], "gps_valid": [], "valid_count": 0}
         
-        return c * r
+        distances = distance_to_field(points, expected_coords)
+        valid = distances <= self.gps_tolerance_meters
+        return {
+            "distances_meters": np.round(distances, 2).tolist(),
+            "inside_field": (distances == 0).tolist(),
+            "gps_valid": valid.tolist(),
+            "valid_count": int(valid.sum())
+        }
+    
+    def _load_analysis_image(self, image: Image.Image, max_dimension: Optional[int]) -> Image.Image:
+        """Decode the photo with its longest side bounded to max_dimension pixels"""
+        if max_dimension and max(image.size) > max_dimension:
+            if image.format == "JPEG":
+                # libjpeg decodes directly at 1/2, 1/4 or 1/8 scale (never below the requested size)
+                scale = max_dimension / max(image.size)
+                image.draft("RGB", (int(image.size[0] * scale), int(image.size[1] * scale)))
+            
+            # Box-average the rest of the way down by an integer factor
+            factor = math.ceil(max(image.size) / max_dimension)
+            if factor > 1:
+                image = image.reduce(factor)
+        
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        return image
     
-    def _analyze_vegetation(self, image: Image.Image) -> Dict:
+    def _analyze_vegetation(self, image: Image.Image, max_dimension: Optional[int] = None) -> Dict:
         """Analyze vegetation content in the image"""
-        # Convert to numpy array
-        img_array = np.array(image)
-        
-        # Convert to HSV for better vegetation detection
-        img_hsv = cv2.cvtColor(img_array, cv2.COLOR_RGB2HSV)
+        vegetation_analysis, _ = self._analyze_pixels(image, max_dimension)
+        return vegetation_analysis
+    
+    def _analyze_pixels(self, image: Image.Image, max_dimension: Optional[int] = None) -> Tuple[Dict, str]:
+        """Decode the photo once and compute the vegetation metrics and the perceptual hash"""
+        if max_dimension is None:
+            max_dimension = self.analysis_max_dimension
         
-        # Define green color range (vegetation)
-        lower_green = np.array([35, 40, 40])
-        upper_green = np.array([85, 255, 255])
+        # Metrics are computed on the bounded image but reported for the original resolution
+        full_width, full_height = image.size
+        analysis_image = self._load_analysis_image(image, max_dimension)
         
-        # Create mask for green areas
-        green_mask = cv2.inRange(img_hsv, lower_green, upper_green)
+        # Convert to numpy array
+        img_array = np.array(analysis_image)
         
-        # Calculate vegetation metrics
-        total_pixels = img_array.shape[0] * img_array.shape[1]
-        green_pixels = np.sum(green_mask > 0)
-        green_percentage = (green_pixels / total_pixels) * 100
+        # Coverage, density and health from a single green mask
+        green_pixels, vegetation_density, vegetation_health = self._vegetation_metrics(img_array)
         
-        # Analyze vegetation density and health
-        vegetation_density = self._calculate_vegetation_density(green_mask)
-        vegetation_health = self._estimate_vegetation_health(img_hsv, green_mask)
+        analysis_pixels = img_array.shape[0] * img_array.shape[1]
+        green_percentage = (green_pixels / analysis_pixels) * 100
+        total_pixels = full_width * full_height
         
-        return {
+        vegetation_analysis = {
             "green_percentage": round(green_percentage, 2),
             "vegetation_density": round(vegetation_density, 2),
             "vegetation_health_score": round(vegetation_health, 2),
             "total_pixels": float(total_pixels),
-            "green_pixels": float(green_pixels)
+            "green_pixels": float(green_pixels * total_pixels / analysis_pixels),
+            "analysis_resolution": [img_array.shape[1], img_array.shape[0]],
+            "analysis_max_dimension": max_dimension or None  # None: full resolution
         }
+        return vegetation_analysis, self._perceptual_hash(img_array)
     
-    def _calculate_vegetation_density(self, green_mask: np.ndarray) -> float:
-        """Calculate how dense the vegetation appears"""
-        # Use morphological operations to analyze vegetation structure
-        kernel = np.ones((5,5), np.uint8)
-        closing = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, kernel)
-        
-        # Calculate ratio of filled vs sparse areas
-        density_ratio = np.sum(closing > 0) / max(np.sum(green_mask > 0), 1)
-        return min(density_ratio * 100, 100)
+    def _perceptual_hash(self, img_array: np.ndarray) -> str:
+        """64-bit DCT perceptual hash (pHash) as 16 hex characters; robust to rescaling, recompression and light crops"""
+        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        low_frequencies = cv2.dct(small)[:8, :8].flatten()
+        
+        # One bit per coefficient: above or below the median (the DC term is left out of the median)
+        bits = low_frequencies > np.median(low_frequencies[1:])
+        return "%016x" % int(np.packbits(bits).view(">u8")[0])
     
-    def _estimate_vegetation_health(self, img_hsv: np.ndarray, green_mask: np.ndarray) -> float:
-        """Estimate vegetation health based on color characteristics"""
-        if np.sum(green_mask) == 0:
-            return 0
+    def _get_buffers(self, shape: Tuple[int, int]) -> Dict[str, np.ndarray]:
+        """Scratch arrays reused across calls while the analysis resolution stays the same"""
+        buffers = getattr(self._buffers, "arrays", None)
+        if buffers is None or buffers["mask"].shape != shape:
+            buffers = {
+                "hsv": np.empty(shape + (3,), np.uint8),
+                "mask": np.empty(shape, np.uint8),
+                "closed": np.empty(shape, np.uint8)
+            }
+            self._buffers.arrays = buffers
+        return buffers
+    
+    def _vegetation_metrics(self, img_array: np.ndarray) -> Tuple[np.int64, float, float]:
+        """
+        Fused vegetation kernel: one HSV conversion and one green mask feed every metric
+        
+        Returns:
+            (green pixel count, vegetation density 0-100, vegetation health 0-100)
+        """
+        buffers = self._get_buffers(img_array.shape[:2])
         
-        # Extract green areas
-        green_areas = img_hsv[green_mask > 0]
+        # Convert to HSV for better vegetation detection
+        img_hsv = cv2.cvtColor(img_array, cv2.COLOR_RGB2HSV, dst=buffers["hsv"])
+        
+        # Create mask for green areas (vegetation)
+        green_mask = cv2.inRange(img_hsv, GREEN_HSV_LOWER, GREEN_HSV_UPPER, dst=buffers["mask"])
+        green_pixels = np.int64(cv2.countNonZero(green_mask))
+        
+        # Density: ratio of filled vs sparse areas after a morphological close
+        closing = cv2.morphologyEx(green_mask, cv2.MORPH_CLOSE, DENSITY_KERNEL, dst=buffers["closed"])
+        density_ratio = np.int64(cv2.countNonZero(closing)) / max(green_pixels, 1)
+        vegetation_density = min(density_ratio * 100, 100)
         
-        if len(green_areas) == 0:
-            return 0
+        if green_pixels == 0:
+            return green_pixels, vegetation_density, 0
         
-        # Analyze hue and saturation of green areas
-        avg_hue = np.mean(green_areas[:, 0])
-        avg_saturation = np.mean(green_areas[:, 1])
-        avg_value = np.mean(green_areas[:, 2])
+        # Masked mean in one pass without copying the green pixels out. cv2.mean scales by 1/count,
+        # so recover the exact integer channel sums first to keep the means identical to np.mean
+        channel_means = cv2.mean(img_hsv, mask=green_mask)
+        hue_sum, saturation_sum, value_sum = (np.rint(m * green_pixels) for m in channel_means[:3])
+        avg_hue = np.float64(hue_sum) / green_pixels
+        avg_saturation = np.float64(saturation_sum) / green_pixels
+        avg_value = np.float64(value_sum) / green_pixels
         
         # Healthy vegetation typically has:
         # - Hue around 60 (green)
@@ -310,7 +493,7 @@ class ImageAnalysisService:
         
         # Weighted average
         health_score = (hue_score * 0.4 + saturation_score * 0.4 + brightness_score * 0.2)
-        return min(health_score, 100)
+        return green_pixels, vegetation_density, min(health_score, 100)
     
     def _estimate_biomass_from_image(self, vegetation_analysis: Dict) -> float:
         """Estimate biomass based on vegetation analysis"""
@@ -362,6 +545,100 @@ class ImageAnalysisService:
         
         return round(min(score, 100), 1)
 
+    def resolution_accuracy_report(self, image_data: bytes,
+                                   max_dimensions: Tuple[int, ...] = (512, 1024, 2048)) -> Dict:
+        """
+        Compare bounded-resolution vegetation metrics against a full-resolution analysis
+        
+        Args:
+            image_data: Raw image bytes
+            max_dimensions: Analysis resolutions (longest side in pixels) to evaluate
+            
+        Returns:
+            Full-resolution metrics plus per-resolution metrics, absolute errors, timing and memory
+        """
+        def run(max_dimension: int) -> Dict:
+            image = Image.open(io.BytesIO(image_data))
+            started = time.perf_counter()
+            vegetation = self._analyze_vegetation(image, max_dimension=max_dimension)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            width, height = vegetation["analysis_resolution"]
+            return {
+                "max_dimension": max_dimension or None,
+                "vegetation_analysis": vegetation,
+                "biomass_estimate_kg_per_hectare": float(self._estimate_biomass_from_image(vegetation)),
+                "elapsed_ms": round(elapsed_ms, 1),
+                # RGB + HSV arrays dominate peak memory
+                "array_memory_mb": round(width * height * 6 / 1e6, 1)
+            }
+        
+        reference = run(0)
+        ref_vegetation = reference["vegetation_analysis"]
+        
+        results = []
+        for max_dimension in max_dimensions:
+            result = run(max_dimension)
+            vegetation = result["vegetation_analysis"]
+            result["absolute_error"] = {
+                metric: round(abs(float(vegetation[metric]) - float(ref_vegetation[metric])), 2)
+                for metric in ("green_percentage", "vegetation_density", "vegetation_health_score")
+            }
+            result["absolute_error"]["biomass_estimate_kg_per_hectare"] = round(
+                abs(result["biomass_estimate_kg_per_hectare"] - reference["biomass_estimate_kg_per_hectare"]), 2
+            )
+            result["speedup"] = round(reference["elapsed_ms"] / max(result["elapsed_ms"], 0.1), 1)
+            results.append(result)
+        
+        return {
+            "full_resolution": reference,
+            "bounded": results
+        }
+
+    def summarize_field_photos(self, analyses: List[Dict]) -> Dict:
+        """
+        Aggregate per-photo analyses of one field (e.g. a corner capture) into a field-level summary
+        
+        Args:
+            analyses: Results of analyze_field_photo / analyze_field_photo_with_gps
+            
+        Returns:
+            Biomass statistics and validation counts over the successfully analyzed photos
+        """
+        analyzed = [a for a in analyses if "vegetation_analysis" in a]
+        rejected_count = sum(1 for a in analyses if a.get("early_rejected"))
+        summary = {
+            "photo_count": len(analyses),
+            "analyzed_count": len(analyzed),
+            "rejected_count": rejected_count,
+            "failed_count": len(analyses) - len(analyzed) - rejected_count
+        }
+        if not analyzed:
+            summary.update({
+                "mean_biomass_kg_per_hectare": 0.0,
+                "field_validated": False
+            })
+            return summary
+        
+        biomass = np.array([a["biomass_estimate_kg_per_hectare"] for a in analyzed], dtype=float)
+        green = np.array([a["vegetation_analysis"]["green_percentage"] for a in analyzed], dtype=float)
+        scores = np.array([a["validation"]["overall_score"] for a in analyzed], dtype=float)
+        validated_count = int(np.sum(scores >= self.min_validation_score))
+        
+        summary.update({
+            "mean_biomass_kg_per_hectare": round(float(biomass.mean()), 2),
+            "min_biomass_kg_per_hectare": round(float(biomass.min()), 2),
+            "max_biomass_kg_per_hectare": round(float(biomass.max()), 2),
+            "biomass_std_kg_per_hectare": round(float(biomass.std()), 2),
+            "mean_green_percentage": round(float(green.mean()), 2),
+            "mean_validation_score": round(float(scores.mean()), 1),
+            "validated_count": validated_count,
+            "gps_valid_count": sum(1 for a in analyzed if a["validation"]["gps_valid"]),
+            "freshness_valid_count": sum(1 for a in analyzed if a["validation"]["freshness_valid"]),
+            # Every photo must pass on its own; one failed corner fails the field
+            "field_validated": bool(validated_count == len(analyses))
+        })
+        return summary
+
     def compare_with_satellite_ndvi(self, image_biomass: float, satellite_ndvi: float) -> Dict:
         """Compare image-based biomass with satellite NDVI data"""
         # Convert NDVI to expected biomass range (simplified)
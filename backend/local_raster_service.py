@@ -0,0 +1,224 @@
+"""
+Local raster NDVI backend.
+
+Computes the same per-scene field means as EarthEngineService, but from
+Sentinel-2 band files on disk (partner deliveries, offline development, load
+tests). Only the window around each field's bounding box is read, and each
+scene is opened once per batch of fields. Uncompressed GeoTIFFs are
+memory-mapped by GDAL; Cloud Optimized GeoTIFFs only decode the internal tiles
+the window overlaps.
+
+Scene layout: any directory tree containing a red band file with "B04" in its
+name and the matching NIR file with "B08" in the same place, e.g.
+    S2A_MSIL2A_20240115T113321_.../T26QPC_20240115T113321_B04_10m.tif
+    S2A_MSIL2A_20240115T113321_.../T26QPC_20240115T113321_B08_10m.tif
+The acquisition date is the first YYYYMMDD in the file path.
+
+rasterio is optional; without it (or without scenes) the service reports
+ee_available = False and callers fall back exactly as they do without Earth
+Engine credentials.
+"""
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional
+import numpy as np
+from earth_engine_service import EarthEngineService
+
+try:
+    import rasterio
+    from rasterio.features import geometry_mask
+    from rasterio.warp import transform as transform_coordinates, transform_bounds
+    from rasterio.windows import Window, from_bounds
+except ImportError:
+    rasterio = None
+
+BAND_FILE_EXTENSIONS = (".tif", ".tiff", ".jp2")
+SCENE_DATE_PATTERN = re.compile(r"(20\d{2})(0[1-9]|1[0-2])([0-2]\d|3[01])")
+
+# Let GDAL memory-map uncompressed GeoTIFFs instead of copying blocks through its cache
+RASTER_ENV_OPTIONS = {
+    "GTIFF_VIRTUAL_MEM_IO": "IF_ENOUGH_RAM",
+    "GDAL_DISABLE_READDIR_ON_OPEN": "EMPTY_DIR"
+}
+
+class LocalRasterNDVIService(EarthEngineService):
+    """EarthEngineService stand-in that reads B4/B8 from local GeoTIFF/COG/JP2 scenes"""
+
+    NDVI_COLLECTION = 'local-sentinel-2'
+    # Scene files carry only B04/B08, no scene classification to mask clouds with
+    SUPPORTS_COMPOSITES = False
+
+    def __init__(self, scenes_dir: str, boa_add_offset: float = 0, min_valid_pixels: int = 1):
+        # Deliberately does not call EarthEngineService.__init__: no Earth Engine session
+        self.scenes_dir = scenes_dir
+        # Processing baseline 04.00+ L2A products store reflectance * 10000 - 1000 (BOA_ADD_OFFSET)
+        self.boa_add_offset = boa_add_offset
+        self.min_valid_pixels = min_valid_pixels
+        self._scenes = []
+        self._scan_lock = threading.Lock()
+        self.ee_available = False
+        self.initialized_at = None
+        self.last_init_attempt_at = None
+        self.last_init_error = None
+
+        if rasterio is None:
+            print("⚠️  rasterio not installed, local NDVI scenes disabled")
+            return
+        self.initialize(retry_after_seconds=0)
+
+    def initialize(self, retry_after_seconds: Optional[float] = None) -> bool:
+        """Rescan the scenes directory if no scenes were found yet"""
+        if self._ee_available or rasterio is None or retry_after_seconds is None:
+            return bool(self._ee_available)
+        if self.last_init_attempt_at is not None and time.time() - self.last_init_attempt_at < retry_after_seconds:
+            return False
+        self.last_init_attempt_at = time.time()
+        self.ee_available = self.rescan() > 0
+        if self.ee_available:
+            self.initialized_at = datetime.utcnow()
+            self.last_init_error = None
+            print(f"🛰️  Local NDVI scenes: {len(self._scenes)} in {self.scenes_dir}")
+        else:
+            self.last_init_error = f"No Sentinel-2 scenes found in {self.scenes_dir}"
+            print(f"⚠️  {self.last_init_error}")
+        return self.ee_available
+
+    def ping(self):
+        if not os.path.isdir(self.scenes_dir):
+            raise FileNotFoundError(f"Scenes directory {self.scenes_dir} is gone")
+
+    def ndvi_query_params(self, composite: Optional[str] = None) -> Dict[str, Any]:
+        # Cached values are keyed on these, so local and Earth Engine results never mix
+        params = {
+            'collection': self.NDVI_COLLECTION,
+            'scenes_dir': os.path.abspath(self.scenes_dir),
+            'boa_add_offset': self.boa_add_offset
+        }
+        if composite:
+            params['composite'] = composite
+        return params
+
+    def set_request_deadline(self, milliseconds: int):
+        pass
+
+    def rescan(self) -> int:
+        """Index the scenes under scenes_dir; returns the number of scenes found"""
+        scenes = []
+        for directory, _, filenames in os.walk(self.scenes_dir):
+            for filename in filenames:
+                if "B04" not in filename or not filename.lower().endswith(BAND_FILE_EXTENSIONS):
+                    continue
+                red_path = os.path.join(directory, filename)
+                nir_path = os.path.join(directory, "B08".join(filename.rsplit("B04", 1)))
+                match = SCENE_DATE_PATTERN.search(red_path)
+                if match is None or not os.path.exists(nir_path):
+                    continue
+                try:
+                    with rasterio.open(red_path) as dataset:
+                        west, south, east, north = transform_bounds(dataset.crs, "EPSG:4326", *dataset.bounds)
+                except rasterio.errors.RasterioError as e:
+                    print(f"⚠️  Skipping unreadable scene {red_path}: {e}")
+                    continue
+                scenes.append({
+                    'date': datetime.strptime("".join(match.groups()), '%Y%m%d').strftime('%Y-%m-%d'),
+                    'red_path': red_path,
+                    'nir_path': nir_path,
+                    'bounds': (south, west, north, east)
+                })
+        scenes.sort(key=lambda scene: scene['date'])
+        with self._scan_lock:
+            self._scenes = scenes
+        return len(scenes)
+
+    def _calculate_ndvi_live(self, coordinates: List[List[float]],
+                             start_date: str, end_date: str) -> List[Dict[str, Any]]:
+        return self._reduce_fields([None], {None: coordinates}, start_date, end_date)[None]
+
+    def _calculate_ndvi_live_batch(self, fields: Dict[Hashable, List[List[float]]],
+                                   start_date: str, end_date: str,
+                                   composite: Optional[str] = None) -> Dict[Hashable, List[Dict[str, Any]]]:
+        # Local reads have no payload limit to split around
+        return self._reduce_fields(list(fields), fields, start_date, end_date, composite)
+
+    def _reduce_fields(self, keys: List[Hashable], fields: Dict[Hashable, List[List[float]]],
+                       start_date: str, end_date: str,
+                       composite: Optional[str] = None) -> Dict[Hashable, List[Dict[str, Any]]]:
+        if composite:
+            # main.py rejects composites for this backend before they get here
+            raise ValueError("Composites need Earth Engine; local scenes have no SCL band")
+        results = {key: [] for key in keys}
+        if not keys:
+            return results
+        polygons = [np.asarray(fields[key], dtype=float).reshape(-1, 2) for key in keys]
+        # (south, west, north, east) of every field, to find the fields each scene covers
+        field_bounds = np.array([
+            (polygon[:, 0].min(), polygon[:, 1].min(), polygon[:, 0].max(), polygon[:, 1].max())
+            for polygon in polygons
+        ])
+
+        with self._scan_lock:
+            scenes = [scene for scene in self._scenes if start_date <= scene['date'] < end_date]
+
+        with rasterio.Env(**RASTER_ENV_OPTIONS):
+            for scene in scenes:
+                south, west, north, east = scene['bounds']
+                overlapping = np.flatnonzero(
+                    (field_bounds[:, 0] <= north) & (field_bounds[:, 2] >= south) &
+                    (field_bounds[:, 1] <= east) & (field_bounds[:, 3] >= west)
+                )
+                if len(overlapping) == 0:
+                    continue
+                with rasterio.open(scene['red_path']) as red, rasterio.open(scene['nir_path']) as nir:
+                    for index in overlapping:
+                        ndvi = self._field_mean_ndvi(red, nir, polygons[index])
+                        if ndvi is not None:
+                            results[keys[index]].append({'date': scene['date'], 'ndvi_value': round(ndvi, 3)})
+
+        # Overlapping tiles can hold the same acquisition twice; keep one value per date like a daily mosaic
+        for key, series in results.items():
+            by_date = {}
+            for point in series:
+                by_date.setdefault(point['date'], []).append(point['ndvi_value'])
+            results[key] = [
+                {'date': day, 'ndvi_value': round(sum(values) / len(values), 3)}
+                for day, values in sorted(by_date.items())
+            ]
+        return results
+
+    def _field_mean_ndvi(self, red, nir, polygon: np.ndarray) -> Optional[float]:
+        """Mean NDVI of the pixels whose centers fall inside the [lat, lon] polygon"""
+        xs, ys = transform_coordinates("EPSG:4326", red.crs, polygon[:, 1].tolist(), polygon[:, 0].tolist())
+        bounds = from_bounds(min(xs), min(ys), max(xs), max(ys), transform=red.transform)
+        # Whole pixels covering the field, clipped to the raster
+        col_start = max(0, int(np.floor(bounds.col_off)))
+        row_start = max(0, int(np.floor(bounds.row_off)))
+        col_end = min(red.width, int(np.ceil(bounds.col_off + bounds.width)))
+        row_end = min(red.height, int(np.ceil(bounds.row_off + bounds.height)))
+        if col_end <= col_start or row_end <= row_start:
+            return None  # Field outside the raster
+        window = Window(col_start, row_start, col_end - col_start, row_end - row_start)
+
+        red_values = red.read(1, window=window).astype(np.float32)
+        nir_values = nir.read(1, window=window).astype(np.float32)
+        inside = geometry_mask(
+            [{'type': 'Polygon', 'coordinates': [list(zip(xs, ys))]}],
+            out_shape=red_values.shape,
+            transform=red.window_transform(window),
+            invert=True
+        )
+        valid = inside
+        for dataset, values in ((red, red_values), (nir, nir_values)):
+            nodata = dataset.nodata if dataset.nodata is not None else 0
+            valid &= values != nodata
+
+        red_values = red_values[valid] + self.boa_add_offset
+        nir_values = nir_values[valid] + self.boa_add_offset
+        total = nir_values + red_values
+        usable = total > 0
+        if np.count_nonzero(usable) < self.min_valid_pixels:
+            return None
+        ndvi = (nir_values[usable] - red_values[usable]) / total[usable]
+        return float(ndvi.mean())
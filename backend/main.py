@@ -1,20 +1,40 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import tuple_
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 import models, schemas, auth
 from database import SessionLocal, engine, Base
+from migrations import run_migrations
 import jwt_token as token_helper
 from jwt_token import verify_token
-from earth_engine_service import EarthEngineService
+from earth_engine_service import COMPOSITE_PERIODS, EarthEngineService
+from local_raster_service import LocalRasterNDVIService
+from earth_engine_client import EarthEngineClient
+from ndvi_cache import NDVITimeSeriesCache
+from ndvi_scheduler import NDVIRefreshScheduler
+from ndvi_store import DEMO_DATA_SOURCE, load_ndvi_series, not_demo, upsert_ndvi_rows
+from ndvi_rollups import island_for_coordinates, rollup_out
+from biomass import estimate_field_biomass
 from image_analysis_service import ImageAnalysisService
-from datetime import datetime, timedelta
+from analysis_pool import AnalysisPool, AnalysisQueueFull, AnalysisTimeout
+from analysis_cache import AnalysisCache
+from photo_hash_index import PerceptualHashIndex
+from photo_storage import PhotoStorage
+from datetime import date, datetime, timedelta
 from fastapi import Query
+from decouple import config
 import base64
+import hashlib
+import os
+import tempfile
+import numpy as np
 
 # Alustetaan tietokantataulut
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(title="CORC API", description="Carbon Credit API for farmers")
 
@@ -25,9 +45,120 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
-ee_service = EarthEngineService()
-image_service = ImageAnalysisService()
+# NDVI_BACKEND=local computes NDVI from Sentinel-2 scene files instead (offline use, partner scenes, load tests)
+if config("NDVI_BACKEND", default="earth-engine") == "local":
+    ee_service = LocalRasterNDVIService(
+        config("NDVI_SCENES_DIR", default="scenes"),
+        boa_add_offset=config("NDVI_BOA_ADD_OFFSET", default=0, cast=float)
+    )
+else:
+    ee_service = EarthEngineService()
+# Earth Engine calls with per-call timeouts, retries and a global concurrency limit
+ee_client = EarthEngineClient(
+    ee_service,
+    max_concurrent=config("EE_MAX_CONCURRENT", default=4, cast=int),
+    timeout_seconds=config("EE_TIMEOUT_SECONDS", default=20, cast=float),
+    # Per attempt for the scheduler's bulk requests, which may cover hundreds of fields
+    batch_timeout_seconds=config("EE_BATCH_TIMEOUT_SECONDS", default=120, cast=float),
+    max_attempts=config("EE_MAX_ATTEMPTS", default=3, cast=int),
+    # Stop calling Earth Engine after this many failed calls in a row, re-check after the reset time
+    failure_threshold=config("EE_BREAKER_FAILURES", default=5, cast=int),
+    breaker_reset_seconds=config("EE_BREAKER_RESET_SECONDS", default=60, cast=float),
+    probe_seconds=config("EE_HEALTH_PROBE_SECONDS", default=60, cast=float)
+)
+# Per-date NDVI from Earth Engine, fetched only for date ranges not queried before
+ndvi_cache = NDVITimeSeriesCache(
+    ee_client,
+    settle_days=config("NDVI_CACHE_SETTLE_DAYS", default=5, cast=int),
+    coalesce_ttl_seconds=config("NDVI_COALESCE_TTL_SECONDS", default=300, cast=float)
+)
+# weekly, 10day or monthly to store cloud-masked median composites instead of every scene
+ndvi_composite = config("NDVI_COMPOSITE", default="") or None
+if ndvi_composite is not None and ndvi_composite not in COMPOSITE_PERIODS:
+    raise ValueError(f"NDVI_COMPOSITE must be one of {', '.join(COMPOSITE_PERIODS)}")
+if ndvi_composite is not None and not ee_service.SUPPORTS_COMPOSITES:
+    raise ValueError("NDVI_COMPOSITE needs Earth Engine; unset it or use NDVI_BACKEND=earth-engine")
+# Keeps ndvi_data of every field up to date in the background
+ndvi_scheduler = NDVIRefreshScheduler(
+    ee_service,
+    ndvi_cache,
+    SessionLocal,
+    cadence_days=config("NDVI_REFRESH_DAYS", default=5, cast=int),
+    history_days=config("NDVI_HISTORY_DAYS", default=365, cast=int),
+    composite=ndvi_composite,
+    # Local development only: fields get demo rows while Earth Engine is unavailable (hidden from default reads)
+    store_demo_data=config("NDVI_STORE_DEMO_DATA", default=False, cast=bool)
+)
+image_service_settings = {
+    # Bounding the analysis resolution is faster but shifts the scores (see benchmark_analysis_resolution.py); 0 = full resolution
+    "analysis_max_dimension": config("ANALYSIS_MAX_DIMENSION", default=0, cast=int) or None
+}
+image_service = ImageAnalysisService(**image_service_settings)
+
+# Photo analysis runs in its own process pool instead of the shared request threadpool
+analysis_pool = AnalysisPool(
+    max_workers=config("ANALYSIS_WORKERS", default=2, cast=int),
+    max_queue_size=config("ANALYSIS_QUEUE_SIZE", default=8, cast=int),
+    job_timeout_seconds=config("ANALYSIS_TIMEOUT_SECONDS", default=30, cast=float),
+    service_kwargs=image_service_settings
+)
+
+# Identical photo resubmissions are answered from cache
+analysis_cache = AnalysisCache(
+    db_path=config("ANALYSIS_CACHE_PATH", default="analysis_cache.db"),
+    max_memory_entries=config("ANALYSIS_CACHE_MEMORY_ENTRIES", default=256, cast=int),
+    max_db_entries=config("ANALYSIS_CACHE_DB_ENTRIES", default=10000, cast=int),
+    ttl_seconds=config("ANALYSIS_CACHE_TTL_SECONDS", default=3600, cast=float)
+)
+
+# Perceptual hashes of every stored photo, for reused/near-duplicate photo detection
+photo_index = PerceptualHashIndex(
+    max_distance=config("PHOTO_DUPLICATE_MAX_DISTANCE", default=6, cast=int)
+)
+
+# Originals and their thumbnail/medium renditions for the app and dashboard
+photo_storage = PhotoStorage(
+    root=config("PHOTO_STORAGE_DIR", default="uploads/photos"),
+    jpeg_quality=config("PHOTO_JPEG_QUALITY", default=80, cast=int),
+    webp_quality=config("PHOTO_WEBP_QUALITY", default=75, cast=int)
+)
+
+@app.on_event("startup")
+def load_photo_index():
+    db = SessionLocal()
+    try:
+        photos = db.query(
+            models.FieldPhoto.id, models.FieldPhoto.field_id, models.Field.owner_id, models.FieldPhoto.perceptual_hash
+        ).join(models.Field).filter(models.FieldPhoto.perceptual_hash.isnot(None)).all()
+        for photo_id, field_id, owner_id, perceptual_hash in photos:
+            photo_index.add(photo_id, int(perceptual_hash, 16), {"field_id": field_id, "owner_id": owner_id})
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def start_analysis_pool():
+    analysis_pool.warm_up()
+
+@app.on_event("startup")
+def start_earth_engine_probe():
+    # Authenticates in the background, so the first NDVI request doesn't wait for it
+    if ee_client.probe_seconds > 0:
+        ee_client.start_health_probe()
+
+@app.on_event("startup")
+def start_ndvi_scheduler():
+    if config("NDVI_SCHEDULER_ENABLED", default=True, cast=bool):
+        ndvi_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_analysis_pool():
+    ndvi_scheduler.stop()
+    ee_client.shutdown()
+    analysis_pool.shutdown()
+    analysis_cache.close()
+    photo_storage.shutdown()
 
 # Riippuvuus: tietokantayhteys
 def get_db():
@@ -50,6 +181,11 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+@app.get("/status/earth-engine")
+def get_earth_engine_status():
+    """Initialization, circuit breaker state and last successful call of the NDVI backend"""
+    return ee_client.status()
+
 # Auth endpoints
 @app.post("/register", response_model=schemas.UserOut)
 def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
@@ -94,52 +230,176 @@ def create_field(field: schemas.FieldCreate, current_user: models.User = Depends
         area_hectares=field.area_hectares
     )
     db.add(new_field)
+    db.flush()
+    # First NDVI refresh runs right away in the background
+    db.add(models.NDVIRefreshJob(field_id=new_field.id, next_run_at=datetime.utcnow()))
     db.commit()
     db.refresh(new_field)
+    ndvi_scheduler.wake()
     return new_field
 
 @app.get("/fields", response_model=List[schemas.FieldOut])
 def get_user_fields(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
     return db.query(models.Field).filter(models.Field.owner_id == current_user.id).all()
 
+def encode_ndvi_cursor(row_date: datetime, row_id: int) -> str:
+    """Opaque keyset cursor: the (date, id) of the last row of a page"""
+    return base64.urlsafe_b64encode(f"{row_date.isoformat()}|{row_id}".encode()).decode().rstrip("=")
+
+def decode_ndvi_cursor(cursor: str) -> tuple:
+    try:
+        row_date, row_id = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode().split("|")
+        return datetime.fromisoformat(row_date), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/fields/{field_id}/ndvi", response_model=List[schemas.NDVIDataOut])
-def get_field_ndvi(field_id: int, days_back: int = 90, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+def get_field_ndvi(
+    field_id: int,
+    response: Response,
+    days_back: int = 90,
+    from_date: Optional[date] = Query(None, alias="from", description="First date (YYYY-MM-DD); replaces days_back"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last date (YYYY-MM-DD), inclusive"),
+    source: Optional[str] = Query(None, description="Only this data source, e.g. sentinel-2; all but demo if omitted"),
+    limit: int = Query(1000, ge=1, le=5000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor of the previous page"),
+    format: str = Query("rows", pattern="^(rows|columns)$", description="columns: parallel arrays instead of row objects"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Stored NDVI of a field in date order, a page of at most `limit` rows at a time"""
     # Verify field ownership
     field = db.query(models.Field).filter(models.Field.id == field_id, models.Field.owner_id == current_user.id).first()
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
     
-    # Check if we have recent NDVI data
-    recent_data = db.query(models.NDVIData).filter(
-        models.NDVIData.field_id == field_id,
-        models.NDVIData.date >= datetime.now() - timedelta(days=7)
-    ).all()
-    
-    if not recent_data:
-        # Calculate new NDVI data
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days_back)
-        
-        ndvi_results = ee_service.calculate_ndvi_for_field(
-            field.coordinates,
-            start_date.strftime('%Y-%m-%d'),
-            end_date.strftime('%Y-%m-%d')
-        )
-        
-        # Save to database
-        for result in ndvi_results:
-            ndvi_data = models.NDVIData(
-                field_id=field_id,
-                date=datetime.strptime(result['date'], '%Y-%m-%d'),
-                ndvi_value=result['ndvi_value'],
-                biomass_estimate=ee_service.estimate_biomass_from_ndvi(result['ndvi_value'])
-            )
-            db.add(ndvi_data)
-        
-        db.commit()
-    
-    # Return all NDVI data for the field
-    return db.query(models.NDVIData).filter(models.NDVIData.field_id == field_id).order_by(models.NDVIData.date).all()
+    # Rows are precomputed by the background NDVI scheduler; Earth Engine is never queried here
+    since = datetime.combine(from_date, datetime.min.time()) if from_date else datetime.now() - timedelta(days=days_back)
+    columns = [models.NDVIData] if format == "rows" else [
+        models.NDVIData.id, models.NDVIData.date, models.NDVIData.ndvi_value,
+        models.NDVIData.biomass_estimate, models.NDVIData.data_source
+    ]
+    query = db.query(*columns).filter(models.NDVIData.field_id == field_id, models.NDVIData.date >= since)
+    if source is not None:
+        query = query.filter(models.NDVIData.data_source == source)
+    else:
+        query = query.filter(not_demo(models.NDVIData.data_source))
+    if to_date is not None:
+        query = query.filter(models.NDVIData.date < datetime.combine(to_date + timedelta(days=1), datetime.min.time()))
+    if cursor is not None:
+        # Keyset: continue after the last row of the previous page, served by the (field_id, date, ...) index
+        query = query.filter(tuple_(models.NDVIData.date, models.NDVIData.id) > decode_ndvi_cursor(cursor))
+    rows = query.order_by(models.NDVIData.date, models.NDVIData.id).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_ndvi_cursor(rows[-1].date, rows[-1].id)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    if format == "columns":
+        # Plain lists, serialized without building a model per row
+        return JSONResponse({
+            "field_id": field_id,
+            "dates": [row.date.strftime("%Y-%m-%d") for row in rows],
+            "ndvi": [row.ndvi_value for row in rows],
+            "biomass": [row.biomass_estimate for row in rows],
+            "data_sources": [row.data_source for row in rows],
+            "next_cursor": next_cursor
+        }, headers=headers)
+    response.headers.update(headers)
+    return rows
+
+def rounded_values(values, decimals: int) -> list:
+    """float32 array as JSON-safe rounded floats, None for NaN"""
+    rounded = np.round(values.astype(float), decimals)
+    return [None if np.isnan(value) else value for value in rounded.tolist()]
+
+@app.get("/fields/{field_id}/ndvi/series")
+def get_field_ndvi_series(
+    field_id: int,
+    source: Optional[str] = Query(None, description="Only this data source, e.g. sentinel-2; all but demo if omitted"),
+    from_date: Optional[date] = Query(None, alias="from", description="First date (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Last date (YYYY-MM-DD), inclusive"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Whole stored NDVI history of a field per data source, as parallel arrays read from the packed series"""
+    field = db.query(models.Field).filter(models.Field.id == field_id, models.Field.owner_id == current_user.id).first()
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+
+    series = {}
+    for data_source, arrays in load_ndvi_series(db, field_id, source).items():
+        if source is None and data_source == DEMO_DATA_SOURCE:
+            continue
+        dates = arrays.dates
+        # Both bounds by binary search on the sorted day offsets
+        first = np.searchsorted(dates, np.datetime64(from_date, "D")) if from_date else 0
+        last = np.searchsorted(dates, np.datetime64(to_date, "D"), side="right") if to_date else len(dates)
+        series[data_source] = {
+            "dates": dates[first:last].astype(str).tolist(),
+            "ndvi": rounded_values(arrays.ndvi[first:last], 3),
+            "biomass": rounded_values(arrays.biomass[first:last], 2)
+        }
+    return JSONResponse({"field_id": field_id, "series": series})
+
+def rollup_query(query, rollup_model, period: str, source: Optional[str],
+                 from_date: Optional[date], to_date: Optional[date]):
+    """Filter rollups to one period, one source (all but demo by default) and buckets starting in [from, to]"""
+    query = query.filter(rollup_model.period == period)
+    if source is not None:
+        query = query.filter(rollup_model.data_source == source)
+    else:
+        query = query.filter(not_demo(rollup_model.data_source))
+    if from_date is not None:
+        query = query.filter(rollup_model.period_start >= from_date)
+    if to_date is not None:
+        query = query.filter(rollup_model.period_start <= to_date)
+    return query.order_by(rollup_model.period_start, rollup_model.data_source)
+
+@app.get("/fields/{field_id}/ndvi/rollups")
+def get_field_ndvi_rollups(
+    field_id: int,
+    period: str = Query("month", pattern="^(day|month|season)$"),
+    source: Optional[str] = Query(None, description="Only this data source, e.g. sentinel-2; all but demo if omitted"),
+    from_date: Optional[date] = Query(None, alias="from", description="Buckets starting on or after (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Buckets starting on or before (YYYY-MM-DD)"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Precomputed daily, monthly or seasonal NDVI and biomass means and maxima of a field"""
+    field = db.query(models.Field).filter(models.Field.id == field_id, models.Field.owner_id == current_user.id).first()
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+    query = db.query(models.NDVIFieldRollup).filter(
+        models.NDVIFieldRollup.field_id == field_id,
+        models.NDVIFieldRollup.observation_count > 0
+    )
+    rollups = rollup_query(query, models.NDVIFieldRollup, period, source, from_date, to_date).all()
+    return {
+        "field_id": field_id,
+        "island": island_for_coordinates(field.coordinates),
+        "rollups": [rollup_out(rollup) for rollup in rollups]
+    }
+
+@app.get("/islands/ndvi/rollups")
+def get_island_ndvi_rollups(
+    island: Optional[str] = Query(None, description="e.g. Santiago, Fogo, Santo_Antao; all islands if omitted"),
+    period: str = Query("month", pattern="^(day|month|season)$"),
+    source: Optional[str] = Query(None, description="Only this data source, e.g. sentinel-2; all but demo if omitted"),
+    from_date: Optional[date] = Query(None, alias="from", description="Buckets starting on or after (YYYY-MM-DD)"),
+    to_date: Optional[date] = Query(None, alias="to", description="Buckets starting on or before (YYYY-MM-DD)"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Precomputed NDVI and biomass aggregates over all fields of each island, for the dashboard"""
+    query = db.query(models.NDVIIslandRollup).filter(models.NDVIIslandRollup.observation_count > 0)
+    if island is not None:
+        query = query.filter(models.NDVIIslandRollup.island == island)
+    islands = {}
+    for rollup in rollup_query(query, models.NDVIIslandRollup, period, source, from_date, to_date):
+        islands.setdefault(rollup.island, []).append(dict(rollup_out(rollup), fields=rollup.field_count))
+    return {"period": period, "islands": islands}
 
 @app.post("/fields/{field_id}/planting-report", response_model=schemas.PlantingReportOut)
 def create_planting_report(field_id: int, report: schemas.PlantingReportCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
@@ -156,19 +416,57 @@ def create_planting_report(field_id: int, report: schemas.PlantingReportCreate,
         notes=report.notes
     )
     db.add(new_report)
+    db.flush()
+    refresh_stored_biomass(db, field_id, since=report.planting_date)
     db.commit()
     db.refresh(new_report)
     return new_report
 
+def field_planting_reports(db: Session, field_id: int) -> list:
+    """(planting_date, crop_type) of every planting report of the field"""
+    return db.query(models.PlantingReport.planting_date, models.PlantingReport.crop_type).filter(
+        models.PlantingReport.field_id == field_id
+    ).all()
+
+def refresh_stored_biomass(db: Session, field_id: int, since: datetime):
+    """Re-estimate stored biomass from a new planting date on, now that the crop is known (caller commits)"""
+    rows = db.query(
+        models.NDVIData.date, models.NDVIData.ndvi_value, models.NDVIData.data_source
+    ).filter(
+        models.NDVIData.field_id == field_id,
+        models.NDVIData.date >= since
+    ).all()
+    if not rows:
+        return
+    biomass = estimate_field_biomass(
+        [row.date for row in rows], [row.ndvi_value for row in rows], field_planting_reports(db, field_id)
+    )
+    upsert_ndvi_rows(db, [
+        {
+            "field_id": field_id,
+            "date": row.date,
+            "ndvi_value": row.ndvi_value,
+            "biomass_estimate": row_biomass,
+            "data_source": row.data_source
+        }
+        for row, row_biomass in zip(rows, biomass.tolist())
+    ])
+
 @app.get("/fields/{field_id}/ndvi/satellite")
 def get_satellite_ndvi_data(
     field_id: int, 
     start_date: str = Query(..., description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(..., description="End date (YYYY-MM-DD)"),
+    composite: Optional[str] = Query(None, description="weekly, 10day or monthly cloud-masked median composites"),
     current_user: models.User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
     """Get fresh NDVI data directly from satellite (Google Earth Engine)"""
+    if composite is not None and composite not in COMPOSITE_PERIODS:
+        raise HTTPException(status_code=400, detail=f"composite must be one of {', '.join(COMPOSITE_PERIODS)}")
+    if composite is not None and not ee_service.SUPPORTS_COMPOSITES:
+        raise HTTPException(status_code=400, detail="Composites need Earth Engine; not available with NDVI_BACKEND=local")
+    
     # Verify field ownership
     field = db.query(models.Field).filter(
         models.Field.id == field_id, 
@@ -177,31 +475,42 @@ def get_satellite_ndvi_data(
     if not field:
         raise HTTPException(status_code=404, detail="Field not found")
     
-    # Get fresh satellite data
+    # Get satellite data (only dates not fetched before go to Earth Engine)
     try:
-        ndvi_data = ee_service.calculate_ndvi_for_field(
+        series = ndvi_cache.get_series(
+            db,
             field.coordinates, 
             start_date, 
-            end_date
+            end_date,
+            composite
         )
         
         # Format response
-        satellite_results = []
-        for data_point in ndvi_data:
-            biomass = ee_service.estimate_biomass_from_ndvi(data_point['ndvi_value'])
-            satellite_results.append({
-                "date": data_point['date'],
-                "ndvi_value": data_point['ndvi_value'],
-                "biomass_estimate": biomass,
-                "data_source": "live_satellite",
+        point_source = "demo" if series["data_source"] == "demo" else "live_satellite"
+        biomass = estimate_field_biomass(
+            [datetime.strptime(data_point['date'], "%Y-%m-%d") for data_point in series["ndvi_data"]],
+            [data_point['ndvi_value'] for data_point in series["ndvi_data"]],
+            field_planting_reports(db, field_id)
+        )
+        satellite_results = [
+            {
+                **data_point,  # Composites also have end_date, pixel_count and scene_count
+                "biomass_estimate": point_biomass,
+                "data_source": point_source,
                 "field_id": field_id
-            })
+            }
+            for data_point, point_biomass in zip(series["ndvi_data"], biomass.tolist())
+        ]
         
         return {
             "field_id": field_id,
             "field_name": field.name,
-            "data_source": "Google Earth Engine (Live)",
+            "data_source": "Demo data (Earth Engine not available)" if series["data_source"] == "demo" else "Google Earth Engine (Live)",
+            # True when Earth Engine failed and only cached (or demo) data could be returned
+            "degraded": series["degraded"],
+            "degraded_reason": series["degraded_reason"],
             "date_range": f"{start_date} to {end_date}",
+            "composite": composite,
             "total_datapoints": len(satellite_results),
             "ndvi_data": satellite_results
         }
@@ -210,12 +519,173 @@ def get_satellite_ndvi_data(
         raise HTTPException(status_code=500, detail=f"Satellite data error: {str(e)}")
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Union
 
 class PhotoAnalysisRequest(BaseModel):
     photo_base64: str
     gps_latitude: Optional[float] = None
     gps_longitude: Optional[float] = None
+    early_reject: bool = False  # Skip pixel analysis if EXIF freshness/GPS already rule out a pass
+
+class BatchPhotoAnalysisRequest(BaseModel):
+    photos: List[PhotoAnalysisRequest]
+
+# Must fit in the analysis queue (ANALYSIS_WORKERS + ANALYSIS_QUEUE_SIZE) or every batch gets a 503
+MAX_BATCH_PHOTOS = config("MAX_BATCH_PHOTOS", default=8, cast=int)
+
+# Multipart uploads are spooled here before analysis (defaults to the system temp dir)
+UPLOAD_TMP_DIR = config("UPLOAD_TMP_DIR", default=None)
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+METADATA_MAX_HEADER_BYTES = 256 * 1024
+
+def build_photo_analysis_call(image_data: Union[bytes, str], field: models.Field,
+                              gps_latitude: Optional[float], gps_longitude: Optional[float],
+                              early_reject: bool = False) -> tuple:
+    """Pick the analysis method and arguments for one photo"""
+    # Use GPS coordinates from the app if provided, otherwise try EXIF
+    if gps_latitude is not None and gps_longitude is not None:
+        return "analyze_field_photo_with_gps", {
+            "image_data": image_data,
+            "expected_coords": field.coordinates,
+            "photo_gps_coords": [gps_latitude, gps_longitude]
+        }
+    return "analyze_field_photo", {
+        "image_data": image_data,
+        "expected_coords": field.coordinates,
+        "early_reject": early_reject
+    }
+
+def get_recent_satellite_ndvi(db: Session, field: models.Field) -> Optional[float]:
+    """Latest precomputed NDVI value of the field from the last 30 days, demo rows excluded"""
+    latest = db.query(models.NDVIData).filter(
+        models.NDVIData.field_id == field.id,
+        models.NDVIData.date >= datetime.now() - timedelta(days=30),
+        not_demo(models.NDVIData.data_source)
+    ).order_by(models.NDVIData.date.desc()).first()
+    if latest is None:
+        return None
+    return latest.ndvi_value
+
+def analysis_busy_error(e: AnalysisQueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Photo analysis is busy, please retry shortly",
+        headers={"Retry-After": str(e.retry_after_seconds)}
+    )
+
+def photo_cache_key(content_hash: str, field: models.Field,
+                    gps_latitude: Optional[float], gps_longitude: Optional[float],
+                    early_reject: bool = False) -> str:
+    return AnalysisCache.make_key(
+        content_hash,
+        field_id=field.id,
+        coordinates=field.coordinates,
+        gps=[gps_latitude, gps_longitude],
+        early_reject=early_reject,
+        params=image_service_settings
+    )
+
+def record_field_photo(db: Session, field: models.Field, analysis_result: dict, content_hash: str,
+                       image_data: Union[bytes, str]) -> dict:
+    """Store the photo and its hashes, and report earlier photos that look the same"""
+    photo_hash = int(analysis_result["perceptual_hash"], 16)
+    
+    duplicate_matches = []
+    for photo_id, distance, info in photo_index.query(photo_hash):
+        same_owner = info["owner_id"] == field.owner_id
+        duplicate_matches.append({
+            "photo_id": photo_id,
+            "hamming_distance": distance,
+            "same_field": info["field_id"] == field.id,
+            "same_owner": same_owner,
+            # Other farmers' field ids are not exposed
+            "field_id": info["field_id"] if same_owner else None
+        })
+    
+    photo = models.FieldPhoto(
+        field_id=field.id,
+        content_hash=content_hash,
+        perceptual_hash=analysis_result["perceptual_hash"],
+        validation_score=analysis_result["validation"]["overall_score"]
+    )
+    db.add(photo)
+    db.commit()
+    db.refresh(photo)
+    photo_index.add(photo.id, photo_hash, {"field_id": field.id, "owner_id": field.owner_id})
+    
+    try:
+        photo_storage.save_original(photo.id, image_data)
+        photo_storage.schedule_renditions(photo.id)
+    except Exception as e:
+        # The analysis result is still valid without a stored copy of the photo
+        print(f"⚠️ Could not store photo {photo.id}: {e}")
+    
+    return {"photo_id": photo.id, "duplicate_matches": duplicate_matches}
+
+def analyze_photo_for_field(db: Session, field: models.Field, image_data: Union[bytes, str],
+                            gps_latitude: Optional[float], gps_longitude: Optional[float],
+                            content_hash: str, early_reject: bool = False) -> dict:
+    """Run the photo analysis in the pool and compare it with recent satellite NDVI"""
+    cache_key = photo_cache_key(content_hash, field, gps_latitude, gps_longitude, early_reject)
+    cached_response = analysis_cache.get(cache_key)
+    if cached_response is not None:
+        cached_response["cached"] = True
+        return cached_response
+    
+    try:
+        method_name, kwargs = build_photo_analysis_call(
+            image_data, field, gps_latitude, gps_longitude, early_reject
+        )
+        analysis_result = analysis_pool.run(method_name, **kwargs)
+        
+        # Compare with satellite if available (not needed for photos rejected on metadata)
+        latest_ndvi = None if analysis_result.get("early_rejected") else get_recent_satellite_ndvi(db, field)
+        satellite_comparison = None
+        if latest_ndvi is not None:
+            satellite_comparison = image_service.compare_with_satellite_ndvi(
+                analysis_result['biomass_estimate_kg_per_hectare'],
+                latest_ndvi
+            )
+        
+        response = {
+            "field_id": field.id,
+            "field_name": field.name,
+            "image_analysis": analysis_result,
+            "satellite_comparison": satellite_comparison,
+            "analysis_timestamp": datetime.now().isoformat(),
+            "recommendations": generate_recommendations(analysis_result, satellite_comparison)
+        }
+        if "perceptual_hash" in analysis_result:
+            response.update(record_field_photo(db, field, analysis_result, content_hash, image_data))
+        if "error" not in analysis_result:
+            analysis_cache.set(cache_key, response)
+        response["cached"] = False
+        return response
+        
+    except AnalysisQueueFull as e:
+        raise analysis_busy_error(e)
+    except AnalysisTimeout as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Photo analysis error: {str(e)}")
+
+def spool_upload_to_temp_file(upload: UploadFile) -> tuple:
+    """
+    Copy an uploaded photo to a temp file in chunks so it never sits in memory as one bytes object
+    
+    Returns:
+        (temp file path, SHA-256 hex digest of the content)
+    """
+    suffix = os.path.splitext(upload.filename or "")[1] or ".jpg"
+    content_hash = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(suffix=suffix, dir=UPLOAD_TMP_DIR, delete=False) as spooled:
+        while True:
+            chunk = upload.file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            content_hash.update(chunk)
+            spooled.write(chunk)
+        return spooled.name, content_hash.hexdigest()
 
 @app.post("/fields/{field_id}/photos/analyze")
 def analyze_field_photo(
@@ -236,65 +706,234 @@ def analyze_field_photo(
     try:
         # Decode base64 image
         image_data = base64.b64decode(request.photo_base64)
-        
-        # Use GPS coordinates from JSON if provided, otherwise try EXIF
-        if request.gps_latitude is not None and request.gps_longitude is not None:
-            # Use GPS coordinates from Flutter app
-            provided_gps = [request.gps_latitude, request.gps_longitude]
-            print(f"📍 GPS from Flutter app: {request.gps_latitude:.6f}, {request.gps_longitude:.6f}")
-            
-            # Analyze the image with provided GPS
-            analysis_result = image_service.analyze_field_photo_with_gps(
-                image_data=image_data,
-                expected_coords=field.coordinates,
-                photo_gps_coords=provided_gps
-            )
-        else:
-            # Fallback to EXIF metadata method
-            analysis_result = image_service.analyze_field_photo(
-                image_data=image_data,
-                expected_coords=field.coordinates
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Photo analysis error: {str(e)}")
+    
+    return analyze_photo_for_field(
+        db, field, image_data, request.gps_latitude, request.gps_longitude,
+        content_hash=AnalysisCache.hash_content(image_data),
+        early_reject=request.early_reject
+    )
+
+@app.post("/fields/{field_id}/photos/analyze-upload")
+def analyze_field_photo_upload(
+    field_id: int,
+    photo: UploadFile = File(...),
+    gps_latitude: Optional[float] = Form(None),
+    gps_longitude: Optional[float] = Form(None),
+    early_reject: bool = Form(False),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Analyze a field photo sent as multipart/form-data (no base64 inflation)"""
+    # Verify field ownership
+    field = db.query(models.Field).filter(
+        models.Field.id == field_id, 
+        models.Field.owner_id == current_user.id
+    ).first()
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+    
+    # The worker process opens the photo from disk, so only the path crosses the process boundary
+    photo_path, content_hash = spool_upload_to_temp_file(photo)
+    try:
+        return analyze_photo_for_field(
+            db, field, photo_path, gps_latitude, gps_longitude, content_hash, early_reject
+        )
+    finally:
+        os.remove(photo_path)
+
+@app.post("/fields/{field_id}/photos/metadata")
+def check_field_photo_metadata(
+    field_id: int,
+    photo: UploadFile = File(...),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Check a photo's EXIF timestamp and GPS before uploading it in full
+    
+    The app can send just the first part of the file (the EXIF block sits at the start of
+    a JPEG); only the header is read and no pixels are decoded.
+    """
+    # Verify field ownership
+    field = db.query(models.Field).filter(
+        models.Field.id == field_id, 
+        models.Field.owner_id == current_user.id
+    ).first()
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+    
+    header = image_service.read_photo_metadata(photo.file, max_header_bytes=METADATA_MAX_HEADER_BYTES)
+    assessment = image_service.assess_photo_metadata(header["metadata"], field.coordinates, header["image_size"])
+    
+    return {
+        "field_id": field_id,
+        "metadata": header["metadata"],
+        "image_size": header["image_size"],
+        "validation": assessment
+    }
+
+@app.post("/fields/{field_id}/photos/analyze-batch")
+def analyze_field_photos_batch(
+    field_id: int,
+    request: BatchPhotoAnalysisRequest,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Analyze all photos of a field capture (e.g. the four corners) in one request"""
+    # Verify field ownership
+    field = db.query(models.Field).filter(
+        models.Field.id == field_id, 
+        models.Field.owner_id == current_user.id
+    ).first()
+    if not field:
+        raise HTTPException(status_code=404, detail="Field not found")
+    
+    if not request.photos:
+        raise HTTPException(status_code=400, detail="No photos in batch")
+    if len(request.photos) > MAX_BATCH_PHOTOS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_PHOTOS} photos per batch")
+    
+    try:
+        cache_keys = []
+        cached_responses = {}
+        calls = []
+        content_hashes = []
+        batch_image_data = []
+        for index, photo in enumerate(request.photos):
+            image_data = base64.b64decode(photo.photo_base64)
+            batch_image_data.append(image_data)
+            content_hashes.append(AnalysisCache.hash_content(image_data))
+            cache_key = photo_cache_key(
+                content_hashes[index], field, photo.gps_latitude, photo.gps_longitude, photo.early_reject
             )
-            
-            # Debug: Print metadata info for EXIF method
-            if "metadata" in analysis_result:
-                print(f"📷 Photo metadata keys: {list(analysis_result['metadata'].keys())}")
-                if "gps_coords" in analysis_result["metadata"]:
-                    gps_coords = analysis_result["metadata"]["gps_coords"]
-                    print(f"📍 Photo GPS coordinates from EXIF: {gps_coords[0]:.6f}, {gps_coords[1]:.6f}")
-                else:
-                    print("📍 No GPS coordinates found in photo metadata")
+            cache_keys.append(cache_key)
+            cached_response = analysis_cache.get(cache_key)
+            if cached_response is not None:
+                cached_responses[index] = cached_response
             else:
-                print("📷 No metadata found in photo")
+                calls.append(build_photo_analysis_call(
+                    image_data, field, photo.gps_latitude, photo.gps_longitude, photo.early_reject
+                ))
         
-        # Get recent satellite data for comparison
-        recent_satellite_data = ee_service.calculate_ndvi_for_field(
-            field.coordinates,
-            (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d'),
-            datetime.now().strftime('%Y-%m-%d')
-        )
+        # Uncached photos are queued together; the satellite query runs while the workers analyze them
+        futures = iter(analysis_pool.submit_many(calls)) if calls else iter([])
+        latest_ndvi = get_recent_satellite_ndvi(db, field)
         
-        # Compare with satellite if available
-        satellite_comparison = None
-        if recent_satellite_data:
-            latest_ndvi = recent_satellite_data[-1]['ndvi_value']
-            satellite_comparison = image_service.compare_with_satellite_ndvi(
-                analysis_result['biomass_estimate_kg_per_hectare'],
+        photo_results = []
+        for index, cache_key in enumerate(cache_keys):
+            if index in cached_responses:
+                cached_response = cached_responses[index]
+                photo_results.append({
+                    "photo_index": index,
+                    "image_analysis": cached_response["image_analysis"],
+                    "satellite_comparison": cached_response["satellite_comparison"],
+                    "recommendations": cached_response["recommendations"],
+                    "photo_id": cached_response.get("photo_id"),
+                    "duplicate_matches": cached_response.get("duplicate_matches", []),
+                    "cached": True
+                })
+                continue
+            
+            analysis_result = analysis_pool.result(next(futures))
+            satellite_comparison = None
+            if latest_ndvi is not None and not analysis_result.get("early_rejected"):
+                satellite_comparison = image_service.compare_with_satellite_ndvi(
+                    analysis_result['biomass_estimate_kg_per_hectare'],
+                    latest_ndvi
+                )
+            photo_result = {
+                "photo_index": index,
+                "image_analysis": analysis_result,
+                "satellite_comparison": satellite_comparison,
+                "recommendations": generate_recommendations(analysis_result, satellite_comparison)
+            }
+            if "perceptual_hash" in analysis_result:
+                photo_result.update(record_field_photo(
+                    db, field, analysis_result, content_hashes[index], batch_image_data[index]
+                ))
+            if "error" not in analysis_result:
+                # Same shape as the single-photo response, so either endpoint can reuse the entry
+                analysis_cache.set(cache_key, {
+                    "field_id": field.id,
+                    "field_name": field.name,
+                    "image_analysis": analysis_result,
+                    "satellite_comparison": satellite_comparison,
+                    "analysis_timestamp": datetime.now().isoformat(),
+                    "recommendations": photo_result["recommendations"],
+                    "photo_id": photo_result.get("photo_id"),
+                    "duplicate_matches": photo_result.get("duplicate_matches", [])
+                })
+            photo_result["cached"] = False
+            photo_results.append(photo_result)
+        
+        field_summary = image_service.summarize_field_photos(
+            [result["image_analysis"] for result in photo_results]
+        )
+        field_satellite_comparison = None
+        if latest_ndvi is not None and field_summary["analyzed_count"]:
+            field_satellite_comparison = image_service.compare_with_satellite_ndvi(
+                field_summary["mean_biomass_kg_per_hectare"],
                 latest_ndvi
             )
         
         return {
             "field_id": field_id,
             "field_name": field.name,
-            "image_analysis": analysis_result,
-            "satellite_comparison": satellite_comparison,
-            "analysis_timestamp": datetime.now().isoformat(),
-            "recommendations": generate_recommendations(analysis_result, satellite_comparison)
+            "photos": photo_results,
+            "field_summary": field_summary,
+            "satellite_comparison": field_satellite_comparison,
+            "analysis_timestamp": datetime.now().isoformat()
         }
         
+    except AnalysisQueueFull as e:
+        raise analysis_busy_error(e)
+    except AnalysisTimeout as e:
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Photo analysis error: {str(e)}")
 
+# A stored photo never changes, so clients may keep it for a year
+PHOTO_CACHE_CONTROL = "private, max-age=31536000, immutable"
+
+@app.get("/photos/{photo_id}")
+def get_field_photo(
+    photo_id: int,
+    request: Request,
+    size: str = Query("medium", pattern="^(thumb|medium|original)$", description="thumb, medium or original"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$", description="Override the format picked from Accept"),
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Serve a stored field photo at the requested size
+
+    thumb and medium are sent as WebP when the client's Accept header allows it and as
+    JPEG otherwise; original is the photo exactly as uploaded.
+    """
+    # Verify photo ownership through its field
+    photo = db.query(models.FieldPhoto).join(models.Field).filter(
+        models.FieldPhoto.id == photo_id,
+        models.Field.owner_id == current_user.id
+    ).first()
+    if not photo:
+        raise HTTPException(status_code=404, detail="Photo not found")
+
+    if format is None:
+        format = "webp" if "image/webp" in request.headers.get("accept", "") else "jpeg"
+    try:
+        photo_file = photo_storage.get_photo_file(photo_id, size, format)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Photo file not stored")
+
+    file_stat = os.stat(photo_file["path"])
+    etag = f'"{photo_id}-{size}-{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+    headers = {"Cache-Control": PHOTO_CACHE_CONTROL, "ETag": etag, "Vary": "Accept"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return FileResponse(photo_file["path"], media_type=photo_file["media_type"], headers=headers)
+
 def generate_recommendations(image_analysis: dict, satellite_comparison: dict = None) -> list:
     """Generate recommendations based on analysis results"""
     recommendations = []
@@ -0,0 +1,78 @@
+"""
+Schema upgrades for existing databases.
+
+Base.metadata.create_all() creates missing tables but never changes existing
+ones, so columns and unique indexes added to a model later are added here.
+Every step checks the live schema first and is safe to run on every start.
+"""
+from sqlalchemy import inspect, text
+from sqlalchemy.orm import Session
+import models
+from ndvi_rollups import update_field_rollups
+from ndvi_store import load_ndvi_series, rebuild_ndvi_series
+
+# (table, column, SQL type) of nullable columns added after the table first shipped
+ADDED_COLUMNS = [
+    ("ndvi_cache_points", "pixel_count", "INTEGER"),
+    ("ndvi_cache_points", "scene_count", "INTEGER")
+]
+
+# (table, index name, columns) of unique indexes added to tables that may already hold duplicates
+ADDED_UNIQUE_INDEXES = [
+    ("ndvi_data", "uq_ndvi_data_field_date_source", ("field_id", "date", "data_source"))
+]
+
+def add_missing_columns(engine):
+    inspector = inspect(engine)
+    with engine.begin() as connection:
+        for table, column, column_type in ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            if column in {existing["name"] for existing in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+            print(f"🗄️  Added column {table}.{column}")
+
+def add_unique_indexes(engine):
+    """Delete duplicate rows, keeping the newest (highest id) of each key, then create the index"""
+    inspector = inspect(engine)
+    for table, index, columns in ADDED_UNIQUE_INDEXES:
+        if not inspector.has_table(table):
+            continue
+        if index in {existing["name"] for existing in inspector.get_indexes(table)}:
+            continue
+        column_list = ", ".join(columns)
+        with engine.begin() as connection:
+            deleted = connection.execute(text(
+                f"DELETE FROM {table} WHERE id NOT IN "
+                f"(SELECT MAX(id) FROM {table} GROUP BY {column_list})"
+            )).rowcount
+            connection.execute(text(f"CREATE UNIQUE INDEX {index} ON {table} ({column_list})"))
+        print(f"🗄️  Created unique index {index} on {table} ({deleted} duplicate rows removed)")
+
+def build_ndvi_series(engine):
+    """Fill ndvi_series from ndvi_data the first time a database runs with the packed series"""
+    with Session(bind=engine) as db:
+        if db.query(models.NDVISeries.id).first() is not None or db.query(models.NDVIData.id).first() is None:
+            return
+        count = rebuild_ndvi_series(db)
+        db.commit()
+    print(f"🗄️  Built {count} packed NDVI series from ndvi_data")
+
+def build_ndvi_rollups(engine):
+    """Fill the dashboard rollups from the packed series the first time a database runs with them"""
+    with Session(bind=engine) as db:
+        if db.query(models.NDVIFieldRollup.id).first() is not None or db.query(models.NDVISeries.id).first() is None:
+            return
+        keys = db.query(models.NDVISeries.field_id, models.NDVISeries.data_source).all()
+        for field_id, data_source in keys:
+            arrays = load_ndvi_series(db, field_id, data_source)[data_source]
+            update_field_rollups(db, field_id, data_source, *arrays, arrays.days)
+        db.commit()
+    print(f"🗄️  Built NDVI rollups for {len(keys)} series")
+
+def run_migrations(engine):
+    add_missing_columns(engine)
+    add_unique_indexes(engine)
+    build_ndvi_series(engine)
+    build_ndvi_rollups(engine)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Text, ForeignKey, JSON, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -26,6 +26,7 @@ class Field(Base):
     owner = relationship("User", back_populates="fields")
     planting_reports = relationship("PlantingReport", back_populates="field")
     ndvi_data = relationship("NDVIData", back_populates="field")
+    photos = relationship("FieldPhoto", back_populates="field")
 
 class PlantingReport(Base):
     __tablename__ = "planting_reports"
@@ -43,6 +44,10 @@ class PlantingReport(Base):
 
 class NDVIData(Base):
     __tablename__ = "ndvi_data"
+    # One row per field, date and source; also serves the per-field date-range reads
+    __table_args__ = (
+        Index("uq_ndvi_data_field_date_source", "field_id", "date", "data_source", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     field_id = Column(Integer, ForeignKey("fields.id"))
@@ -53,3 +58,109 @@ class NDVIData(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     
     field = relationship("Field", back_populates="ndvi_data")
+
+class NDVISeries(Base):
+    """Whole NDVI series of a field and source as packed arrays, kept in step with ndvi_data by ndvi_store"""
+    __tablename__ = "ndvi_series"
+    __table_args__ = (UniqueConstraint("field_id", "data_source", name="uq_ndvi_series_field_source"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    field_id = Column(Integer, ForeignKey("fields.id"), nullable=False)
+    data_source = Column(String, nullable=False)
+    day_offsets = Column(LargeBinary, nullable=False)  # int32 little-endian, days since 1970-01-01, ascending
+    ndvi_values = Column(LargeBinary, nullable=False)  # float32 little-endian, NaN when unknown
+    biomass_values = Column(LargeBinary, nullable=False)  # float32 little-endian, NaN when unknown
+    point_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NDVIFieldRollup(Base):
+    """NDVI and biomass aggregates of one field over one day, month or season, maintained by ndvi_rollups"""
+    __tablename__ = "ndvi_field_rollups"
+    __table_args__ = (
+        UniqueConstraint("field_id", "data_source", "period", "period_start", name="uq_ndvi_field_rollups_bucket"),
+        # Island rollups re-aggregate the field rollups of one island and bucket
+        Index("ix_ndvi_field_rollups_island_bucket", "island", "data_source", "period", "period_start"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    field_id = Column(Integer, ForeignKey("fields.id"), nullable=False)
+    island = Column(String, nullable=False)
+    data_source = Column(String, nullable=False)
+    period = Column(String, nullable=False)  # day, month or season
+    period_start = Column(Date, nullable=False)
+    observation_count = Column(Integer, nullable=False, default=0)
+    ndvi_sum = Column(Float)
+    ndvi_max = Column(Float)
+    biomass_count = Column(Integer, nullable=False, default=0)
+    biomass_sum = Column(Float)
+    biomass_max = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class NDVIIslandRollup(Base):
+    """NDVIFieldRollup summed over the fields of an island"""
+    __tablename__ = "ndvi_island_rollups"
+    __table_args__ = (
+        UniqueConstraint("island", "data_source", "period", "period_start", name="uq_ndvi_island_rollups_bucket"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    island = Column(String, nullable=False)
+    data_source = Column(String, nullable=False)
+    period = Column(String, nullable=False)
+    period_start = Column(Date, nullable=False)
+    field_count = Column(Integer, nullable=False, default=0)
+    observation_count = Column(Integer, nullable=False, default=0)
+    ndvi_sum = Column(Float)
+    ndvi_max = Column(Float)
+    biomass_count = Column(Integer, nullable=False, default=0)
+    biomass_sum = Column(Float)
+    biomass_max = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class FieldPhoto(Base):
+    __tablename__ = "field_photos"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    field_id = Column(Integer, ForeignKey("fields.id"), index=True)
+    content_hash = Column(String, index=True)  # SHA-256 of the uploaded bytes
+    perceptual_hash = Column(String)  # 64-bit pHash as hex, indexed in memory for near-duplicate search
+    validation_score = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    field = relationship("Field", back_populates="photos")
+
+class NDVICachePoint(Base):
+    """Earth Engine NDVI observation (or composite window starting on date) for one geometry (see ndvi_cache.geometry_hash)"""
+    __tablename__ = "ndvi_cache_points"
+    __table_args__ = (UniqueConstraint("geometry_hash", "date", name="uq_ndvi_cache_points_geometry_date"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    geometry_hash = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    ndvi_value = Column(Float)
+    # Composite points only: valid pixels behind the field mean, and scenes in the window
+    pixel_count = Column(Integer)
+    scene_count = Column(Integer)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class NDVICacheCoverage(Base):
+    """Date range [start_date, end_date) already queried from Earth Engine for a geometry"""
+    __tablename__ = "ndvi_cache_coverage"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    geometry_hash = Column(String, index=True, nullable=False)
+    start_date = Column(Date, nullable=False)
+    end_date = Column(Date, nullable=False)
+    fetched_at = Column(DateTime, default=datetime.utcnow)
+
+class NDVIRefreshJob(Base):
+    """Background NDVI refresh state of one field, run by ndvi_scheduler"""
+    __tablename__ = "ndvi_refresh_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    field_id = Column(Integer, ForeignKey("fields.id"), unique=True, nullable=False)
+    next_run_at = Column(DateTime, index=True, default=datetime.utcnow)
+    last_run_at = Column(DateTime)
+    last_success_at = Column(DateTime)
+    consecutive_failures = Column(Integer, default=0)
+    last_error = Column(Text)
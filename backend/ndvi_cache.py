@@ -0,0 +1,303 @@
+"""
+Incremental NDVI time-series cache.
+
+Earth Engine results are stored per field geometry and observation date,
+together with the date ranges that have already been queried (a range stays
+covered even when clouds left no observation in it). A request only sends the
+missing sub-ranges to Earth Engine, so a year-long chart refreshed weekly costs
+one small query for the newest days instead of a full-year reduction.
+
+Concurrent requests that miss the same range of the same geometry share one
+Earth Engine fetch, and a finished fetch is reused for a short while, which
+also covers the not-yet-settled newest days.
+
+Date ranges are half-open [start, end), like ee.ImageCollection.filterDate.
+
+Composite series (weekly, 10-day or monthly medians) are cached under their own
+geometry hash with one point per window, and their coverage always ends on a
+window boundary, so only whole windows are fetched.
+"""
+import hashlib
+import json
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy.orm import Session
+import models
+from earth_engine_service import composite_window_end, composite_window_start
+from single_flight import SingleFlight
+from synthetic_ndvi import field_seed
+
+DATE_FORMAT = "%Y-%m-%d"
+
+DateRange = Tuple[date, date]
+
+# Stays below SQLite's bound-parameter limit in IN (...) queries
+IN_CLAUSE_CHUNK = 500
+
+def _chunks(items: List[Any], size: int) -> Iterator[List[Any]]:
+    for offset in range(0, len(items), size):
+        yield items[offset:offset + size]
+
+def geometry_hash(coordinates: Sequence[Sequence[float]], **query_params: Any) -> str:
+    """Stable key for a field polygon and the Earth Engine query settings"""
+    # ~1 cm precision, so float noise from the app does not create new keys
+    rounded = [[round(float(value), 7) for value in point] for point in coordinates]
+    encoded = json.dumps({"coordinates": rounded, "query": query_params}, sort_keys=True)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+def merge_ranges(ranges: Sequence[DateRange]) -> List[DateRange]:
+    """Merge overlapping or touching ranges"""
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+def missing_ranges(start: date, end: date, covered: Sequence[DateRange]) -> List[DateRange]:
+    """Sub-ranges of [start, end) that no covered range includes"""
+    gaps = []
+    cursor = start
+    for covered_start, covered_end in merge_ranges(covered):
+        if covered_end <= cursor:
+            continue
+        if covered_start >= end:
+            break
+        if covered_start > cursor:
+            gaps.append((cursor, covered_start))
+        cursor = covered_end
+        if cursor >= end:
+            break
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+class NDVITimeSeriesCache:
+    """Serves NDVI series from the database, fetching only uncovered dates from Earth Engine"""
+
+    def __init__(self, ee_client, settle_days: int = 5, coalesce_ttl_seconds: float = 300,
+                 coalesce_wait_seconds: float = 180):
+        # Earth Engine calls go through EarthEngineClient for timeouts, retries and the concurrency limit
+        self.ee_client = ee_client
+        self.ee_service = ee_client.ee_service
+        # Scenes for the last few days can still arrive or be reprocessed; those dates are
+        # stored but not marked covered, so the next request fetches them again
+        self.settle_days = settle_days
+        # Keyed on (geometry hash, gap start, gap end); the hash already includes collection,
+        # cloud filter and scale. A flight's result is "stored in the database".
+        self._flights = SingleFlight(ttl_seconds=coalesce_ttl_seconds)
+        self.coalesce_wait_seconds = coalesce_wait_seconds
+
+    def get_series(self, db: Session, coordinates: List[List[float]],
+                   start_date: str, end_date: str, composite: Optional[str] = None) -> Dict[str, Any]:
+        """
+        NDVI observations for [start_date, end_date)
+
+        Args:
+            composite: None for one point per scene, or a COMPOSITE_PERIODS value for one cloud-masked
+                median per window overlapping the range (points also get 'end_date', 'pixel_count'
+                and 'scene_count')
+
+        Returns:
+            {'ndvi_data': [{'date', 'ndvi_value'}, ...], 'data_source', 'degraded', 'degraded_reason'}
+            When Earth Engine fails, ndvi_data holds whatever was cached and degraded is True.
+        """
+        return self.get_series_for_fields(db, {None: coordinates}, start_date, end_date, composite)[None]
+
+    def get_series_for_fields(self, db: Session, fields: Dict[Hashable, List[List[float]]],
+                              start_date: str, end_date: str,
+                              composite: Optional[str] = None) -> Dict[Hashable, Dict[str, Any]]:
+        """
+        get_series for many fields at once
+
+        Fields missing the same date range (the usual case when all fields are refreshed
+        together) are fetched with batched Earth Engine requests.
+
+        Returns:
+            {field key: get_series response}
+        """
+        series, errors = self.refresh_fields(db, fields, start_date, end_date, composite)
+        responses = {}
+        for key in fields:
+            error = errors.get(key)
+            if error is None:
+                responses[key] = {"ndvi_data": series[key], "data_source": "sentinel-2", "degraded": False, "degraded_reason": None}
+            elif not self.ee_service.ee_available and not series[key]:
+                # Development without Earth Engine credentials; demo data is never cached
+                responses[key] = {
+                    "ndvi_data": self.ee_service._generate_demo_ndvi_data(
+                        start_date, end_date, field_seed(fields[key]), composite
+                    ),
+                    "data_source": "demo",
+                    "degraded": True,
+                    "degraded_reason": error
+                }
+            else:
+                responses[key] = {"ndvi_data": series[key], "data_source": "sentinel-2", "degraded": True, "degraded_reason": error}
+        return responses
+
+    def refresh_fields(self, db: Session, fields: Dict[Hashable, List[List[float]]],
+                       start_date: str, end_date: str, composite: Optional[str] = None,
+                       background: bool = False) -> Tuple[Dict[Hashable, List[Dict[str, Any]]], Dict[Hashable, str]]:
+        """
+        Fetch whatever is missing for the fields and return their cached series
+
+        background: fetch with EarthEngineClient.call_batch (scheduler runs) instead of call
+
+        Returns:
+            ({field key: series}, {field key: error message}); fields that could not be
+            fetched have an error and only their already cached observations
+        """
+        start = datetime.strptime(start_date, DATE_FORMAT).date()
+        end = datetime.strptime(end_date, DATE_FORMAT).date()
+        if end <= start:
+            return {key: [] for key in fields}, {}
+        if composite:
+            # Whole windows only
+            start = composite_window_start(start, composite)
+            end = composite_window_end(composite_window_start(end - timedelta(days=1), composite), composite)
+
+        call = self.ee_client.call_batch if background else self.ee_client.call
+        query_params = self.ee_service.ndvi_query_params(composite)
+        field_hashes = {key: geometry_hash(coordinates, **query_params) for key, coordinates in fields.items()}
+        # Fields drawn with identical polygons share one geometry and one fetch
+        geometries = {field_hashes[key]: coordinates for key, coordinates in fields.items()}
+
+        covered = {}
+        for hashes in _chunks(list(geometries), IN_CLAUSE_CHUNK):
+            for row in db.query(models.NDVICacheCoverage).filter(models.NDVICacheCoverage.geometry_hash.in_(hashes)):
+                covered.setdefault(row.geometry_hash, []).append((row.start_date, row.end_date))
+
+        geometries_by_gap = {}
+        for key in geometries:
+            for gap in missing_ranges(start, end, covered.get(key, [])):
+                geometries_by_gap.setdefault(gap, []).append(key)
+
+        failed_geometries = {}  # geometry hash -> error message
+        for (gap_start, gap_end), gap_keys in sorted(geometries_by_gap.items()):
+            gap_keys = [key for key in gap_keys if key not in failed_geometries]
+            if not self.ee_service.ee_available:
+                failed_geometries.update((key, "Earth Engine not available") for key in gap_keys)
+                continue
+            # Fetch the geometries nobody else is fetching; wait for the others
+            leading, joined = {}, {}
+            for key in gap_keys:
+                flight, is_leader = self._flights.claim((key, gap_start, gap_end))
+                (leading if is_leader else joined)[key] = flight
+
+            gap_start_str, gap_end_str = gap_start.strftime(DATE_FORMAT), gap_end.strftime(DATE_FORMAT)
+            if leading:
+                print(f"🛰️  NDVI cache miss: {gap_start} - {gap_end} for {len(leading)} field geometries")
+            unresolved = dict(leading)
+            try:
+                chunks = self.ee_service.field_chunks(
+                    {key: geometries[key] for key in leading}, gap_start_str, gap_end_str, composite=composite
+                )
+                for chunk in chunks:
+                    error = None
+                    try:
+                        fetched = call(
+                            "calculate_ndvi_for_fields", chunk, gap_start_str, gap_end_str, composite=composite
+                        )
+                        for key, results in fetched.items():
+                            self._store(db, key, gap_start, gap_end, results, composite)
+                        db.commit()
+                    except Exception as e:
+                        db.rollback()
+                        print(f"Error calculating NDVI: {e}")
+                        failed_geometries.update((key, str(e)) for key in chunk)
+                        error = e
+                    finally:
+                        for key in chunk:
+                            self._flights.resolve((key, gap_start, gap_end), unresolved.pop(key), error=error)
+                    if error is None:
+                        self._mark_tail_fetched(chunk, gap_start, gap_end, composite)
+            except Exception as e:
+                # Chunking failed part-way; callers waiting on the remaining flights must not hang
+                for key, flight in unresolved.items():
+                    self._flights.resolve((key, gap_start, gap_end), flight, error=e)
+                raise
+
+            for key, flight in joined.items():
+                try:
+                    flight.wait(self.coalesce_wait_seconds)
+                except Exception as e:
+                    failed_geometries[key] = str(e)
+
+        series = {key: [] for key in geometries}
+        for hashes in _chunks(list(geometries), IN_CLAUSE_CHUNK):
+            points = db.query(models.NDVICachePoint).filter(
+                models.NDVICachePoint.geometry_hash.in_(hashes),
+                models.NDVICachePoint.date >= start,
+                models.NDVICachePoint.date < end,
+                models.NDVICachePoint.ndvi_value.isnot(None)
+            ).order_by(models.NDVICachePoint.date)
+            for point in points:
+                entry = {"date": point.date.strftime(DATE_FORMAT), "ndvi_value": point.ndvi_value}
+                if composite:
+                    entry.update(
+                        end_date=composite_window_end(point.date, composite).strftime(DATE_FORMAT),
+                        pixel_count=point.pixel_count,
+                        scene_count=point.scene_count
+                    )
+                series[point.geometry_hash].append(entry)
+
+        return (
+            {key: list(series[field_hashes[key]]) for key in fields},
+            {key: failed_geometries[field_hashes[key]] for key in fields if field_hashes[key] in failed_geometries}
+        )
+
+    def _settled_end(self, composite: Optional[str] = None) -> date:
+        settled_end = date.today() - timedelta(days=self.settle_days)
+        # A composite window is final only once all of its days have settled
+        return composite_window_start(settled_end, composite) if composite else settled_end
+
+    def _mark_tail_fetched(self, keys: Sequence[str], start: date, end: date, composite: Optional[str] = None):
+        """
+        The unsettled tail of a fetched range stays uncovered, so the next request misses
+        exactly [settled end, end); mark that range fetched too so it is reused within the TTL
+        """
+        tail_start = max(start, self._settled_end(composite))
+        if tail_start == start or tail_start >= end:
+            return
+        for key in keys:
+            flight, is_leader = self._flights.claim((key, tail_start, end))
+            if is_leader:
+                self._flights.resolve((key, tail_start, end), flight)
+
+    def _store(self, db: Session, key: str, start: date, end: date, results: List[Dict[str, Any]],
+               composite: Optional[str] = None):
+        """Upsert the fetched observations and record the settled part of the range as covered (caller commits)"""
+        existing = {
+            point.date: point
+            for point in db.query(models.NDVICachePoint).filter(
+                models.NDVICachePoint.geometry_hash == key,
+                models.NDVICachePoint.date >= start,
+                models.NDVICachePoint.date < end
+            )
+        }
+        now = datetime.utcnow()
+        for result in results:
+            observed = datetime.strptime(result["date"], DATE_FORMAT).date()
+            point = existing.get(observed)
+            if point is None:
+                point = models.NDVICachePoint(geometry_hash=key, date=observed)
+                db.add(point)
+                existing[observed] = point
+            point.ndvi_value = result["ndvi_value"]
+            point.pixel_count = result.get("pixel_count")
+            point.scene_count = result.get("scene_count")
+            point.fetched_at = now
+
+        settled_end = min(end, self._settled_end(composite))
+        if settled_end > start:
+            # Replace the geometry's coverage rows with the merged set so they stay few
+            rows = db.query(models.NDVICacheCoverage).filter(models.NDVICacheCoverage.geometry_hash == key).all()
+            merged = merge_ranges([(row.start_date, row.end_date) for row in rows] + [(start, settled_end)])
+            for row in rows:
+                db.delete(row)
+            for merged_start, merged_end in merged:
+                db.add(models.NDVICacheCoverage(
+                    geometry_hash=key, start_date=merged_start, end_date=merged_end, fetched_at=now
+                ))
@@ -0,0 +1,203 @@
+"""
+Materialized NDVI and biomass rollups for dashboards.
+
+Every write to a field's packed NDVI series (ndvi_store) updates the day,
+month and season buckets its changed observations fall into: the field's
+buckets are recomputed from the in-memory series, then the island's buckets
+are re-aggregated from the field rollups of that island. Work per write grows
+with the number of changed buckets and fields per island, never with the
+length of the history, and dashboards read finished rows by index.
+
+Buckets keep sums, counts and maxima rather than means, so islands combine
+their fields exactly (observation-weighted means).
+
+Seasons follow the Cape Verde rain-fed calendar: the wet season ("as águas")
+from July to October, the dry season from November to June.
+"""
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+import models
+
+ROLLUP_PERIODS = ("day", "month", "season")
+
+# (south, west, north, east) of each island, slightly padded
+ISLAND_BOUNDS = {
+    "Santo_Antao": (16.88, -25.38, 17.22, -24.94),
+    "Sao_Vicente": (16.76, -25.11, 16.94, -24.83),
+    "Santa_Luzia": (16.72, -24.81, 16.81, -24.66),
+    "Sao_Nicolau": (16.52, -24.45, 16.69, -23.99),
+    "Sal": (16.56, -23.01, 16.87, -22.87),
+    "Boa_Vista": (15.95, -22.98, 16.25, -22.65),
+    "Maio": (15.10, -23.27, 15.35, -23.07),
+    "Santiago": (14.88, -23.82, 15.35, -23.43),
+    "Fogo": (14.79, -24.54, 15.06, -24.28),
+    "Brava": (14.79, -24.77, 14.91, -24.65)
+}
+UNKNOWN_ISLAND = "other"
+
+WET_SEASON_MONTHS = 4  # July to October
+DRY_SEASON_MONTHS = 8  # November to June
+
+def island_for_coordinates(coordinates: Optional[Sequence[Sequence[float]]]) -> str:
+    """Island whose bounding box contains the centroid of a [lat, lon] polygon"""
+    if not coordinates:
+        return UNKNOWN_ISLAND
+    latitude, longitude = np.asarray(coordinates, dtype=float).reshape(-1, 2).mean(axis=0)
+    for island, (south, west, north, east) in ISLAND_BOUNDS.items():
+        if south <= latitude <= north and west <= longitude <= east:
+            return island
+    return UNKNOWN_ISLAND
+
+def bucket_starts(period: str, days: np.ndarray) -> np.ndarray:
+    """First day of the bucket of every day (datetime64[D])"""
+    days = np.asarray(days, dtype="datetime64[D]")
+    if period == "day":
+        return days
+    months = days.astype("datetime64[M]")
+    if period == "month":
+        return months.astype("datetime64[D]")
+    years = days.astype("datetime64[Y]").astype("datetime64[M]")
+    month_index = (months - years).astype(int)  # 0 = January
+    # Wet season starts in July; the dry season in November of the same or the previous year
+    offsets = np.where((month_index >= 6) & (month_index < 10), 6, 10)
+    years = np.where(month_index < 6, years - np.timedelta64(12, "M"), years)
+    return (years + offsets.astype("timedelta64[M]")).astype("datetime64[D]")
+
+def bucket_end(period: str, start: np.datetime64) -> np.datetime64:
+    """Day after the last day of the bucket that starts on start"""
+    if period == "day":
+        return start + np.timedelta64(1, "D")
+    month = start.astype("datetime64[M]")
+    if period == "month":
+        length = 1
+    else:
+        length = WET_SEASON_MONTHS if month.astype(int) % 12 == 6 else DRY_SEASON_MONTHS
+    return (month + np.timedelta64(length, "M")).astype("datetime64[D]")
+
+def season_name(start: date) -> str:
+    return "wet" if start.month == 7 else "dry"
+
+def _stats(values: np.ndarray) -> tuple:
+    """(count, sum, max) of the non-NaN values"""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return 0, None, None
+    return len(values), float(values.sum(dtype=np.float64)), float(values.max())
+
+def update_field_rollups(db: Session, field_id: int, data_source: str, days: np.ndarray,
+                         ndvi: np.ndarray, biomass: np.ndarray, changed_days: np.ndarray):
+    """
+    Recompute the field's buckets that contain changed days, then their island buckets (caller commits)
+
+    Args:
+        days, ndvi, biomass: the field's whole series for data_source, days ascending as
+            days since 1970-01-01 (datetime64[D] values)
+        changed_days: days whose values were added or changed by the write
+    """
+    if len(changed_days) == 0:
+        return
+    coordinates = db.query(models.Field.coordinates).filter(models.Field.id == field_id).scalar()
+    island = island_for_coordinates(coordinates)
+    series_days = np.asarray(days).astype("datetime64[D]")
+
+    for period in ROLLUP_PERIODS:
+        starts = np.unique(bucket_starts(period, np.asarray(changed_days).astype("datetime64[D]")))
+        start_dates = starts.astype(object).tolist()
+        existing = {
+            rollup.period_start: rollup
+            for rollup in db.query(models.NDVIFieldRollup).filter(
+                models.NDVIFieldRollup.field_id == field_id,
+                models.NDVIFieldRollup.data_source == data_source,
+                models.NDVIFieldRollup.period == period,
+                models.NDVIFieldRollup.period_start.in_(start_dates)
+            )
+        }
+        for start, start_date in zip(starts, start_dates):
+            first = np.searchsorted(series_days, start)
+            last = np.searchsorted(series_days, bucket_end(period, start))
+            observation_count, ndvi_sum, ndvi_max = _stats(ndvi[first:last])
+            biomass_count, biomass_sum, biomass_max = _stats(biomass[first:last])
+            rollup = existing.get(start_date)
+            if rollup is None:
+                rollup = models.NDVIFieldRollup(
+                    field_id=field_id, data_source=data_source, period=period, period_start=start_date
+                )
+                db.add(rollup)
+            rollup.island = island
+            rollup.observation_count = observation_count
+            rollup.ndvi_sum = ndvi_sum
+            rollup.ndvi_max = ndvi_max
+            rollup.biomass_count = biomass_count
+            rollup.biomass_sum = biomass_sum
+            rollup.biomass_max = biomass_max
+        db.flush()
+        _update_island_rollups(db, island, data_source, period, start_dates)
+
+def _update_island_rollups(db: Session, island: str, data_source: str, period: str, start_dates: List[date]):
+    """Re-aggregate the island's buckets from its fields' rollups"""
+    totals = {
+        row.period_start: row
+        for row in db.query(
+            models.NDVIFieldRollup.period_start,
+            func.count(models.NDVIFieldRollup.field_id).label("field_count"),
+            func.sum(models.NDVIFieldRollup.observation_count).label("observation_count"),
+            func.sum(models.NDVIFieldRollup.ndvi_sum).label("ndvi_sum"),
+            func.max(models.NDVIFieldRollup.ndvi_max).label("ndvi_max"),
+            func.sum(models.NDVIFieldRollup.biomass_count).label("biomass_count"),
+            func.sum(models.NDVIFieldRollup.biomass_sum).label("biomass_sum"),
+            func.max(models.NDVIFieldRollup.biomass_max).label("biomass_max")
+        ).filter(
+            models.NDVIFieldRollup.island == island,
+            models.NDVIFieldRollup.data_source == data_source,
+            models.NDVIFieldRollup.period == period,
+            models.NDVIFieldRollup.period_start.in_(start_dates),
+            models.NDVIFieldRollup.observation_count > 0
+        ).group_by(models.NDVIFieldRollup.period_start)
+    }
+    existing = {
+        rollup.period_start: rollup
+        for rollup in db.query(models.NDVIIslandRollup).filter(
+            models.NDVIIslandRollup.island == island,
+            models.NDVIIslandRollup.data_source == data_source,
+            models.NDVIIslandRollup.period == period,
+            models.NDVIIslandRollup.period_start.in_(start_dates)
+        )
+    }
+    for start_date in start_dates:
+        total = totals.get(start_date)
+        rollup = existing.get(start_date)
+        if rollup is None:
+            if total is None:
+                continue
+            rollup = models.NDVIIslandRollup(
+                island=island, data_source=data_source, period=period, period_start=start_date
+            )
+            db.add(rollup)
+        rollup.field_count = total.field_count if total else 0
+        rollup.observation_count = total.observation_count if total else 0
+        rollup.ndvi_sum = total.ndvi_sum if total else None
+        rollup.ndvi_max = total.ndvi_max if total else None
+        rollup.biomass_count = total.biomass_count if total else 0
+        rollup.biomass_sum = total.biomass_sum if total else None
+        rollup.biomass_max = total.biomass_max if total else None
+
+def rollup_out(rollup) -> Dict[str, Any]:
+    """Field or island rollup row as served by the API, with means instead of sums"""
+    end = bucket_end(rollup.period, np.datetime64(rollup.period_start, "D")).astype(object)
+    result = {
+        "period": rollup.period,
+        "period_start": rollup.period_start.isoformat(),
+        "period_end": end.isoformat(),  # Exclusive
+        "data_source": rollup.data_source,
+        "observations": rollup.observation_count,
+        "ndvi_mean": round(rollup.ndvi_sum / rollup.observation_count, 3) if rollup.observation_count else None,
+        "ndvi_max": round(rollup.ndvi_max, 3) if rollup.ndvi_max is not None else None,
+        "biomass_mean": round(rollup.biomass_sum / rollup.biomass_count, 2) if rollup.biomass_count else None,
+        "biomass_max": round(rollup.biomass_max, 2) if rollup.biomass_max is not None else None
+    }
+    if rollup.period == "season":
+        result["season"] = season_name(rollup.period_start)
+    return result
@@ -0,0 +1,223 @@
+"""
+Background NDVI precompute scheduler.
+
+A daemon thread inside the backend refreshes every field's NDVI on the
+Sentinel-2 revisit cadence and writes the results to ndvi_data, so the read
+endpoints never wait for Earth Engine. Job state lives in the
+ndvi_refresh_jobs table and survives restarts. Due fields are refreshed in
+batches through the NDVI cache, nearest carbon-credit payout first, and
+failed fields are retried with exponential backoff.
+"""
+import random
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+from biomass import PlantingReportRow, crop_cycle_days, estimate_field_biomass
+from ndvi_store import DEMO_DATA_SOURCE, upsert_ndvi_rows
+from synthetic_ndvi import field_seed
+
+def payout_due_date(crop_type: Optional[str], planting_date: Optional[datetime]) -> Optional[datetime]:
+    if planting_date is None:
+        return None
+    return planting_date + timedelta(days=crop_cycle_days(crop_type))
+
+class NDVIRefreshScheduler:
+    """Persistent NDVI refresh jobs, run by one background thread"""
+
+    def __init__(self, ee_service, ndvi_cache, session_factory: Callable[[], Session],
+                 cadence_days: int = 5, history_days: int = 365, batch_size: int = 200,
+                 poll_seconds: float = 60, retry_base_seconds: float = 300,
+                 retry_max_seconds: float = 6 * 3600, lease_seconds: float = 900,
+                 composite: Optional[str] = None, store_demo_data: bool = False):
+        self.ee_service = ee_service
+        self.ndvi_cache = ndvi_cache
+        self.session_factory = session_factory
+        self.cadence_days = cadence_days  # Sentinel-2A/B revisit
+        self.history_days = history_days
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        # A claimed job is not picked up again for this long, even if its run never finishes
+        self.lease_seconds = lease_seconds
+        # Store median composites (see EarthEngineService.calculate_ndvi_for_field) instead of every scene
+        self.composite = composite
+        self.data_source = f"sentinel-2-{composite}" if composite else "sentinel-2"
+        # Development only: without Earth Engine, fill empty fields with demo rows so charts have data
+        self.store_demo_data = store_demo_data
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="ndvi-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wake(self):
+        """Check for due jobs now instead of at the next poll, e.g. after a field was created"""
+        self._wake.set()
+
+    def _run(self):
+        print("🛰️  NDVI refresh scheduler started")
+        while not self._stopping.is_set():
+            try:
+                attempted = self.run_pending()
+            except Exception as e:
+                print(f"⚠️ NDVI refresh run failed: {e}")
+                attempted = 0
+            # A full batch means more jobs may already be due
+            if attempted < self.batch_size:
+                self._wake.wait(self.poll_seconds)
+                self._wake.clear()
+
+    def run_pending(self) -> int:
+        """Refresh one batch of due fields; returns the number of fields attempted"""
+        db = self.session_factory()
+        try:
+            self._ensure_jobs(db)
+            jobs = self._claim_due_jobs(db)
+            if jobs:
+                self._refresh(db, jobs)
+            return len(jobs)
+        finally:
+            db.close()
+
+    def _ensure_jobs(self, db: Session):
+        """Give every field a job; new ones are due immediately"""
+        missing = db.query(models.Field.id).outerjoin(
+            models.NDVIRefreshJob, models.NDVIRefreshJob.field_id == models.Field.id
+        ).filter(models.NDVIRefreshJob.id.is_(None)).all()
+        if not missing:
+            return
+        now = datetime.utcnow()
+        for (field_id,) in missing:
+            db.add(models.NDVIRefreshJob(field_id=field_id, next_run_at=now))
+        try:
+            db.commit()
+        except IntegrityError:
+            # create_field added the same job meanwhile
+            db.rollback()
+
+    def _claim_due_jobs(self, db: Session) -> List[models.NDVIRefreshJob]:
+        now = datetime.utcnow()
+        due = db.query(models.NDVIRefreshJob).filter(models.NDVIRefreshJob.next_run_at <= now).all()
+        if not due:
+            return []
+
+        # Latest planting report of each due field decides its payout date
+        payouts = {}
+        reports = db.query(
+            models.PlantingReport.field_id, models.PlantingReport.crop_type, models.PlantingReport.planting_date
+        ).join(
+            models.NDVIRefreshJob, models.NDVIRefreshJob.field_id == models.PlantingReport.field_id
+        ).filter(models.NDVIRefreshJob.next_run_at <= now).order_by(models.PlantingReport.planting_date)
+        for field_id, crop_type, planting_date in reports:
+            payouts[field_id] = payout_due_date(crop_type, planting_date)
+
+        # Nearest (or overdue) payout first, then fields without a planting report, longest waiting first
+        due.sort(key=lambda job: (
+            payouts.get(job.field_id) is None,
+            payouts.get(job.field_id) or job.next_run_at,
+            job.next_run_at
+        ))
+
+        claimed = []
+        lease_until = now + timedelta(seconds=self.lease_seconds)
+        for job in due[:self.batch_size]:
+            # Conditional update, so a second backend process cannot run the same job
+            taken = db.query(models.NDVIRefreshJob).filter(
+                models.NDVIRefreshJob.id == job.id,
+                models.NDVIRefreshJob.next_run_at == job.next_run_at
+            ).update({"next_run_at": lease_until}, synchronize_session=False)
+            if taken:
+                claimed.append(job)
+        db.commit()
+        return claimed
+
+    def _refresh(self, db: Session, jobs: List[models.NDVIRefreshJob]):
+        fields = {
+            field.id: field.coordinates
+            for field in db.query(models.Field).filter(models.Field.id.in_([job.field_id for job in jobs]))
+        }
+        end = date.today() + timedelta(days=1)  # Ranges are end-exclusive
+        start = end - timedelta(days=self.history_days)
+        planting_reports = {}
+        for field_id, planting_date, crop_type in db.query(
+            models.PlantingReport.field_id, models.PlantingReport.planting_date, models.PlantingReport.crop_type
+        ).filter(models.PlantingReport.field_id.in_(list(fields))):
+            planting_reports.setdefault(field_id, []).append((planting_date, crop_type))
+        series, errors = self.ndvi_cache.refresh_fields(
+            db, fields, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), self.composite, background=True
+        )
+
+        now = datetime.utcnow()
+        failed = 0
+        for job in jobs:
+            job.last_run_at = now
+            error = errors.get(job.field_id)
+            if error is None:
+                self._store_field_rows(
+                    db, job.field_id, series[job.field_id], self.data_source, planting_reports.get(job.field_id, [])
+                )
+                job.consecutive_failures = 0
+                job.last_error = None
+                job.last_success_at = now
+                job.next_run_at = now + timedelta(days=self.cadence_days)
+                continue
+
+            failed += 1
+            job.consecutive_failures = (job.consecutive_failures or 0) + 1
+            job.last_error = error[:1000]
+            delay = min(self.retry_base_seconds * 2 ** (job.consecutive_failures - 1), self.retry_max_seconds)
+            # Jitter, so fields that failed together do not all retry in the same second
+            job.next_run_at = now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+            if self.store_demo_data and not self.ee_service.ee_available:
+                self._store_demo_rows(
+                    db, job.field_id, fields[job.field_id], start, end, planting_reports.get(job.field_id, [])
+                )
+        db.commit()
+
+        print(f"🛰️  NDVI refreshed for {len(jobs) - failed}/{len(jobs)} fields")
+
+    def _store_field_rows(self, db: Session, field_id: int, series: List[Dict[str, Any]], data_source: str,
+                          planting_reports: List[PlantingReportRow]):
+        """Upsert the series into ndvi_data: new dates are added, changed values updated"""
+        if not series:
+            return
+        dates = [datetime.strptime(point["date"], "%Y-%m-%d") for point in series]
+        # Whole series in one call, with the crop that was growing on each date
+        biomass = estimate_field_biomass(dates, [point["ndvi_value"] for point in series], planting_reports)
+        upsert_ndvi_rows(db, [
+            {
+                "field_id": field_id,
+                "date": observed,
+                "ndvi_value": point["ndvi_value"],
+                "biomass_estimate": point_biomass,
+                "data_source": data_source
+            }
+            for observed, point, point_biomass in zip(dates, series, biomass.tolist())
+        ])
+
+    def _store_demo_rows(self, db: Session, field_id: int, coordinates: List[List[float]], start: date, end: date,
+                         planting_reports: List[PlantingReportRow]):
+        """Give a field without any rows demo rows once, so its charts are not empty"""
+        has_rows = db.query(models.NDVIData.id).filter(models.NDVIData.field_id == field_id).first()
+        if has_rows is None:
+            demo_series = self.ee_service._generate_demo_ndvi_data(
+                start.strftime("%Y-%m-%d"), (end - timedelta(days=1)).strftime("%Y-%m-%d"), field_seed(coordinates)
+            )
+            self._store_field_rows(db, field_id, demo_series, DEMO_DATA_SOURCE, planting_reports)
@@ -0,0 +1,191 @@
+"""
+Bulk writes to ndvi_data and the packed per-field series.
+
+Rows are unique per (field_id, date, data_source). Writers hand over whole
+series and they are upserted with one INSERT ... ON CONFLICT statement run for
+all rows, instead of being loaded, compared and added one ORM object at a time.
+
+The same upsert merges the rows into ndvi_series, which holds each field's
+series per source as packed arrays (int32 day offsets, float32 NDVI and
+biomass). Analytics and charts load a whole history with one row fetch and
+np.frombuffer views over the blobs instead of thousands of ORM objects.
+Observations that were added or changed also update the dashboard rollups
+(ndvi_rollups).
+"""
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import models
+from ndvi_rollups import update_field_rollups
+
+NDVI_ROW_KEY = ("field_id", "date", "data_source")
+
+# Generated rows of development setups without Earth Engine; never served unless asked for by source
+DEMO_DATA_SOURCE = "demo"
+
+# INSERT ... ON CONFLICT per dialect; database.create_database_engine accepts no others
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+SERIES_EPOCH = np.datetime64("1970-01-01", "D")
+DAY_DTYPE = np.dtype("<i4")
+VALUE_DTYPE = np.dtype("<f4")
+
+class NDVISeriesArrays(NamedTuple):
+    """One field's series of one source; arrays are read-only views over the stored blobs"""
+    days: np.ndarray  # int32 days since SERIES_EPOCH, ascending
+    ndvi: np.ndarray  # float32, NaN when unknown
+    biomass: np.ndarray  # float32, NaN when unknown
+
+    @property
+    def dates(self) -> np.ndarray:
+        return SERIES_EPOCH + self.days.astype("timedelta64[D]")
+
+def upsert_ndvi_rows(db: Session, rows: Sequence[Dict[str, Any]]) -> int:
+    """
+    Insert NDVI rows, or update ndvi_value and biomass_estimate of the stored row with the same key (caller commits)
+
+    Args:
+        rows: dicts with field_id, date (datetime), ndvi_value, biomass_estimate and data_source
+
+    Returns:
+        number of rows inserted or changed; unchanged rows are not rewritten
+    """
+    if not rows:
+        return 0
+    insert = UPSERT_INSERTS[db.get_bind().dialect.name]
+    table = models.NDVIData.__table__
+    statement = insert(table)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(NDVI_ROW_KEY),
+        set_={
+            "ndvi_value": statement.excluded.ndvi_value,
+            "biomass_estimate": statement.excluded.biomass_estimate
+        },
+        where=(
+            table.c.ndvi_value.is_distinct_from(statement.excluded.ndvi_value)
+            | table.c.biomass_estimate.is_distinct_from(statement.excluded.biomass_estimate)
+        )
+    )
+    now = datetime.utcnow()
+    # Later duplicates in the same batch win, like repeated updates would
+    unique_rows = {tuple(row[column] for column in NDVI_ROW_KEY): row for row in rows}
+    parameters = [
+        {
+            "field_id": row["field_id"],
+            "date": row["date"],
+            "ndvi_value": row["ndvi_value"],
+            "biomass_estimate": row["biomass_estimate"],
+            "data_source": row["data_source"],
+            "created_at": now
+        }
+        for row in unique_rows.values()
+    ]
+    # executemany: one cached statement, values sent in driver batches
+    written = db.execute(statement, parameters).rowcount
+
+    by_series = {}
+    for row in parameters:
+        by_series.setdefault((row["field_id"], row["data_source"]), []).append(row)
+    for (field_id, data_source), series_rows in by_series.items():
+        append_to_series(db, field_id, data_source, series_rows)
+    return written
+
+def _unpack(series: models.NDVISeries) -> NDVISeriesArrays:
+    return NDVISeriesArrays(
+        np.frombuffer(series.day_offsets, dtype=DAY_DTYPE),
+        np.frombuffer(series.ndvi_values, dtype=VALUE_DTYPE),
+        np.frombuffer(series.biomass_values, dtype=VALUE_DTYPE)
+    )
+
+def merge_series(existing: NDVISeriesArrays, new: NDVISeriesArrays) -> NDVISeriesArrays:
+    """Union of both series by day; on the same day the new value wins"""
+    if len(existing.days) == 0 or (
+        new.days[0] > existing.days[-1] and np.all(np.diff(new.days) > 0)
+    ):
+        # Plain append: the common case of a refresh adding the newest revisits
+        return NDVISeriesArrays(*(np.concatenate([old, added]) for old, added in zip(existing, new)))
+    combined = NDVISeriesArrays(*(np.concatenate([old, added]) for old, added in zip(existing, new)))
+    # Last occurrence of every day (np.unique returns them in day order)
+    _, reversed_index = np.unique(combined.days[::-1], return_index=True)
+    keep = len(combined.days) - 1 - reversed_index
+    return NDVISeriesArrays(*(values[keep] for values in combined))
+
+def _same_values(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return (a == b) | (np.isnan(a) & np.isnan(b))
+
+def changed_days(existing: NDVISeriesArrays, new: NDVISeriesArrays) -> np.ndarray:
+    """Days of new that existing lacks or holds with other values"""
+    if len(existing.days) == 0:
+        return new.days
+    position = np.minimum(np.searchsorted(existing.days, new.days), len(existing.days) - 1)
+    unchanged = (
+        (existing.days[position] == new.days)
+        & _same_values(existing.ndvi[position], new.ndvi)
+        & _same_values(existing.biomass[position], new.biomass)
+    )
+    return new.days[~unchanged]
+
+def append_to_series(db: Session, field_id: int, data_source: str, rows: Sequence[Dict[str, Any]]):
+    """Merge ndvi_data rows of one field and source into its packed series and rollups (caller commits)"""
+    new = NDVISeriesArrays(
+        np.array([(row["date"] - datetime(1970, 1, 1)).days for row in rows], dtype=DAY_DTYPE),
+        np.array([row["ndvi_value"] for row in rows], dtype=float).astype(VALUE_DTYPE),
+        np.array([row["biomass_estimate"] for row in rows], dtype=float).astype(VALUE_DTYPE)
+    )
+    order = np.argsort(new.days, kind="stable")
+    new = NDVISeriesArrays(*(values[order] for values in new))
+
+    # Row lock on PostgreSQL so concurrent writers of the same field merge one after the other
+    series = db.query(models.NDVISeries).filter(
+        models.NDVISeries.field_id == field_id,
+        models.NDVISeries.data_source == data_source
+    ).with_for_update().first()
+    existing = _unpack(series) if series is not None else NDVISeriesArrays(*(values[:0] for values in new))
+    if series is None:
+        series = models.NDVISeries(field_id=field_id, data_source=data_source)
+    merged = merge_series(existing, new)
+    series.day_offsets = merged.days.tobytes()
+    series.ndvi_values = merged.ndvi.tobytes()
+    series.biomass_values = merged.biomass.tobytes()
+    series.point_count = len(merged.days)
+    if series.id is None:
+        db.add(series)
+        # Sessions don't autoflush; a later append in the same transaction must find this row
+        db.flush()
+    update_field_rollups(db, field_id, data_source, *merged, changed_days(existing, new))
+
+def not_demo(data_source_column):
+    """Filter clause keeping rows of every source but demo (rows without a source included)"""
+    return data_source_column.is_distinct_from(DEMO_DATA_SOURCE)
+
+def load_ndvi_series(db: Session, field_id: int, data_source: Optional[str] = None) -> Dict[str, NDVISeriesArrays]:
+    """Every stored series of a field (or just one source) in one query, as {data_source: arrays}"""
+    query = db.query(models.NDVISeries).filter(models.NDVISeries.field_id == field_id)
+    if data_source is not None:
+        query = query.filter(models.NDVISeries.data_source == data_source)
+    return {series.data_source: _unpack(series) for series in query}
+
+def rebuild_ndvi_series(db: Session, field_ids: Optional[List[int]] = None) -> int:
+    """Rebuild packed series from ndvi_data (all fields, or the given ones); returns the number of series (caller commits)"""
+    query = db.query(
+        models.NDVIData.field_id, models.NDVIData.data_source, models.NDVIData.date,
+        models.NDVIData.ndvi_value, models.NDVIData.biomass_estimate
+    )
+    if field_ids is not None:
+        query = query.filter(models.NDVIData.field_id.in_(field_ids))
+    by_series = {}
+    for field_id, data_source, observed, ndvi_value, biomass_estimate in query:
+        if observed is None or ndvi_value is None or data_source is None:
+            continue
+        by_series.setdefault((field_id, data_source), []).append(
+            {"date": observed, "ndvi_value": ndvi_value, "biomass_estimate": biomass_estimate}
+        )
+    stale = db.query(models.NDVISeries)
+    if field_ids is not None:
+        stale = stale.filter(models.NDVISeries.field_id.in_(field_ids))
+    stale.delete(synchronize_session=False)
+    for (field_id, data_source), rows in by_series.items():
+        append_to_series(db, field_id, data_source, rows)
+    return len(by_series)
@@ -0,0 +1,90 @@
+"""
+Near-duplicate photo index over 64-bit perceptual hashes.
+
+Multi-index hashing: each hash is split into max_distance + 1 disjoint bit
+segments, with one exact-match table per segment. Two hashes within Hamming
+distance max_distance must agree exactly on at least one segment
+(pigeonhole), so a lookup only checks the few photos that share a segment
+instead of every stored photo.
+"""
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+HASH_BITS = 64
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+class PerceptualHashIndex:
+    """In-memory multi-index hash table for Hamming-radius lookups"""
+
+    def __init__(self, max_distance: int = 6):
+        self.max_distance = max_distance
+
+        # Split 64 bits into max_distance + 1 nearly equal segments
+        segment_count = max_distance + 1
+        base, extra = divmod(HASH_BITS, segment_count)
+        self._segments = []  # (shift, mask) per segment
+        shift = 0
+        for index in range(segment_count):
+            width = base + (1 if index < extra else 0)
+            self._segments.append((shift, (1 << width) - 1))
+            shift += width
+
+        self._tables = [dict() for _ in self._segments]  # segment value -> list of photo ids
+        self._hashes = {}  # photo id -> (hash, info)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def add(self, photo_id: Any, photo_hash: int, info: Optional[Dict] = None):
+        with self._lock:
+            if photo_id in self._hashes:
+                self._remove(photo_id)
+            self._hashes[photo_id] = (photo_hash, info or {})
+            for table, (shift, mask) in zip(self._tables, self._segments):
+                table.setdefault((photo_hash >> shift) & mask, []).append(photo_id)
+
+    def remove(self, photo_id: Any):
+        with self._lock:
+            self._remove(photo_id)
+
+    def _remove(self, photo_id: Any):
+        entry = self._hashes.pop(photo_id, None)
+        if entry is None:
+            return
+        photo_hash = entry[0]
+        for table, (shift, mask) in zip(self._tables, self._segments):
+            key = (photo_hash >> shift) & mask
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.remove(photo_id)
+                if not bucket:
+                    del table[key]
+
+    def query(self, photo_hash: int, max_distance: Optional[int] = None) -> List[Tuple[Any, int, Dict]]:
+        """
+        Find stored photos within max_distance bits of photo_hash
+
+        Returns:
+            (photo id, distance, info) tuples, closest first
+        """
+        if max_distance is None or max_distance > self.max_distance:
+            max_distance = self.max_distance
+
+        matches = []
+        seen = set()
+        with self._lock:
+            for table, (shift, mask) in zip(self._tables, self._segments):
+                for photo_id in table.get((photo_hash >> shift) & mask, ()):
+                    if photo_id in seen:
+                        continue
+                    seen.add(photo_id)
+                    stored_hash, info = self._hashes[photo_id]
+                    distance = hamming_distance(photo_hash, stored_hash)
+                    if distance <= max_distance:
+                        matches.append((photo_id, distance, info))
+
+        matches.sort(key=lambda match: match[1])
+        return matches
@@ -0,0 +1,170 @@
+"""
+On-disk storage for field photos and their smaller renditions.
+
+Each photo gets its own directory under the storage root holding the original
+upload and, next to it, thumbnail and medium-size renditions in WebP and JPEG:
+
+    uploads/photos/<photo_id>/original.jpg
+    uploads/photos/<photo_id>/thumb.webp, thumb.jpg
+    uploads/photos/<photo_id>/medium.webp, medium.jpg
+
+Renditions are generated once (in the background right after upload, or on
+first request) and never change afterwards, so they can be cached by clients
+for a long time.
+"""
+import io
+import math
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, Union
+from PIL import Image, ImageOps
+
+# Longest side in pixels
+RENDITION_SIZES = {
+    "thumb": 256,
+    "medium": 1024
+}
+
+# format name -> (Pillow format, file extension, media type)
+RENDITION_FORMATS = {
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg")
+}
+
+ORIGINAL_MEDIA_TYPES = {
+    "jpg": "image/jpeg",
+    "png": "image/png",
+    "webp": "image/webp"
+}
+
+class PhotoStorage:
+    """Stores originals and generates their renditions exactly once"""
+
+    def __init__(self, root: str = "uploads/photos", jpeg_quality: int = 80, webp_quality: int = 75):
+        self.root = root
+        self.jpeg_quality = jpeg_quality
+        self.webp_quality = webp_quality
+
+        self._lock = threading.Lock()
+        self._photo_locks = {}  # photo id -> lock held while its renditions are generated
+        # One background thread: rendition work must not compete with the analysis workers
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="photo-renditions")
+
+    def photo_dir(self, photo_id: int) -> str:
+        return os.path.join(self.root, str(photo_id))
+
+    def save_original(self, photo_id: int, image_data: Union[bytes, str]) -> str:
+        """Store the uploaded photo (bytes or a path to a spooled upload) as the original"""
+        os.makedirs(self.photo_dir(photo_id), exist_ok=True)
+        source = image_data if isinstance(image_data, str) else io.BytesIO(image_data)
+        with Image.open(source) as image:
+            extension = self._extension_for(image.format)
+
+        path = os.path.join(self.photo_dir(photo_id), f"original.{extension}")
+        temp_path = path + ".tmp"
+        if isinstance(image_data, str):
+            shutil.copyfile(image_data, temp_path)
+        else:
+            with open(temp_path, "wb") as f:
+                f.write(image_data)
+        os.replace(temp_path, path)
+        return path
+
+    def original_path(self, photo_id: int) -> Optional[str]:
+        for extension in ORIGINAL_MEDIA_TYPES:
+            path = os.path.join(self.photo_dir(photo_id), f"original.{extension}")
+            if os.path.exists(path):
+                return path
+        return None
+
+    def rendition_path(self, photo_id: int, size: str, fmt: str) -> str:
+        extension = RENDITION_FORMATS[fmt][1]
+        return os.path.join(self.photo_dir(photo_id), f"{size}.{extension}")
+
+    def get_photo_file(self, photo_id: int, size: str = "medium", fmt: str = "jpeg") -> Dict[str, str]:
+        """
+        Path and media type of a stored photo, generating its renditions on first use
+
+        Raises:
+            FileNotFoundError: if no original is stored for the photo
+        """
+        if size == "original":
+            path = self.original_path(photo_id)
+            if path is None:
+                raise FileNotFoundError(f"No stored original for photo {photo_id}")
+            return {"path": path, "media_type": ORIGINAL_MEDIA_TYPES[path.rsplit(".", 1)[1]]}
+
+        path = self.rendition_path(photo_id, size, fmt)
+        if not os.path.exists(path):
+            self.generate_renditions(photo_id)
+        return {"path": path, "media_type": RENDITION_FORMATS[fmt][2]}
+
+    def schedule_renditions(self, photo_id: int):
+        """Generate renditions in the background so the first thumbnail request is already a file read"""
+        future = self._executor.submit(self.generate_renditions, photo_id)
+        future.add_done_callback(lambda done: done.exception() and print(
+            f"⚠️ Rendition generation failed for photo {photo_id}: {done.exception()}"
+        ))
+
+    def generate_renditions(self, photo_id: int) -> Dict[str, Dict[str, str]]:
+        """
+        Decode the original once and write every size and format missing on disk
+
+        Returns:
+            {size: {format: path}}
+        """
+        with self._lock:
+            photo_lock = self._photo_locks.setdefault(photo_id, threading.Lock())
+
+        with photo_lock:
+            paths = {
+                size: {fmt: self.rendition_path(photo_id, size, fmt) for fmt in RENDITION_FORMATS}
+                for size in RENDITION_SIZES
+            }
+            if all(os.path.exists(path) for formats in paths.values() for path in formats.values()):
+                return paths
+
+            original = self.original_path(photo_id)
+            if original is None:
+                raise FileNotFoundError(f"No stored original for photo {photo_id}")
+
+            with Image.open(original) as image:
+                # JPEG DCT scaling: decode directly at (at least) the largest rendition size
+                largest = max(RENDITION_SIZES.values())
+                scale = largest / max(image.size)
+                if scale < 1:
+                    image.draft("RGB", (math.ceil(image.size[0] * scale), math.ceil(image.size[1] * scale)))
+                # Phones store rotation in EXIF; renditions are written upright
+                rendition = ImageOps.exif_transpose(image).convert("RGB")
+
+            # Largest first, so each smaller size is resized from the previous one
+            for size, max_dimension in sorted(RENDITION_SIZES.items(), key=lambda item: -item[1]):
+                rendition.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+                for fmt, path in paths[size].items():
+                    self._write_rendition(rendition, path, fmt)
+
+        with self._lock:
+            self._photo_locks.pop(photo_id, None)
+        return paths
+
+    def _write_rendition(self, image: Image.Image, path: str, fmt: str):
+        pillow_format = RENDITION_FORMATS[fmt][0]
+        options = {"quality": self.webp_quality, "method": 4} if fmt == "webp" else {
+            "quality": self.jpeg_quality, "optimize": True, "progressive": True
+        }
+        # Written under a temp name so a concurrent reader never sees a partial file
+        temp_path = path + ".tmp"
+        image.save(temp_path, pillow_format, **options)
+        os.replace(temp_path, path)
+
+    @staticmethod
+    def _extension_for(pillow_format: Optional[str]) -> str:
+        extension = {"JPEG": "jpg", "MPO": "jpg", "PNG": "png", "WEBP": "webp"}.get(pillow_format)
+        if extension is None:
+            raise ValueError(f"Unsupported photo format: {pillow_format}")
+        return extension
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,86 @@
+"""
+Request coalescing ("single flight").
+
+Callers asking for the same key while a computation for it is in flight wait
+for that computation instead of starting their own. A successful result stays
+reusable for ttl_seconds afterwards; failures are shared with the callers
+already waiting but never reused.
+"""
+import threading
+import time
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+class Flight:
+    """One in-flight or finished computation"""
+
+    def __init__(self):
+        self.result = None
+        self.error = None
+        self.finished_at = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        if not self._done.wait(timeout):
+            raise TimeoutError("Coalesced request did not finish in time")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+class SingleFlight:
+    """Per-key coalescing of concurrent calls, with a short reuse window"""
+
+    def __init__(self, ttl_seconds: float = 60):
+        self.ttl_seconds = ttl_seconds
+        self._flights = {}  # key -> Flight
+        self._lock = threading.Lock()
+
+    def claim(self, key: Hashable) -> Tuple[Flight, bool]:
+        """
+        Join the flight for key, or start a new one
+
+        Returns:
+            (flight, is_leader); the leader must call resolve() exactly once
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._prune(now)
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = Flight()
+            self._flights[key] = flight
+            return flight, True
+
+    def resolve(self, key: Hashable, flight: Flight, result: Any = None, error: Optional[Exception] = None):
+        with self._lock:
+            flight.result = result
+            flight.error = error
+            flight.finished_at = time.monotonic()
+            if error is not None and self._flights.get(key) is flight:
+                del self._flights[key]
+            flight._done.set()
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """Run fn once for all concurrent callers with the same key"""
+        flight, is_leader = self.claim(key)
+        if not is_leader:
+            return flight.wait(timeout)
+        try:
+            result = fn()
+        except Exception as e:
+            self.resolve(key, flight, error=e)
+            raise
+        self.resolve(key, flight, result=result)
+        return result
+
+    def _prune(self, now: float):
+        expired = [
+            key for key, flight in self._flights.items()
+            if flight.done and now - flight.finished_at > self.ttl_seconds
+        ]
+        for key in expired:
+            del self._flights[key]
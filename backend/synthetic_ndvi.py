@@ -0,0 +1,120 @@
+"""
+Deterministic synthetic NDVI for demos, caching tests and load tests.
+
+Every field gets a seed. Each year the seed picks the field's rain-fed crop,
+planting day and vigour, and the crop's phenology curve (the Kap Verde
+patterns of the demo data) is laid over a bare-soil baseline. Noise comes from
+a counter-based hash of (seed, day) instead of a random stream, so the value
+of a field on a given day is the same no matter which date range asked for it,
+and whole fleets of fields are generated as (fields x dates) arrays.
+
+Observations follow the Sentinel-2 revisit: every 5 days, counted from the
+Sentinel-2A launch, so overlapping requests return the same dates.
+"""
+import hashlib
+import json
+import numpy as np
+from datetime import date, datetime
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+# NDVI every 10 days from planting, per crop
+PHENOLOGY_PATTERNS = {
+    "maize": [0.15, 0.25, 0.45, 0.65, 0.75, 0.70, 0.50, 0.25],
+    "beans": [0.10, 0.20, 0.40, 0.60, 0.55, 0.45, 0.30, 0.15],
+    "sorghum": [0.12, 0.22, 0.42, 0.62, 0.72, 0.68, 0.45, 0.20],
+    "millet": [0.10, 0.18, 0.35, 0.55, 0.65, 0.60, 0.40, 0.18]
+}
+PATTERN_INTERVAL_DAYS = 10
+SYNTHETIC_CROPS = sorted(PHENOLOGY_PATTERNS)
+
+BARE_SOIL_NDVI = 0.13
+# Days after the last pattern value until the field is back to bare soil (harvest residue)
+SENESCENCE_DAYS = 20
+# Rain-fed planting follows the first rains: early July to late July (day of year)
+PLANTING_DAY_RANGE = (182, 210)
+NOISE_AMPLITUDE = 0.03
+
+REVISIT_DAYS = 5
+REVISIT_EPOCH = np.datetime64("2015-06-23", "D")  # Sentinel-2A launch
+
+DateLike = Union[str, date, datetime, np.datetime64]
+
+def _day(value: DateLike) -> np.datetime64:
+    if isinstance(value, datetime):
+        value = value.date()
+    return np.datetime64(value, "D")
+
+def field_seed(key: Any) -> int:
+    """Stable 63-bit seed for a field id, geometry hash or coordinate list"""
+    encoded = json.dumps(key, sort_keys=True, default=str).encode()
+    return int.from_bytes(hashlib.sha256(encoded).digest()[:8], "big") >> 1
+
+def _hash_uniform(*keys: np.ndarray) -> np.ndarray:
+    """Uniform [0, 1) values from integer keys (splitmix64), broadcast over the key arrays"""
+    with np.errstate(over="ignore"):
+        state = np.zeros(np.broadcast(*keys).shape, dtype=np.uint64)
+        for key in keys:
+            state = state ^ np.asarray(key).astype(np.uint64)
+            state = state + np.uint64(0x9E3779B97F4A7C15)
+            state = (state ^ (state >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            state = (state ^ (state >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            state = state ^ (state >> np.uint64(31))
+    return (state >> np.uint64(11)).astype(np.float64) * 2.0 ** -53
+
+def season_curve(crop_type: str, days_since_planting: np.ndarray, baseline: float = BARE_SOIL_NDVI) -> np.ndarray:
+    """Noise-free NDVI of a crop at the given days after planting; baseline outside the season"""
+    pattern = PHENOLOGY_PATTERNS.get(crop_type, PHENOLOGY_PATTERNS["maize"])
+    xp = np.arange(len(pattern)) * PATTERN_INTERVAL_DAYS
+    xp = np.append(xp, xp[-1] + SENESCENCE_DAYS)
+    return np.interp(days_since_planting, xp, pattern + [baseline], left=baseline, right=baseline)
+
+def revisit_dates(start_date: DateLike, end_date: DateLike) -> np.ndarray:
+    """Revisit days in [start_date, end_date] (inclusive, like the old demo data)"""
+    start, end = _day(start_date), _day(end_date)
+    first = start + (-(start - REVISIT_EPOCH).astype(int)) % REVISIT_DAYS
+    return np.arange(first, end + 1, REVISIT_DAYS)
+
+def generate_fleet(seeds: Sequence[int], start_date: DateLike, end_date: DateLike) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Synthetic NDVI for many fields on the shared revisit dates
+
+    Returns:
+        (dates as datetime64[D] of shape (D,), NDVI as float32 of shape (len(seeds), D))
+    """
+    dates = revisit_dates(start_date, end_date)
+    seeds = np.asarray(seeds, dtype=np.uint64)[:, None]
+    if len(dates) == 0:
+        return dates, np.empty((len(seeds), 0), dtype=np.float32)
+
+    years = dates.astype("datetime64[Y]")
+    day_of_year = (dates - years).astype(int)[None, :] + 1
+    year_keys = years.astype(int)[None, :]
+
+    # Per field and year: crop, planting day, vigour and bare-soil level
+    crop_index = (_hash_uniform(seeds, year_keys, 1) * len(SYNTHETIC_CROPS)).astype(int)
+    planting_day = PLANTING_DAY_RANGE[0] + (
+        _hash_uniform(seeds, year_keys, 2) * (PLANTING_DAY_RANGE[1] - PLANTING_DAY_RANGE[0])
+    ).astype(int)
+    vigour = 0.85 + 0.25 * _hash_uniform(seeds, year_keys, 3)
+    baseline = BARE_SOIL_NDVI + 0.04 * (_hash_uniform(seeds, 4) - 0.5)
+    days_since_planting = day_of_year - planting_day
+
+    # The crop's rise above bare soil, scaled by vigour
+    rise = np.zeros(crop_index.shape, dtype=np.float64)
+    for index, crop_type in enumerate(SYNTHETIC_CROPS):
+        grown = crop_index == index
+        if grown.any():
+            rise[grown] = season_curve(crop_type, days_since_planting[grown]) - BARE_SOIL_NDVI
+    values = baseline + vigour * np.maximum(rise, 0.0)
+
+    day_keys = (dates - REVISIT_EPOCH).astype(int)[None, :]
+    values += NOISE_AMPLITUDE * (2 * _hash_uniform(seeds, day_keys, 5) - 1)
+    return dates, np.round(np.clip(values, 0.0, 1.0), 3).astype(np.float32)
+
+def generate_series(seed: int, start_date: DateLike, end_date: DateLike) -> List[Dict[str, Any]]:
+    """One field's synthetic series as [{'date', 'ndvi_value'}, ...], like EarthEngineService results"""
+    dates, values = generate_fleet([seed], start_date, end_date)
+    return [
+        {'date': str(day), 'ndvi_value': round(float(value), 3)}
+        for day, value in zip(dates, values[0])
+    ]
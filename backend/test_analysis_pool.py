@@ -0,0 +1,71 @@
+"""Per-job timeouts in the photo analysis pool: only the overrunning job fails"""
+import threading
+import time
+import pytest
+from analysis_pool import AnalysisPool, AnalysisTimeout
+
+class SleepService:
+    """Stands in for ImageAnalysisService in the spawned workers"""
+
+    def sleep(self, seconds: float) -> float:
+        time.sleep(seconds)
+        return seconds
+
+@pytest.fixture
+def one_worker():
+    pool = AnalysisPool(max_workers=1, max_queue_size=4, job_timeout_seconds=1, service_class=SleepService)
+    pool.warm_up()
+    yield pool
+    pool.shutdown()
+
+def wait_in_thread(pool, future, results, name):
+    def wait():
+        try:
+            results[name] = pool.result(future)
+        except Exception as e:
+            results[name] = e
+    thread = threading.Thread(target=wait)
+    thread.start()
+    return thread
+
+def test_queue_wait_does_not_count_toward_the_timeout(one_worker):
+    running = one_worker.submit("sleep", seconds=0.8)
+    queued = one_worker.submit("sleep", seconds=0.5)
+    # queued waits about 0.8 s and runs 0.5 s: over the 1 s timeout overall, within it once started
+    assert one_worker.result(queued) == 0.5
+    assert one_worker.result(running) == 0.8
+
+def test_queued_timeout_does_not_fail_the_running_job(one_worker):
+    results = {}
+    running = one_worker.submit("sleep", seconds=0.6)
+    stuck = one_worker.submit("sleep", seconds=30)
+    threads = [wait_in_thread(one_worker, running, results, "running"),
+               wait_in_thread(one_worker, stuck, results, "stuck")]
+    for thread in threads:
+        thread.join(10)
+    assert results["running"] == 0.6
+    assert isinstance(results["stuck"], AnalysisTimeout)
+
+def test_jobs_sharing_the_pool_of_a_killed_worker_are_resubmitted():
+    pool = AnalysisPool(max_workers=2, max_queue_size=4, job_timeout_seconds=1, service_class=SleepService)
+    pool.warm_up()
+    try:
+        results = {}
+        stuck = pool.submit("sleep", seconds=30)
+        time.sleep(0.5)
+        healthy = pool.submit("sleep", seconds=0.8)  # Running when the stuck job's worker is killed
+        queued = pool.submit("sleep", seconds=0.2)
+        threads = [wait_in_thread(pool, stuck, results, "stuck"),
+                   wait_in_thread(pool, healthy, results, "healthy"),
+                   wait_in_thread(pool, queued, results, "queued")]
+        for thread in threads:
+            thread.join(15)
+        assert isinstance(results["stuck"], AnalysisTimeout)
+        assert results["healthy"] == 0.8 and results["queued"] == 0.2
+
+        # Every slot was given back and the replacement pool takes new work
+        assert pool.run("sleep", seconds=0) == 0
+        futures = pool.submit_many([("sleep", {"seconds": 0})] * 6)
+        assert [pool.result(future) for future in futures] == [0] * 6
+    finally:
+        pool.shutdown()
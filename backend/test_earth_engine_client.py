@@ -0,0 +1,46 @@
+"""EarthEngineClient: batch calls get their own timeout and stay out of the circuit breaker"""
+import time
+import pytest
+from earth_engine_client import CircuitBreaker, EarthEngineClient, EarthEngineTimeout, EarthEngineUnavailable
+
+class FakeEarthEngine:
+    ee_available = True
+
+    def __init__(self):
+        self.deadline_ms = None
+
+    def set_request_deadline(self, milliseconds):
+        self.deadline_ms = milliseconds
+
+    def slow(self, seconds):
+        time.sleep(seconds)
+        return "done"
+
+    def unreachable(self):
+        raise ConnectionError("connection reset")
+
+@pytest.fixture
+def client():
+    client = EarthEngineClient(FakeEarthEngine(), timeout_seconds=0.1, batch_timeout_seconds=1,
+                               max_attempts=2, retry_base_seconds=0, failure_threshold=1)
+    yield client
+    client.shutdown()
+
+def test_request_deadline_fits_batch_calls(client):
+    assert client.ee_service.deadline_ms == 1000
+
+def test_batch_calls_have_their_own_timeout(client):
+    assert client.call_batch("slow", 0.3) == "done"
+    with pytest.raises(EarthEngineTimeout):
+        client.call("slow", 0.3)
+
+def test_batch_failures_do_not_open_the_breaker(client):
+    with pytest.raises(EarthEngineUnavailable):
+        client.call_batch("unreachable")
+    assert client.breaker.state == CircuitBreaker.CLOSED
+    assert "connection reset" in client.last_error
+    assert client.call("slow", 0) == "done"
+
+    with pytest.raises(EarthEngineUnavailable):
+        client.call("unreachable")
+    assert client.breaker.state == CircuitBreaker.OPEN
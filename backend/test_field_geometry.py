@@ -0,0 +1,52 @@
+"""GPS validation geometry: containment and distance to the field edge, in meters"""
+import math
+import numpy as np
+from field_geometry import EARTH_RADIUS_METERS, distance_to_field, points_in_field
+
+ORIGIN = (14.92, -23.60)  # Santiago
+
+def offset(east_meters: float, north_meters: float) -> list:
+    """[lat, lon] of a point east/north of ORIGIN"""
+    lat = ORIGIN[0] + math.degrees(north_meters / EARTH_RADIUS_METERS)
+    lon = ORIGIN[1] + math.degrees(east_meters / (EARTH_RADIUS_METERS * math.cos(math.radians(ORIGIN[0]))))
+    return [lat, lon]
+
+# Long, thin strip: 200 m east-west, 20 m north-south, closed ring
+STRIP = [offset(0, 0), offset(200, 0), offset(200, 20), offset(0, 20), offset(0, 0)]
+
+def test_inside_points_have_zero_distance():
+    points = [offset(100, 10), offset(1, 1), offset(199, 19)]
+    assert points_in_field(points, STRIP).all()
+    assert np.allclose(distance_to_field(points, STRIP), 0.0)
+
+def test_points_on_the_edge_are_at_the_field():
+    points = [offset(100, 0), offset(200, 10), offset(0, 0)]
+    assert np.allclose(distance_to_field(points, STRIP), 0.0, atol=0.01)
+
+def test_point_beside_long_edge_measures_to_the_edge_not_the_corners():
+    # 5 m north of the middle of the northern edge; the nearest corner is ~100 m away
+    distance = distance_to_field([offset(100, 25)], STRIP)[0]
+    assert not points_in_field([offset(100, 25)], STRIP)[0]
+    assert abs(distance - 5.0) < 0.05, distance
+
+def test_point_past_a_corner_measures_to_the_corner():
+    distance = distance_to_field([offset(230, 60)], STRIP)[0]
+    assert abs(distance - 50.0) < 0.1, distance
+
+def test_open_and_closed_rings_agree():
+    points = [offset(x, y) for x in (-50, 50, 150, 250) for y in (-30, 10, 40)]
+    assert np.allclose(distance_to_field(points, STRIP), distance_to_field(points, STRIP[:-1]))
+    assert (points_in_field(points, STRIP) == points_in_field(points, STRIP[:-1])).all()
+
+def test_concave_field_notch_is_outside():
+    # U shape: the notch between the arms is not part of the field
+    u_shape = [offset(0, 0), offset(90, 0), offset(90, 90), offset(60, 90),
+               offset(60, 30), offset(30, 30), offset(30, 90), offset(0, 90)]
+    inside, notch = offset(15, 60), offset(45, 60)
+    assert points_in_field([inside, notch], u_shape).tolist() == [True, False]
+    assert abs(distance_to_field([notch], u_shape)[0] - 15.0) < 0.05
+
+def test_empty_inputs():
+    assert len(distance_to_field([], STRIP)) == 0
+    assert np.isinf(distance_to_field([offset(0, 0)], [])).all()
+    assert not points_in_field([offset(0, 0)], STRIP[:2]).any()
@@ -0,0 +1,88 @@
+"""Photo metadata read from the start of the file, without decoding pixels"""
+import io
+from datetime import datetime
+import pytest
+from PIL import ExifTags, Image
+from PIL.TiffImagePlugin import IFDRational
+from image_analysis_service import ImageAnalysisService
+
+TAKEN = datetime(2024, 8, 5, 9, 30)
+LATITUDE, LONGITUDE = 14.9205, -23.6005
+
+def degrees_minutes_seconds(value: float) -> tuple:
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 4)
+    return tuple(IFDRational(part) for part in (degrees, minutes, seconds))
+
+def photo_exif() -> Image.Exif:
+    exif = Image.Exif()
+    exif[ExifTags.Base.DateTime] = TAKEN.strftime("%Y:%m:%d %H:%M:%S")
+    exif[ExifTags.Base.GPSInfo] = {
+        ExifTags.GPS.GPSLatitudeRef: "N", ExifTags.GPS.GPSLatitude: degrees_minutes_seconds(LATITUDE),
+        ExifTags.GPS.GPSLongitudeRef: "W", ExifTags.GPS.GPSLongitude: degrees_minutes_seconds(LONGITUDE)
+    }
+    return exif
+
+def photo(image_format: str = "JPEG", with_exif: bool = True) -> bytes:
+    buffer = io.BytesIO()
+    extra = {"exif": photo_exif().tobytes()} if with_exif else {}
+    Image.new("RGB", (640, 480), (60, 140, 50)).save(buffer, image_format, **extra)
+    return buffer.getvalue()
+
+def segment_offsets(data: bytes) -> dict:
+    """{marker: offset} of the JPEG segments before the first scan"""
+    offsets, pos = {}, 2
+    while data[pos + 1] != 0xDA:
+        offsets.setdefault(data[pos + 1], pos)
+        pos += 2 + int.from_bytes(data[pos + 2:pos + 4], "big")
+    return offsets
+
+@pytest.fixture(scope="module")
+def service():
+    return ImageAnalysisService()
+
+def assert_photo_metadata(metadata: dict):
+    assert metadata["datetime"] == "2024:08:05 09:30:00"
+    latitude, longitude = metadata["gps_coords"]
+    assert abs(latitude - LATITUDE) < 1e-6 and abs(longitude - LONGITUDE) < 1e-6
+
+def test_exif_and_frame_size_of_a_whole_jpeg(service):
+    result = service.read_photo_metadata(photo())
+    assert_photo_metadata(result["metadata"])
+    assert result["image_size"] == [640, 480]
+
+def test_header_cut_before_the_frame_keeps_the_exif(service):
+    data = photo()
+    offsets = segment_offsets(data)
+    # Stop inside the segment after EXIF (the quantization table), before the frame header
+    cut = offsets[0xDB] + 10
+    assert offsets[0xE1] < cut < offsets[0xC0]
+    result = service.read_photo_metadata(data, max_header_bytes=cut)
+    assert_photo_metadata(result["metadata"])
+    assert result["image_size"] is None
+
+@pytest.mark.filterwarnings("ignore:Corrupt EXIF data")
+def test_header_cut_inside_the_exif_segment(service):
+    data = photo()
+    cut = segment_offsets(data)[0xE1] + 20
+    result = service.read_photo_metadata(data, max_header_bytes=cut)
+    assert "gps_coords" not in result["metadata"] and result["image_size"] is None
+
+def test_fill_bytes_before_markers_are_skipped(service):
+    data = photo()
+    frame = segment_offsets(data)[0xC0]
+    padded = data[:2] + b"\xff\xff" + data[2:frame] + b"\xff\xff\xff" + data[frame:]
+    result = service.read_photo_metadata(padded)
+    assert_photo_metadata(result["metadata"])
+    assert result["image_size"] == [640, 480]
+
+def test_jpeg_without_exif(service):
+    result = service.read_photo_metadata(photo(with_exif=False))
+    assert result == {"metadata": {}, "image_size": [640, 480]}
+
+def test_other_formats_fall_back_to_pil(service):
+    result = service.read_photo_metadata(io.BytesIO(photo("PNG")))
+    assert_photo_metadata(result["metadata"])
+    assert result["image_size"] == [640, 480]
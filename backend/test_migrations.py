@@ -0,0 +1,44 @@
+"""Upgrading a database whose ndvi_data predates the unique (field_id, date, data_source) index"""
+from sqlalchemy import inspect, text
+from migrations import run_migrations
+
+ROWS = [
+    # (id, date, ndvi_value, data_source)
+    (1, "2024-08-05 00:00:00", 0.40, "sentinel-2"),
+    (2, "2024-08-05 00:00:00", 0.45, "sentinel-2"),  # Newer duplicate wins
+    (3, "2024-08-05 00:00:00", 0.30, "demo"),  # Same day, other source: kept
+    (4, "2024-08-10 00:00:00", 0.50, None),
+    (5, "2024-08-10 00:00:00", 0.55, None),  # Missing sources count as one source
+    (6, "2024-08-15 00:00:00", 0.60, "sentinel-2")
+]
+
+def seed_legacy_rows(engine):
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX uq_ndvi_data_field_date_source"))
+        connection.execute(text("INSERT INTO users (id, email, hashed_password) VALUES (1, 'farmer@kapverde.cv', '-')"))
+        connection.execute(text("INSERT INTO fields (id, name, owner_id) VALUES (1, 'Field 1', 1)"))
+        for row_id, day, ndvi_value, data_source in ROWS:
+            connection.execute(text(
+                "INSERT INTO ndvi_data (id, field_id, date, ndvi_value, data_source) "
+                "VALUES (:id, 1, :date, :ndvi_value, :data_source)"
+            ), {"id": row_id, "date": day, "ndvi_value": ndvi_value, "data_source": data_source})
+
+def test_duplicates_are_removed_and_the_index_created(engine):
+    seed_legacy_rows(engine)
+    run_migrations(engine)
+
+    with engine.connect() as connection:
+        survivors = connection.execute(text("SELECT id, ndvi_value FROM ndvi_data ORDER BY id")).all()
+        series = connection.execute(text("SELECT data_source FROM ndvi_series ORDER BY data_source")).scalars().all()
+    assert survivors == [(2, 0.45), (3, 0.30), (5, 0.55), (6, 0.60)]
+    assert series == ["demo", "sentinel-2"]  # Rows without a source are not packed
+    indexes = {index["name"]: index for index in inspect(engine).get_indexes("ndvi_data")}
+    index = indexes["uq_ndvi_data_field_date_source"]
+    assert index["unique"] and index["column_names"] == ["field_id", "date", "data_source"]
+
+def test_running_again_changes_nothing(engine):
+    seed_legacy_rows(engine)
+    run_migrations(engine)
+    run_migrations(engine)
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT COUNT(*) FROM ndvi_data")).scalar() == 4
@@ -0,0 +1,125 @@
+"""Which date ranges the NDVI cache sends to a recording stand-in for Earth Engine"""
+from datetime import date, datetime, timedelta
+import pytest
+from earth_engine_service import EarthEngineService
+from ndvi_cache import NDVITimeSeriesCache, merge_ranges, missing_ranges
+
+FIELD = [[14.92, -23.60], [14.921, -23.60], [14.921, -23.601], [14.92, -23.601]]
+OTHER_FIELD = [[15.10, -23.65], [15.101, -23.65], [15.101, -23.651]]
+
+class RecordingService(EarthEngineService):
+    """Answers from a fixed five-day revisit and records every (start, end, fields) request"""
+
+    def __init__(self, cloudy: bool = False):
+        self._ee_available = True
+        self.cloudy = cloudy
+        self.requests = []
+
+    def _reduce_fields(self, keys, fields, start_date, end_date, composite=None):
+        self.requests.append((start_date, end_date, len(keys)))
+        start = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end = datetime.strptime(end_date, "%Y-%m-%d").date()
+        first = start + timedelta(days=-start.toordinal() % 5)
+        days = [] if self.cloudy else [first + timedelta(days=offset) for offset in range(0, (end - first).days, 5)]
+        return {key: [{"date": day.strftime("%Y-%m-%d"), "ndvi_value": 0.5} for day in days] for key in keys}
+
+class DirectClient:
+    """EarthEngineClient.call without threads, timeouts or retries"""
+
+    def __init__(self, ee_service):
+        self.ee_service = ee_service
+        self.batch_calls = 0
+
+    def call(self, method_name, *args, **kwargs):
+        return getattr(self.ee_service, method_name)(*args, **kwargs)
+
+    def call_batch(self, method_name, *args, **kwargs):
+        self.batch_calls += 1
+        return self.call(method_name, *args, **kwargs)
+
+def new_cache(service, **kwargs) -> NDVITimeSeriesCache:
+    return NDVITimeSeriesCache(DirectClient(service), **kwargs)
+
+def test_missing_ranges():
+    d = lambda day: date(2024, 1, day)
+    assert missing_ranges(d(1), d(31), []) == [(d(1), d(31))]
+    assert missing_ranges(d(1), d(31), [(d(10), d(20))]) == [(d(1), d(10)), (d(20), d(31))]
+    # Touching and overlapping ranges count as one
+    assert missing_ranges(d(1), d(31), [(d(5), d(10)), (d(10), d(15)), (d(12), d(18))]) == [(d(1), d(5)), (d(18), d(31))]
+    assert missing_ranges(d(5), d(10), [(d(1), d(31))]) == []
+    assert missing_ranges(d(5), d(10), [(d(10), d(20))]) == [(d(5), d(10))]
+    assert merge_ranges([(d(10), d(12)), (d(1), d(5)), (d(4), d(8))]) == [(d(1), d(8)), (d(10), d(12))]
+
+def test_repeated_request_is_served_from_cache(db):
+    service = RecordingService()
+    first = new_cache(service, settle_days=0).get_series(db, FIELD, "2024-01-01", "2024-04-01")
+    # A new cache object shares only the database, so nothing is reused from its flights
+    second = new_cache(service, settle_days=0).get_series(db, FIELD, "2024-01-01", "2024-04-01")
+    assert service.requests == [("2024-01-01", "2024-04-01", 1)]
+    assert first == second and not second["degraded"] and len(second["ndvi_data"]) == 18
+
+def test_only_uncovered_dates_are_fetched(db):
+    service = RecordingService()
+    new_cache(service, settle_days=0).get_series(db, FIELD, "2024-02-01", "2024-03-01")
+    series = new_cache(service, settle_days=0).get_series(db, FIELD, "2024-01-01", "2024-04-01")
+    assert service.requests[1:] == [("2024-01-01", "2024-02-01", 1), ("2024-03-01", "2024-04-01", 1)]
+    dates = [point["date"] for point in series["ndvi_data"]]
+    assert dates == sorted(dates) and dates[0] < "2024-01-06" and dates[-1] >= "2024-03-27"
+
+def test_cloudy_range_stays_covered(db):
+    service = RecordingService(cloudy=True)
+    new_cache(service, settle_days=0).get_series(db, FIELD, "2024-01-01", "2024-02-01")
+    series = new_cache(service, settle_days=0).get_series(db, FIELD, "2024-01-01", "2024-02-01")
+    assert len(service.requests) == 1 and series["ndvi_data"] == []
+
+def test_fields_missing_the_same_range_share_requests(db):
+    service = RecordingService()
+    responses = new_cache(service, settle_days=0).get_series_for_fields(
+        db, {"a": FIELD, "b": OTHER_FIELD, "c": FIELD}, "2024-01-01", "2024-02-01"
+    )
+    # Identical polygons are one geometry; both geometries go out in one batched request
+    assert service.requests == [("2024-01-01", "2024-02-01", 2)]
+    assert responses["a"] == responses["c"]
+    assert len(responses["b"]["ndvi_data"]) == len(responses["a"]["ndvi_data"]) == 6
+
+def test_background_refresh_uses_batch_calls(db):
+    cache = new_cache(RecordingService(), settle_days=0)
+    cache.refresh_fields(db, {"a": FIELD}, "2024-01-01", "2024-02-01")
+    assert cache.ee_client.batch_calls == 0
+    cache.refresh_fields(db, {"b": OTHER_FIELD}, "2024-01-01", "2024-02-01", background=True)
+    assert cache.ee_client.batch_calls == 1
+
+def test_unsettled_tail_is_refetched_but_reused_within_the_ttl(db):
+    service = RecordingService()
+    today = date.today()
+    start, settled, end = [(today - timedelta(days=days)).strftime("%Y-%m-%d") for days in (30, 5, 0)]
+    cache = new_cache(service, settle_days=5)
+    cache.get_series(db, FIELD, start, end)
+    # The same cache reuses its fetch of the newest days for the coalescing TTL
+    cache.get_series(db, FIELD, start, end)
+    assert service.requests == [(start, end, 1)]
+    # Only the settled part is covered in the database, so a later request fetches exactly the tail
+    new_cache(service, settle_days=5).get_series(db, FIELD, start, end)
+    assert service.requests == [(start, end, 1), (settled, end, 1)]
+
+def test_range_inside_the_settle_window_is_never_covered(db):
+    service = RecordingService()
+    start, end = [(date.today() - timedelta(days=days)).strftime("%Y-%m-%d") for days in (3, 0)]
+    new_cache(service, settle_days=5).get_series(db, FIELD, start, end)
+    new_cache(service, settle_days=5).get_series(db, FIELD, start, end)
+    assert service.requests == [(start, end, 1), (start, end, 1)]
+
+def test_failed_chunking_releases_the_flights(db):
+    class FailingService(RecordingService):
+        def field_chunks(self, *args, **kwargs):
+            raise ValueError("bad range")
+
+    cache = new_cache(FailingService(), settle_days=0, coalesce_wait_seconds=0.1)
+    with pytest.raises(ValueError):
+        cache.get_series(db, FIELD, "2024-01-01", "2024-02-01")
+    # Nobody is left waiting on the failed fetch, and the next request fetches again
+    service = RecordingService()
+    cache.ee_client = DirectClient(service)
+    cache.ee_service = service
+    series = cache.get_series(db, FIELD, "2024-01-01", "2024-02-01")
+    assert service.requests == [("2024-01-01", "2024-02-01", 1)] and not series["degraded"]
@@ -0,0 +1,99 @@
+"""Dashboard rollups after writes, corrections and across the fields of an island"""
+from datetime import date, datetime
+import numpy as np
+import pytest
+import models
+from ndvi_rollups import bucket_end, bucket_starts, island_for_coordinates, rollup_out
+from ndvi_store import upsert_ndvi_rows
+
+SANTIAGO_FIELD = [[14.92, -23.60], [14.921, -23.60], [14.921, -23.601], [14.92, -23.601]]
+SANTIAGO_OTHER_FIELD = [[15.00, -23.55], [15.001, -23.55], [15.001, -23.551]]
+FOGO_FIELD = [[14.95, -24.40], [14.951, -24.40], [14.951, -24.401]]
+
+@pytest.fixture
+def fields_db(db):
+    """Two Santiago fields and one on Fogo"""
+    db.add(models.User(id=1, email="farmer@kapverde.cv", hashed_password="-"))
+    for field_id, coordinates in enumerate([SANTIAGO_FIELD, SANTIAGO_OTHER_FIELD, FOGO_FIELD], start=1):
+        db.add(models.Field(id=field_id, name=f"Field {field_id}", owner_id=1, coordinates=coordinates))
+    db.commit()
+    return db
+
+def write(db, field_id, observations):
+    """observations: {"YYYY-MM-DD": (ndvi, biomass)}"""
+    upsert_ndvi_rows(db, [
+        {
+            "field_id": field_id,
+            "date": datetime.strptime(day, "%Y-%m-%d"),
+            "ndvi_value": ndvi,
+            "biomass_estimate": biomass,
+            "data_source": "sentinel-2"
+        }
+        for day, (ndvi, biomass) in observations.items()
+    ])
+    db.commit()
+
+def field_rollup(db, field_id, period, start):
+    return db.query(models.NDVIFieldRollup).filter_by(
+        field_id=field_id, data_source="sentinel-2", period=period, period_start=start
+    ).one()
+
+def island_rollup(db, island, period, start):
+    return db.query(models.NDVIIslandRollup).filter_by(
+        island=island, data_source="sentinel-2", period=period, period_start=start
+    ).one()
+
+def test_buckets_follow_the_rain_fed_calendar():
+    days = np.array(["2024-01-15", "2024-06-30", "2024-07-01", "2024-10-31", "2024-11-01"], dtype="datetime64[D]")
+    assert bucket_starts("month", days).astype(str).tolist() == ["2024-01-01", "2024-06-01", "2024-07-01", "2024-10-01", "2024-11-01"]
+    assert bucket_starts("season", days).astype(str).tolist() == ["2023-11-01", "2023-11-01", "2024-07-01", "2024-07-01", "2024-11-01"]
+    assert str(bucket_end("season", np.datetime64("2024-07-01"))) == "2024-11-01"
+    assert str(bucket_end("season", np.datetime64("2023-11-01"))) == "2024-07-01"
+    assert str(bucket_end("month", np.datetime64("2024-12-01"))) == "2025-01-01"
+
+def test_islands_from_field_coordinates():
+    assert island_for_coordinates(SANTIAGO_FIELD) == "Santiago"
+    assert island_for_coordinates(FOGO_FIELD) == "Fogo"
+    assert island_for_coordinates([[0.0, 0.0]]) == "other"
+    assert island_for_coordinates(None) == "other"
+
+def test_correction_in_place_updates_sums_and_means(fields_db):
+    db = fields_db
+    write(db, 1, {"2024-08-05": (0.4, 4.0), "2024-08-10": (0.5, 5.0), "2024-09-04": (0.6, 6.0)})
+    write(db, 1, {"2024-08-10": (0.7, 7.0)})  # Reprocessed scene replaces the stored value
+
+    month = field_rollup(db, 1, "month", date(2024, 8, 1))
+    assert month.observation_count == 2 and month.biomass_count == 2
+    assert abs(month.ndvi_sum - 1.1) < 1e-6 and abs(month.ndvi_max - 0.7) < 1e-6
+    served = rollup_out(month)
+    assert served["ndvi_mean"] == 0.55 and served["biomass_mean"] == 5.5 and served["period_end"] == "2024-09-01"
+
+    season = field_rollup(db, 1, "season", date(2024, 7, 1))
+    assert season.observation_count == 3 and abs(season.ndvi_sum - 1.7) < 1e-6
+    assert rollup_out(season)["season"] == "wet"
+    # The corrected day's old value is gone from its day bucket too
+    assert abs(field_rollup(db, 1, "day", date(2024, 8, 10)).ndvi_sum - 0.7) < 1e-6
+
+def test_island_rollups_combine_their_fields(fields_db):
+    db = fields_db
+    write(db, 1, {"2024-08-05": (0.4, 4.0), "2024-08-10": (0.6, 6.0)})
+    write(db, 2, {"2024-08-07": (0.2, 2.0)})
+    write(db, 3, {"2024-08-07": (0.9, 9.0)})  # Fogo
+    write(db, 2, {"2024-08-07": (0.3, 3.0)})
+
+    santiago = island_rollup(db, "Santiago", "month", date(2024, 8, 1))
+    assert santiago.field_count == 2 and santiago.observation_count == 3
+    # Observation-weighted: (0.4 + 0.6 + 0.3) / 3, not the mean of the field means
+    assert rollup_out(santiago)["ndvi_mean"] == round(1.3 / 3, 3)
+    assert abs(santiago.ndvi_max - 0.6) < 1e-6 and abs(santiago.biomass_sum - 13.0) < 1e-6
+    fogo = island_rollup(db, "Fogo", "month", date(2024, 8, 1))
+    assert fogo.field_count == 1 and abs(fogo.ndvi_sum - 0.9) < 1e-6
+
+def test_rewriting_identical_values_changes_nothing(fields_db):
+    db = fields_db
+    observations = {"2024-08-05": (0.4, 4.0), "2024-08-10": (0.5, 5.0)}
+    write(db, 1, observations)
+    before = [(r.period, r.period_start, r.observation_count, r.ndvi_sum) for r in db.query(models.NDVIFieldRollup)]
+    write(db, 1, observations)
+    after = [(r.period, r.period_start, r.observation_count, r.ndvi_sum) for r in db.query(models.NDVIFieldRollup)]
+    assert sorted(before) == sorted(after)
@@ -0,0 +1,56 @@
+"""Scheduler runs while Earth Engine is unavailable: demo rows only when asked for, and never served by default"""
+from datetime import datetime
+import pytest
+import models
+from ndvi_scheduler import NDVIRefreshScheduler
+from ndvi_store import DEMO_DATA_SOURCE, not_demo, upsert_ndvi_rows
+
+FIELD = [[14.92, -23.60], [14.921, -23.60], [14.921, -23.601], [14.92, -23.601]]
+
+class UnavailableEarthEngine:
+    ee_available = False
+
+    def _generate_demo_ndvi_data(self, start_date, end_date, seed=0, composite=None):
+        return [{"date": "2024-08-05", "ndvi_value": 0.5}, {"date": "2024-08-10", "ndvi_value": 0.6}]
+
+class FailingCache:
+    """refresh_fields as it returns when Earth Engine cannot be reached"""
+
+    def refresh_fields(self, db, fields, start_date, end_date, composite=None, background=False):
+        return {key: [] for key in fields}, {key: "Earth Engine not initialized" for key in fields}
+
+@pytest.fixture
+def field_db(db):
+    db.add(models.User(id=1, email="farmer@kapverde.cv", hashed_password="-"))
+    db.add(models.Field(id=1, name="Field 1", owner_id=1, coordinates=FIELD))
+    db.commit()
+    return db
+
+def run_once(db, **settings):
+    scheduler = NDVIRefreshScheduler(UnavailableEarthEngine(), FailingCache(), lambda: db, **settings)
+    assert scheduler.run_pending() == 1
+
+def test_no_demo_rows_by_default(field_db):
+    run_once(field_db)
+    assert field_db.query(models.NDVIData).count() == 0
+    assert field_db.query(models.NDVISeries).count() == 0
+    assert field_db.query(models.NDVIFieldRollup).count() == 0
+    job = field_db.query(models.NDVIRefreshJob).one()
+    assert job.consecutive_failures == 1 and job.last_error == "Earth Engine not initialized"
+
+def test_demo_rows_when_enabled(field_db):
+    run_once(field_db, store_demo_data=True)
+    sources = {row.data_source for row in field_db.query(models.NDVIData)}
+    assert sources == {DEMO_DATA_SOURCE} and field_db.query(models.NDVIData).count() == 2
+
+def test_default_reads_skip_demo_rows(field_db):
+    for data_source in (DEMO_DATA_SOURCE, "sentinel-2"):
+        upsert_ndvi_rows(field_db, [{
+            "field_id": 1, "date": datetime(2024, 8, 5), "ndvi_value": 0.5, "biomass_estimate": 5.0, "data_source": data_source
+        }])
+    field_db.commit()
+
+    rows = field_db.query(models.NDVIData.data_source).filter(not_demo(models.NDVIData.data_source)).all()
+    assert rows == [("sentinel-2",)]
+    rollups = field_db.query(models.NDVIFieldRollup).filter(not_demo(models.NDVIFieldRollup.data_source)).all()
+    assert rollups and {rollup.data_source for rollup in rollups} == {"sentinel-2"}
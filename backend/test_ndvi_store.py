@@ -0,0 +1,93 @@
+"""Packed NDVI series: merge, backfill, and staying equal to ndvi_data"""
+from datetime import datetime, timedelta
+import numpy as np
+import models
+from ndvi_store import (DAY_DTYPE, VALUE_DTYPE, NDVISeriesArrays, changed_days, load_ndvi_series,
+                        merge_series, rebuild_ndvi_series, upsert_ndvi_rows)
+
+def arrays(days, ndvi) -> NDVISeriesArrays:
+    return NDVISeriesArrays(
+        np.array(days, dtype=DAY_DTYPE),
+        np.array(ndvi, dtype=float).astype(VALUE_DTYPE),
+        (np.array(ndvi, dtype=float) * 10).astype(VALUE_DTYPE)
+    )
+
+def rows(field_id, day_values, data_source="sentinel-2"):
+    return [
+        {
+            "field_id": field_id,
+            "date": datetime(2024, 1, 1) + timedelta(days=day),
+            "ndvi_value": value,
+            "biomass_estimate": None if value is None else round(value * 10, 2),
+            "data_source": data_source
+        }
+        for day, value in day_values
+    ]
+
+def stored_rows(db, field_id, data_source="sentinel-2"):
+    return [
+        (row.date.date(), row.ndvi_value)
+        for row in db.query(models.NDVIData).filter(
+            models.NDVIData.field_id == field_id, models.NDVIData.data_source == data_source
+        ).order_by(models.NDVIData.date)
+    ]
+
+def series_rows(db, field_id, data_source="sentinel-2"):
+    series = load_ndvi_series(db, field_id, data_source)[data_source]
+    return [
+        (day.astype(datetime), round(float(value), 3))
+        for day, value in zip(series.dates, series.ndvi)
+    ]
+
+def test_merge_appends_newer_days():
+    merged = merge_series(arrays([1, 5], [0.1, 0.2]), arrays([10, 15], [0.3, 0.4]))
+    assert merged.days.tolist() == [1, 5, 10, 15]
+    assert np.allclose(merged.ndvi, [0.1, 0.2, 0.3, 0.4])
+
+def test_merge_backfills_and_new_values_win():
+    merged = merge_series(arrays([5, 10, 15], [0.2, 0.3, 0.4]), arrays([1, 10, 12], [0.1, 0.35, 0.33]))
+    assert merged.days.tolist() == [1, 5, 10, 12, 15]
+    assert np.allclose(merged.ndvi, [0.1, 0.2, 0.35, 0.33, 0.4])
+    assert np.allclose(merged.biomass, [1.0, 2.0, 3.5, 3.3, 4.0])
+
+def test_merge_keeps_the_last_duplicate_of_a_batch():
+    merged = merge_series(arrays([1], [0.1]), arrays([1, 1], [0.2, 0.3]))
+    assert merged.days.tolist() == [1] and np.allclose(merged.ndvi, [0.3])
+
+def test_changed_days_ignores_rewrites_of_the_same_values():
+    existing = arrays([1, 5, 10], [0.1, float("nan"), 0.3])
+    new = arrays([1, 5, 10, 12], [0.1, float("nan"), 0.31, 0.4])
+    assert changed_days(existing, new).tolist() == [10, 12]
+    assert changed_days(arrays([], []), new).tolist() == [1, 5, 10, 12]
+
+def test_series_follows_ndvi_data_through_backfills_and_corrections(db):
+    upsert_ndvi_rows(db, rows(1, [(20, 0.4), (25, 0.5)]))
+    db.commit()
+    upsert_ndvi_rows(db, rows(1, [(5, 0.2), (10, 0.25), (30, 0.55)]))  # Older and newer days
+    upsert_ndvi_rows(db, rows(1, [(10, 0.3)]))  # Correction in the same transaction
+    upsert_ndvi_rows(db, rows(2, [(10, 0.7)]))
+    upsert_ndvi_rows(db, rows(1, [(10, 0.9)], data_source="demo"))
+    db.commit()
+
+    assert series_rows(db, 1) == stored_rows(db, 1)
+    assert [value for _, value in series_rows(db, 1)] == [0.2, 0.3, 0.4, 0.5, 0.55]
+    assert series_rows(db, 2) == stored_rows(db, 2)
+    assert set(load_ndvi_series(db, 1)) == {"sentinel-2", "demo"}
+
+def test_unchanged_rows_are_not_rewritten(db):
+    assert upsert_ndvi_rows(db, rows(1, [(1, 0.1), (2, 0.2)])) == 2
+    db.commit()
+    assert upsert_ndvi_rows(db, rows(1, [(1, 0.1), (2, 0.25)])) == 1
+
+def test_rebuild_matches_incremental_writes(db):
+    rng = np.random.default_rng(0)
+    for batch in range(5):
+        days = rng.choice(365, size=40, replace=False)
+        upsert_ndvi_rows(db, rows(1, [(int(day), round(float(rng.uniform(0.1, 0.8)), 3)) for day in days]))
+    db.commit()
+    incremental = load_ndvi_series(db, 1)["sentinel-2"]
+    assert rebuild_ndvi_series(db, [1]) == 1
+    db.commit()
+    rebuilt = load_ndvi_series(db, 1)["sentinel-2"]
+    assert all(np.array_equal(a, b, equal_nan=True) for a, b in zip(incremental, rebuilt))
+    assert series_rows(db, 1) == stored_rows(db, 1)
@@ -0,0 +1,62 @@
+"""PerceptualHashIndex lookups against a brute-force Hamming scan"""
+import random
+from photo_hash_index import HASH_BITS, PerceptualHashIndex, hamming_distance
+
+def flip_bits(photo_hash: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(HASH_BITS), count):
+        photo_hash ^= 1 << bit
+    return photo_hash
+
+def brute_force(hashes: dict, photo_hash: int, max_distance: int) -> dict:
+    return {
+        photo_id: hamming_distance(photo_hash, stored)
+        for photo_id, stored in hashes.items()
+        if hamming_distance(photo_hash, stored) <= max_distance
+    }
+
+def build(rng: random.Random, max_distance: int, photos: int = 2000):
+    """Random hashes plus near-duplicates of some of them, at every distance up to max_distance + 2"""
+    index = PerceptualHashIndex(max_distance=max_distance)
+    hashes = {}
+    for photo_id in range(photos):
+        if photo_id % 4 == 0 or not hashes:
+            photo_hash = rng.getrandbits(HASH_BITS)
+        else:
+            photo_hash = flip_bits(hashes[rng.randrange(len(hashes))], rng.randint(0, max_distance + 2), rng)
+        hashes[photo_id] = photo_hash
+        index.add(photo_id, photo_hash, {"photo_id": photo_id})
+    return index, hashes
+
+def test_lookup_matches_brute_force():
+    rng = random.Random(0)
+    for max_distance in (0, 3, 6, 10):
+        index, hashes = build(rng, max_distance)
+        for _ in range(300):
+            query = flip_bits(hashes[rng.randrange(len(hashes))], rng.randint(0, max_distance + 2), rng)
+            found = {photo_id: distance for photo_id, distance, _ in index.query(query)}
+            assert found == brute_force(hashes, query, max_distance), max_distance
+
+def test_smaller_query_radius():
+    rng = random.Random(1)
+    index, hashes = build(rng, 6)
+    for _ in range(100):
+        query = flip_bits(hashes[rng.randrange(len(hashes))], rng.randint(0, 6), rng)
+        found = {photo_id: distance for photo_id, distance, _ in index.query(query, max_distance=2)}
+        assert found == brute_force(hashes, query, 2)
+
+def test_matches_are_sorted_closest_first():
+    rng = random.Random(2)
+    index, hashes = build(rng, 6)
+    distances = [distance for _, distance, _ in index.query(hashes[0])]
+    assert distances == sorted(distances) and distances[0] == 0
+
+def test_readd_and_remove():
+    index = PerceptualHashIndex(max_distance=4)
+    index.add("a", 0)
+    index.add("a", (1 << 64) - 1)  # Re-adding replaces the old hash
+    assert len(index) == 1
+    assert index.query(0) == []
+    assert [photo_id for photo_id, _, _ in index.query((1 << 64) - 2)] == ["a"]
+    index.remove("a")
+    index.remove("a")
+    assert len(index) == 0 and index.query((1 << 64) - 1) == []
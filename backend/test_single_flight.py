@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+from single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight(ttl_seconds=60)
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return "result"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("key", fetch, timeout=5)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flights.do("key", fetch, timeout=5))) for _ in range(4)]
+    for follower in followers:
+        follower.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader] + followers:
+        thread.join(5)
+    assert len(calls) == 1 and results == ["result"] * 5
+
+def test_success_is_reused_within_the_ttl():
+    flights = SingleFlight(ttl_seconds=60)
+    calls = []
+    assert flights.do("key", lambda: calls.append(1) or len(calls)) == 1
+    assert flights.do("key", lambda: calls.append(1) or len(calls)) == 1
+    assert flights.do("other", lambda: calls.append(1) or len(calls)) == 2
+
+def test_success_expires_after_the_ttl():
+    flights = SingleFlight(ttl_seconds=0.05)
+    calls = []
+    flights.do("key", lambda: calls.append(1))
+    time.sleep(0.1)
+    flights.do("key", lambda: calls.append(1))
+    assert len(calls) == 2
+
+def test_failure_is_shared_with_waiters_but_not_reused():
+    flights = SingleFlight(ttl_seconds=60)
+    flight, is_leader = flights.claim("key")
+    joined, joined_is_leader = flights.claim("key")
+    assert is_leader and not joined_is_leader and joined is flight
+
+    flights.resolve("key", flight, error=RuntimeError("Earth Engine down"))
+    with pytest.raises(RuntimeError, match="Earth Engine down"):
+        joined.wait(1)
+
+    # The next caller starts a new attempt instead of getting the old error
+    assert flights.do("key", lambda: "recovered") == "recovered"
+
+def test_failure_raised_by_do_is_not_reused():
+    flights = SingleFlight(ttl_seconds=60)
+
+    def fail():
+        raise ValueError("first attempt")
+
+    with pytest.raises(ValueError):
+        flights.do("key", fail)
+    assert flights.do("key", lambda: "second attempt") == "second attempt"
+
+def test_wait_times_out():
+    flights = SingleFlight()
+    flights.claim("key")
+    joined, _ = flights.claim("key")
+    with pytest.raises(TimeoutError):
+        joined.wait(0.05)